@@ -0,0 +1,80 @@
+"""
+問題ごとの分析ジョブのベンチマーク
+
+合成データセット（既定で 20万挑戦 × 10回答 = 200万行の user_answers）で、
+src/services/question_analytics.py の集計について次を計測する。
+
+- NumPy（チャンクごとの bincount）と標準の array（1行ずつ）の処理時間と行/秒
+- チャンクの大きさごとのメモリのピーク（tracemalloc）。ピークはチャンクの大きさと
+  問題数で決まり、回答の行数には比例しない
+
+使い方:
+    cd backend
+    python benchmarks/bench_analytics.py --attempts 200000 --answers 10
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def measure(func):
+    """(結果, 秒, tracemalloc のピーク（MB）)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='問題ごとの分析ジョブのベンチマーク')
+    parser.add_argument('--quizzes', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=20, help='1クイズあたりの問題数')
+    parser.add_argument('--attempts', type=int, default=200000)
+    parser.add_argument('--answers', type=int, default=10, help='挑戦ごとの回答数')
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    from src.main import create_app
+    from src.models.user import db
+    from src.services import question_analytics
+    from dataset import DatasetSpec, build_dataset
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEMA_CHECK': False,
+                      'ANSWER_INDEX_PRELOAD': False})
+    with app.app_context():
+        db.create_all()
+        spec = DatasetSpec(quizzes=args.quizzes, questions_per_quiz=args.questions, users=10000,
+                           attempts=args.attempts, answers_per_attempt=args.answers)
+        build_dataset(spec, log=lambda *_: None)
+        print(f'データ: 問題 {args.quizzes * args.questions:,} / 回答 {args.attempts * args.answers:,}行')
+        if question_analytics.numpy is None:
+            print('NumPy がインストールされていないため array のみ計測します')
+
+        print()
+        print(f"{'集計':<8}{'チャンク':>10}{'秒':>8}{'行/秒':>14}{'ピーク(MB)':>12}")
+        backends = [False] if question_analytics.numpy is None else [True, False]
+        for use_numpy in backends:
+            for chunk_rows in args.chunk_rows:
+                result, elapsed, peak = measure(
+                    lambda: question_analytics.compute(chunk_rows=chunk_rows, use_numpy=use_numpy))
+                print(f"{result['backend']:<8}{chunk_rows:>10,}{elapsed:>8.2f}"
+                      f"{result['rows'] / elapsed:>14,.0f}{peak:>12.1f}")
+
+        # 全件を読んでから集計した場合のメモリ（比較用、行数に比例する）
+        query = question_analytics._answers_query()
+        _, elapsed, peak = measure(lambda: db.session.execute(query).all())
+        print(f"{'全件読み込みのみ':<8}{'-':>10}{elapsed:>8.2f}{'':>14}{peak:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
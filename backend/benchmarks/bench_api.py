@@ -0,0 +1,317 @@
+"""
+APIエンドポイントのベンチマーク
+
+合成データセット（benchmarks/dataset.py）を入れた SQLite データベースに対して、
+routes/quiz.py と routes/user.py の全エンドポイントを Flask のテストクライアントで
+呼び出し、レイテンシのパーセンタイル・スループット・SQL発行数を計測する。
+結果は benchmarks/baseline.json と比較して差分を表示する。
+
+使い方:
+    cd backend
+    python benchmarks/bench_api.py                       # 既定の件数で実行して baseline と比較
+    python benchmarks/bench_api.py --attempts 2000000    # 件数を指定（データベースは作り直す）
+    python benchmarks/bench_api.py --update-baseline     # 結果を baseline.json に保存
+    python benchmarks/bench_api.py --only submit         # 名前に submit を含むものだけ実行
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_DB = os.path.join(BENCH_DIR, 'bench.db')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# POST /api/attempts/batch の1リクエストあたりの送信数
+BATCH_SUBMISSIONS = 50
+# ミックスクイズの出題数
+RANDOM_QUESTIONS = 10
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='APIエンドポイントのベンチマーク')
+    parser.add_argument('--db', default=DEFAULT_DB, help='ベンチマーク用SQLiteファイル')
+    parser.add_argument('--rebuild', action='store_true', help='データベースを必ず作り直す')
+    parser.add_argument('--tags', type=int, default=20)
+    parser.add_argument('--quizzes', type=int, default=1000)
+    parser.add_argument('--questions-per-quiz', type=int, default=20)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--answers-per-attempt', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=200, help='エンドポイントごとのリクエスト数')
+    parser.add_argument('--warmup', type=int, default=10, help='計測前に捨てるリクエスト数')
+    parser.add_argument('--only', help='名前にこの文字列を含むエンドポイントだけ実行')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='結果をベースラインとして保存')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='p95 がベースラインよりこの割合以上遅ければ劣化とみなす')
+    parser.add_argument('--fail-on-regression', action='store_true', help='劣化があれば終了コード1')
+    return parser.parse_args()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def prepare_database(args, spec):
+    """指定の件数のデータベースを用意する（件数が同じなら前回のものを再利用）"""
+    meta_path = args.db + '.json'
+    if not args.rebuild and os.path.exists(args.db) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            if json.load(f) == spec.to_dict():
+                return False
+    for path in (args.db, meta_path):
+        if os.path.exists(path):
+            os.remove(path)
+    return True
+
+
+class Scenario:
+    """1つのエンドポイントの呼び出し方"""
+
+    def __init__(self, name, method, request, expected=200):
+        self.name = name
+        self.method = method
+        # request(i) -> (url, kwargs)
+        self.request = request
+        self.expected = expected
+
+
+def build_scenarios(client, spec, rng):
+    from dataset import correct_choice_id, question_ids
+
+    def random_quiz_id():
+        return rng.randint(1, spec.quizzes)
+
+    def submit_body(quiz_id):
+        answers = []
+        for question_id in question_ids(spec, quiz_id):
+            choice_id = correct_choice_id(spec, question_id) + rng.randrange(spec.choices_per_question)
+            answers.append({'question_id': question_id, 'selected_choice_id': choice_id})
+        return {'user_id': rng.randint(1, spec.users), 'answers': answers, 'time_taken': rng.randint(30, 600)}
+
+    def new_quiz_body(i):
+        return {
+            'title': f'ベンチマークで作成したクイズ {i}',
+            'description': '',
+            'oshi_tag_id': rng.randint(1, spec.tags),
+            'difficulty': 'beginner',
+            'questions': [{
+                'question_text': f'問題 {n}',
+                'question_type': 'multiple_choice',
+                'order_index': n,
+                'explanation': '',
+                'choices': [{'choice_text': f'選択肢 {c}', 'is_correct': c == 0, 'order_index': c} for c in range(4)]
+            } for n in range(1, 11)]
+        }
+
+    first_page = client.get('/api/quizzes')
+    next_cursor = first_page.headers.get('X-Next-Cursor', '')
+    etag_quiz = 1
+    etag = client.get(f'/api/quizzes/{etag_quiz}').headers.get('ETag')
+    created_users = []
+    run_id = int(time.time())
+
+    def create_user(i):
+        return '/api/users', {'json': {'username': f'bench{run_id}_{i}'}}
+
+    def delete_user(i):
+        if not created_users:
+            url, kwargs = create_user(f'extra{i}')
+            created_users.append(client.post(url, **kwargs).get_json()['id'])
+        return f'/api/users/{created_users.pop()}', {}
+
+    def submit(i):
+        quiz_id = random_quiz_id()
+        return f'/api/quizzes/{quiz_id}/submit', {'json': submit_body(quiz_id)}
+
+    def random_submit(i):
+        answers = []
+        for _ in range(RANDOM_QUESTIONS):
+            question_id = rng.randint(1, spec.quizzes * spec.questions_per_quiz)
+            choice_id = correct_choice_id(spec, question_id) + rng.randrange(spec.choices_per_question)
+            answers.append({'question_id': question_id, 'selected_choice_id': choice_id})
+        return '/api/quizzes/random/submit', {'json': {
+            'user_id': rng.randint(1, spec.users), 'answers': answers, 'time_taken': rng.randint(30, 600)
+        }}
+
+    def submit_batch(i):
+        submissions = []
+        for _ in range(BATCH_SUBMISSIONS):
+            quiz_id = random_quiz_id()
+            submissions.append(dict(submit_body(quiz_id), quiz_id=quiz_id))
+        return '/api/attempts/batch', {'json': {'submissions': submissions}}
+
+    return [
+        Scenario('GET /api/tags', 'get', lambda i: ('/api/tags', {})),
+        Scenario('POST /api/tags', 'post',
+                 lambda i: ('/api/tags', {'json': {'name': f'bench{run_id}_{i}', 'category': 'anime'}}), 201),
+        Scenario('GET /api/quizzes', 'get', lambda i: ('/api/quizzes', {})),
+        Scenario('GET /api/quizzes?cursor=', 'get', lambda i: (f'/api/quizzes?cursor={next_cursor}', {})),
+        Scenario('GET /api/quizzes?fields=', 'get',
+                 lambda i: ('/api/quizzes?fields=id,title,difficulty&limit=100', {})),
+        Scenario('GET /api/quizzes?category=', 'get',
+                 lambda i: ('/api/quizzes?category=anime&difficulty=beginner', {})),
+        Scenario('GET /api/quizzes/<id>', 'get', lambda i: (f'/api/quizzes/{random_quiz_id()}', {})),
+        Scenario('GET /api/search', 'get',
+                 lambda i: (f'/api/search?q=クイズ {random_quiz_id()}', {})),
+        Scenario('GET /api/quizzes/random', 'get',
+                 lambda i: (f'/api/quizzes/random?count={RANDOM_QUESTIONS}', {})),
+        Scenario('GET /api/quizzes/random?difficulty=', 'get',
+                 lambda i: (f'/api/quizzes/random?count={RANDOM_QUESTIONS}&difficulty=beginner', {})),
+        Scenario('POST /api/quizzes/random/submit', 'post', random_submit, 201),
+        Scenario('GET /api/quizzes/<id> (If-None-Match)', 'get',
+                 lambda i: (f'/api/quizzes/{etag_quiz}', {'headers': {'If-None-Match': etag}}), 304),
+        Scenario('POST /api/quizzes', 'post', lambda i: ('/api/quizzes', {'json': new_quiz_body(i)}), 201),
+        Scenario('POST /api/quizzes/<id>/submit', 'post', submit, 201),
+        Scenario(f'POST /api/attempts/batch ({BATCH_SUBMISSIONS}件)', 'post', submit_batch, 201),
+        Scenario('GET /api/rankings/quizzes', 'get', lambda i: ('/api/rankings/quizzes', {})),
+        Scenario('GET /api/quizzes/<id>/rankings', 'get',
+                 lambda i: (f'/api/quizzes/{random_quiz_id()}/rankings', {})),
+        Scenario('GET /api/quizzes/<id>/analytics', 'get',
+                 lambda i: (f'/api/quizzes/{random_quiz_id()}/analytics', {})),
+        Scenario('GET /api/users', 'get', lambda i: ('/api/users', {})),
+        Scenario('POST /api/users', 'post', create_user, 201),
+        Scenario('GET /api/users/<id>', 'get', lambda i: (f'/api/users/{rng.randint(1, spec.users)}', {})),
+        Scenario('GET /api/users/<id>/stats', 'get',
+                 lambda i: (f'/api/users/{rng.randint(1, spec.users)}/stats', {})),
+        Scenario('PUT /api/users/<id>', 'put',
+                 lambda i: (f'/api/users/{rng.randint(1, spec.users)}', {'json': {}})),
+        Scenario('DELETE /api/users/<id>', 'delete', delete_user, 204),
+    ], created_users
+
+
+def run_scenario(client, scenario, counter, requests, warmup, created_users):
+    latencies = []
+    queries = []
+    errors = 0
+    call = getattr(client, scenario.method)
+    for i in range(warmup + requests):
+        url, kwargs = scenario.request(i)
+        counter['queries'] = 0
+        started = time.perf_counter()
+        response = call(url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if response.status_code != scenario.expected:
+            errors += 1
+        if scenario.name == 'POST /api/users' and response.status_code == 201:
+            created_users.append(response.get_json()['id'])
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(counter['queries'])
+    latencies.sort()
+    total_seconds = sum(latencies) / 1000
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'rps': round(requests / total_seconds, 1) if total_seconds > 0 else 0.0,
+        'queries': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'max_queries': max(queries) if queries else 0,
+    }
+
+
+def compare(results, baseline, threshold):
+    """ベースラインとの差分を表示し、劣化したエンドポイント名のリストを返す"""
+    regressions = []
+    base_results = baseline.get('results', {})
+    print('\nベースラインとの比較（p95 / SQL発行数）')
+    for name, result in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f'  {name:<48} (ベースラインなし)')
+            continue
+        ratio = result['p95_ms'] / base['p95_ms'] if base['p95_ms'] else 1.0
+        query_diff = result['queries'] - base['queries']
+        regressed = ratio > 1 + threshold or query_diff > 0
+        mark = '劣化' if regressed else ('改善' if ratio < 1 - threshold or query_diff < 0 else '    ')
+        print(f'  {mark} {name:<48} p95 {base["p95_ms"]:8.2f} → {result["p95_ms"]:8.2f}ms ({ratio:5.2f}x)'
+              f'  SQL {base["queries"]:6.2f} → {result["queries"]:6.2f} ({query_diff:+.2f})')
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    from dataset import DatasetSpec, build_dataset
+
+    spec = DatasetSpec(
+        tags=args.tags, quizzes=args.quizzes, questions_per_quiz=args.questions_per_quiz,
+        users=args.users, attempts=args.attempts, answers_per_attempt=args.answers_per_attempt
+    )
+    needs_build = prepare_database(args, spec)
+
+    # アプリの読み込み前にデータベースを差し替える
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(args.db)}'
+    from sqlalchemy import event
+    from src.main import app
+    from src.models.user import db
+    from src.models.quiz import QuestionAnalytics
+    from src.services import question_analytics
+
+    with app.app_context():
+        if needs_build:
+            print(f'データセットを作成中: {spec.to_dict()}')
+            build_dataset(spec)
+            with open(args.db + '.json', 'w', encoding='utf-8') as f:
+                json.dump(spec.to_dict(), f)
+        if needs_build or db.session.query(QuestionAnalytics.question_id).first() is None:
+            # /api/quizzes/<id>/analytics が読む集計結果（本番では定期実行のジョブで作る）
+            question_analytics.compute()
+
+        counter = {'queries': 0}
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*_):
+            counter['queries'] += 1
+
+    client = app.test_client()
+    rng = random.Random(spec.seed)
+    scenarios, created_users = build_scenarios(client, spec, rng)
+
+    results = {}
+    print(f'\n{"エンドポイント":<46} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>9} {"SQL":>6} {"err":>4}')
+    for scenario in scenarios:
+        if args.only and args.only not in scenario.name:
+            continue
+        result = run_scenario(client, scenario, counter, args.requests, args.warmup, created_users)
+        results[scenario.name] = result
+        print(f'{scenario.name:<48} {result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} '
+              f'{result["rps"]:9.1f} {result["queries"]:6.2f} {result["errors"]:4d}')
+
+    report = {'spec': spec.to_dict(), 'requests': args.requests, 'results': results}
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nベースラインを保存しました: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('\nベースラインがありません（--update-baseline で作成できます）')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('spec') != spec.to_dict():
+        print('\n⚠ ベースラインとデータセットの件数が異なるため、比較は参考値です')
+    regressions = compare(results, baseline, args.threshold)
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+レスポンス圧縮のベンチマーク
+
+大きなクイズ（問題数を指定可能）の詳細と一覧のレスポンスについて、
+エンコーディング・圧縮レベルごとの大きさと圧縮にかかるCPU時間を計測し、
+クイズ詳細のリクエストを次の方法で比べる。
+
+- 圧縮なし
+- リクエストごとに圧縮（キャッシュしていないレスポンスと同じ処理）
+- 圧縮版をキャッシュのエントリに保持して再利用（src/utils/compression.py の CompressedBody）
+
+使い方:
+    cd backend
+    python benchmarks/bench_compression.py --questions 2000 --quizzes 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def timeit(func, repeat):
+    """repeat 回実行した1回あたりの最短時間（ミリ秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='レスポンス圧縮のベンチマーク')
+    parser.add_argument('--questions', type=int, default=2000, help='詳細を計測するクイズの問題数')
+    parser.add_argument('--quizzes', type=int, default=1000, help='一覧に含めるクイズ数')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.quiz import Question, Choice
+    from src.utils import compression
+    from dataset import DatasetSpec, build_dataset
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEMA_CHECK': False,
+                      'ANSWER_INDEX_PRELOAD': False})
+    with app.app_context():
+        db.create_all()
+        spec = DatasetSpec(tags=5, quizzes=args.quizzes, questions_per_quiz=1, users=1, attempts=0)
+        build_dataset(spec, log=lambda *_: None)
+        # 1件目のクイズに大量の問題を追加する（日本語の問題文・選択肢）
+        db.session.execute(db.insert(Question), [{
+            'quiz_id': 1, 'question_text': f'大きなクイズの問題 {i} です。次のうち正しいものはどれでしょう？',
+            'question_type': 'multiple_choice', 'order_index': i, 'explanation': ''
+        } for i in range(2, args.questions + 1)])
+        db.session.commit()
+        question_ids = db.session.scalars(db.select(Question.id).where(Question.quiz_id == 1, Question.id > args.quizzes))
+        db.session.execute(db.insert(Choice), [{
+            'question_id': qid, 'choice_text': f'選択肢 {n}：推しの名前は星野アイ', 'is_correct': n == 0, 'order_index': n
+        } for qid in question_ids for n in range(4)])
+        db.session.commit()
+
+    client = app.test_client()
+    bodies = {
+        'クイズ詳細': client.get('/api/quizzes/1').data,
+        'クイズ一覧': client.get('/api/quizzes?limit=100').data,
+    }
+
+    print(f"エンコーディング: {', '.join(compression.ENCODINGS)}")
+    print(f"{'':<12}{'方式':<10}{'レベル':>6}{'サイズ':>12}{'圧縮率':>8}{'圧縮(ms)':>10}")
+    for name, body in bodies.items():
+        print(f'{name:<12}{"identity":<10}{"-":>6}{len(body):>12,}{"":>8}{"":>10}')
+        for encoding in compression.ENCODINGS:
+            levels = sorted({compression.DYNAMIC_LEVELS[encoding], compression.STATIC_LEVELS[encoding]})
+            for level in levels:
+                data = compression.compress(body, encoding, level)
+                ms = timeit(lambda: compression.compress(body, encoding, level), args.repeat)
+                print(f'{"":<12}{encoding:<10}{level:>6}{len(data):>12,}{len(data) / len(body):>8.1%}{ms:>10.2f}')
+
+    # クイズ詳細のリクエスト全体（キャッシュ済みの状態）
+    encoding = compression.ENCODINGS[0]
+    headers = {'Accept-Encoding': encoding}
+
+    def per_request():
+        # キャッシュしていないレスポンスと同じく、毎回その場で圧縮する
+        response = client.get('/api/quizzes/1')
+        compression.compress(response.data, encoding, compression.DYNAMIC_LEVELS[encoding])
+
+    cases = {
+        '圧縮なし': lambda: client.get('/api/quizzes/1'),
+        f'リクエストごとに圧縮（{encoding}）': per_request,
+        f'圧縮版を再利用（{encoding}）': lambda: client.get('/api/quizzes/1', headers=headers),
+    }
+    print()
+    print(f'クイズ詳細（{args.questions}問）のリクエスト  (ms, {args.repeat}回の最短)')
+    for name, func in cases.items():
+        func()
+        print(f'  {name:<28}{timeit(func, args.repeat):>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
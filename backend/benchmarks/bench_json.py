@@ -0,0 +1,135 @@
+"""
+JSONエンコードのベンチマーク
+
+大きなクイズ（問題数を指定可能）の詳細と一覧を、次の方法でエンコードして比べる。
+
+- 辞書 + 標準の json（to_dict() → Flask の DefaultJSONProvider、従来の方法）
+- 辞書 + FastJSONProvider（orjson があれば orjson）
+- 事前コンパイル済みシリアライザー（行から直接JSONを組み立てる、辞書を作らない）
+
+クイズ詳細は読み込み（キャッシュミス時の処理）を含めて、一覧は読み込み済みの
+行のエンコードだけを計測する。データはメモリ上の SQLite に作り、
+出力はデコードして内容が同じことを確認する。
+
+使い方:
+    cd backend
+    python benchmarks/bench_json.py --questions 2000 --quizzes 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def timeit(func, repeat):
+    """repeat 回実行した1回あたりの最短時間（ミリ秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSONエンコードのベンチマーク')
+    parser.add_argument('--questions', type=int, default=2000, help='詳細を計測するクイズの問題数')
+    parser.add_argument('--quizzes', type=int, default=1000, help='一覧に含めるクイズ数')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from sqlalchemy.orm import selectinload
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.quiz import Question, Choice
+    from src.services.quiz_cache import _load_questions
+    from src.services.quiz_listing import QUIZ_LIST_FIELDS, listing_query, listing_json
+    from src.utils.json_provider import FastJSONProvider
+    from dataset import DatasetSpec, build_dataset
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEMA_CHECK': False,
+                      'ANSWER_INDEX_PRELOAD': False})
+    with app.app_context():
+        db.create_all()
+        spec = DatasetSpec(tags=5, quizzes=args.quizzes, questions_per_quiz=1, users=1, attempts=0)
+        build_dataset(spec, log=lambda *_: None)
+        # 1件目のクイズに大量の問題を追加する
+        db.session.execute(db.insert(Question), [{
+            'quiz_id': 1, 'question_text': f'大きなクイズの問題 {i} です。正しいものはどれ？',
+            'question_type': 'multiple_choice', 'order_index': i, 'explanation': ''
+        } for i in range(2, args.questions + 1)])
+        db.session.commit()
+        question_ids = db.session.scalars(db.select(Question.id).where(Question.quiz_id == 1, Question.id > args.quizzes))
+        db.session.execute(db.insert(Choice), [{
+            'question_id': qid, 'choice_text': f'選択肢 {n}', 'is_correct': n == 0, 'order_index': n
+        } for qid in question_ids for n in range(4)])
+        db.session.commit()
+
+        def load_questions():
+            # 従来の読み込み（ORM + selectinload）
+            db.session.expunge_all()
+            return Question.query.filter_by(quiz_id=1)\
+                .options(selectinload(Question.choices))\
+                .order_by(Question.order_index, Question.id).all()
+
+        question_count = len(load_questions())
+        rows = listing_query(QUIZ_LIST_FIELDS, join_tag=True).all()
+
+        stdlib = DefaultJSONProvider(app)
+        fast = FastJSONProvider(app)
+        compact = {'separators': (',', ':')}
+
+        cases = {
+            f'クイズ詳細（{question_count}問）': (
+                lambda: stdlib.dumps([q.to_dict() for q in load_questions()], **compact),
+                lambda: fast.dumps([q.to_dict() for q in load_questions()], **compact),
+                lambda: _load_questions(1)[0],
+            ),
+            f'クイズ一覧（{len(rows)}件）': (
+                lambda: stdlib.dumps([_row_dict(r) for r in rows], **compact),
+                lambda: fast.dumps([_row_dict(r) for r in rows], **compact),
+                lambda: listing_json(rows, QUIZ_LIST_FIELDS),
+            ),
+        }
+
+        print(f'FastJSONProvider のエンコーダー: {fast.backend}')
+        print(f"{'':<24}{'辞書+json':>12}{'辞書+' + fast.backend:>14}{'シリアライザー':>14}  (ms, {args.repeat}回の最短)")
+        for name, funcs in cases.items():
+            outputs = [json.loads(f()) for f in funcs]
+            assert outputs[0] == outputs[1] == outputs[2], f'{name}: 出力が一致しません'
+            times = [timeit(f, args.repeat) for f in funcs]
+            print(f'{name:<22}{times[0]:>12.2f}{times[1]:>14.2f}{times[2]:>14.2f}'
+                  f'  ({times[0] / times[2]:.1f}倍)')
+
+
+def _row_dict(row):
+    """一覧の行を従来と同じ辞書にする（Quiz.to_summary_dict と同じ形）"""
+    return {
+        'id': row.id,
+        'creator_id': row.creator_id,
+        'title': row.title,
+        'description': row.description,
+        'oshi_tag': {
+            'id': row.oshi_tag_id,
+            'name': row.oshi_tag_name,
+            'category': row.oshi_tag_category
+        } if row.oshi_tag_id is not None else None,
+        'difficulty': row.difficulty,
+        'play_count': row.play_count,
+        'average_score': row.average_score,
+        'rating': row.rating,
+        'rating_count': row.rating_count,
+        'created_at': row.created_at.isoformat(),
+        'question_count': row.question_count
+    }
+
+
+if __name__ == '__main__':
+    main()
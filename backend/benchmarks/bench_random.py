@@ -0,0 +1,97 @@
+"""
+ミックスクイズ（ランダム出題）のベンチマーク
+
+合成データセット（既定で 5000 クイズ × 20問 = 10万問）で、絞り込み（なし・難易度・
+カテゴリー・タグ + 難易度）ごとに N 問を選ぶ時間を次の方法で比べる。
+
+- ORDER BY RANDOM() LIMIT N（問題を絞り込んで全件ソート）
+- プールの索引から選ぶ（src/services/question_pool.py、選んだ問題の読み込みを含む）
+
+使い方:
+    cd backend
+    python benchmarks/bench_random.py --quizzes 5000 --count 10
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def timings(func, repeat):
+    """repeat 回実行したそれぞれの時間（ミリ秒）"""
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        result.append((time.perf_counter() - started) * 1000)
+    return sorted(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ミックスクイズのベンチマーク')
+    parser.add_argument('--quizzes', type=int, default=5000)
+    parser.add_argument('--questions', type=int, default=20, help='1クイズあたりの問題数')
+    parser.add_argument('--count', type=int, default=10, help='出題数')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.quiz import Quiz, Question, Choice, OshiTag
+    from src.services import question_pool
+    from dataset import DatasetSpec, build_dataset
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEMA_CHECK': False,
+                      'ANSWER_INDEX_PRELOAD': False})
+    with app.app_context():
+        db.create_all()
+        spec = DatasetSpec(tags=20, quizzes=args.quizzes, questions_per_quiz=args.questions, users=1, attempts=0)
+        build_dataset(spec, log=lambda *_: None)
+        print(f'データ: クイズ {args.quizzes:,} / 問題 {args.quizzes * args.questions:,}')
+
+        started = time.perf_counter()
+        pools = question_pool.get_pools()
+        print(f'プールの作成: {(time.perf_counter() - started) * 1000:.0f}ms  '
+              f'{len(pools.pools)}プール / {pools.nbytes() / 1024:.0f}KB')
+
+        def order_by_random(tag_id=None, difficulty=None, category=None):
+            # 従来の方法: 絞り込んだ問題を ORDER BY RANDOM() で並べて N 件の問題と選択肢を読む
+            query = db.select(Question.id).join(Quiz, Quiz.id == Question.quiz_id).where(Quiz.is_public == True)
+            if tag_id:
+                query = query.where(Quiz.oshi_tag_id == tag_id)
+            if difficulty:
+                query = query.where(Quiz.difficulty == difficulty)
+            if category:
+                query = query.join(OshiTag, OshiTag.id == Quiz.oshi_tag_id).where(OshiTag.category == category)
+            ids = db.session.scalars(query.order_by(db.func.random()).limit(args.count)).all()
+            db.session.execute(db.select(Question, Choice).outerjoin(Choice, Choice.question_id == Question.id)
+                               .where(Question.id.in_(ids))).all()
+
+        cases = {
+            '絞り込みなし': {},
+            '難易度': {'difficulty': 'beginner'},
+            'カテゴリー': {'category': 'anime'},
+            'タグ + 難易度': {'tag_id': 1, 'difficulty': 'beginner'},
+        }
+        print()
+        print(f'{args.count}問の出題  (ms, {args.repeat}回)')
+        print(f"{'':<14}{'プール':>8}{'RANDOM() p50':>14}{'p95':>8}{'索引 p50':>12}{'p95':>8}")
+        for name, filters in cases.items():
+            pool_size = sum(len(pool) for pool in pools.select(**filters))
+            slow = timings(lambda: order_by_random(**filters), args.repeat)
+            fast = timings(lambda: question_pool.random_quiz(args.count, **filters), args.repeat)
+
+            def pct(values, p):
+                return values[min(len(values) - 1, int(p / 100 * (len(values) - 1)))]
+
+            print(f'{name:<14}{pool_size:>8,}{pct(slow, 50):>14.2f}{pct(slow, 95):>8.2f}'
+                  f'{pct(fast, 50):>12.2f}{pct(fast, 95):>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+全文検索のベンチマーク
+
+日本語の語彙を組み合わせたクイズ・問題・選択肢を生成し（既定で 5000 クイズ × 20問 = 10万問）、
+src/services/search_index.py の索引について次を計測する。
+
+- 索引の作成時間と大きさ（bigram の出現リストの配列と、tracemalloc で見た全体）
+- 検索語（1文字・2文字・長い語・複数語・一致なし）ごとの検索時間（p50 / p95）
+- /api/search のリクエスト全体の時間（クイズの読み込みとJSONのエンコードを含む）
+
+使い方:
+    cd backend
+    python benchmarks/bench_search.py --quizzes 5000 --questions 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+CHARACTERS = ['星野アイ', '星野アクア', '星野ルビー', '有馬かな', '黒川あかね', 'MEMちょ', '雨宮吾郎',
+              '天童寺さりな', '五反田泰志', '斉藤壱護', '姫川大輝', '鏑木勝也', '竈門炭治郎', '冨岡義勇',
+              '胡蝶しのぶ', '煉獄杏寿郎', '宇髄天元', '五条悟', '虎杖悠仁', '伏黒恵', '釘崎野薔薇']
+TOPICS = ['初登場', '誕生日', '口癖', '所属事務所', '出演作品', '必殺技', '好きな食べ物', '声優',
+          '身長', '出身地', '得意なこと', '苦手なもの', '最終回', '名場面', '主題歌', 'ライブ']
+PLACES = ['宮崎', '東京', '苺プロダクション', 'ララライ', 'B小町', '鬼殺隊', '呪術高専', '渋谷']
+TEMPLATES = [
+    '{character}の{topic}はどれでしょう？',
+    '{place}で{character}が見せた{topic}として正しいものは？',
+    '次のうち{character}の{topic}に関係するものを選んでください',
+    '{character}と{other}が{place}で出会ったときの{topic}は？',
+]
+
+QUERIES = {
+    '1文字': ['星', '宮', '鬼'],
+    '2文字': ['アイ', '東京', '声優'],
+    '長い語': ['苺プロダクション', '好きな食べ物', '煉獄杏寿郎'],
+    'ひらがな': ['あくあ', 'るびー', 'memちょ'],
+    '複数語': ['星野 誕生日', 'アクア 宮崎 最終回', '五条悟 必殺技'],
+    '一致なし': ['存在しない語', 'zzzz', 'ワンピース'],
+}
+
+
+def generate(args):
+    """クイズ・問題・選択肢の行を作る（id は連番）"""
+    rng = random.Random(args.seed)
+    quizzes, questions, choices = [], [], []
+    question_id = 0
+    for quiz_id in range(1, args.quizzes + 1):
+        character = rng.choice(CHARACTERS)
+        quizzes.append({
+            'id': quiz_id, 'creator_id': 1, 'oshi_tag_id': 1, 'difficulty': 'beginner', 'is_public': True,
+            'title': f'{character}クイズ 第{quiz_id}回 - {rng.choice(TOPICS)}編',
+            'description': f'{character}の{rng.choice(TOPICS)}と{rng.choice(TOPICS)}について{rng.choice(PLACES)}から出題します',
+        })
+        for n in range(args.questions):
+            question_id += 1
+            questions.append({
+                'id': question_id, 'quiz_id': quiz_id, 'question_type': 'multiple_choice', 'order_index': n,
+                'explanation': '',
+                'question_text': rng.choice(TEMPLATES).format(
+                    character=rng.choice(CHARACTERS), other=rng.choice(CHARACTERS),
+                    topic=rng.choice(TOPICS), place=rng.choice(PLACES)),
+            })
+            for c in range(4):
+                choices.append({
+                    'question_id': question_id, 'is_correct': c == 0, 'order_index': c,
+                    'choice_text': f'{rng.choice(PLACES)}の{rng.choice(TOPICS)}（{rng.randint(1, 99)}）',
+                })
+    return quizzes, questions, choices
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * (len(values) - 1)))]
+
+
+def timings(func, repeat):
+    """repeat 回実行したそれぞれの時間（ミリ秒）"""
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        result.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全文検索のベンチマーク')
+    parser.add_argument('--quizzes', type=int, default=5000)
+    parser.add_argument('--questions', type=int, default=20, help='1クイズあたりの問題数')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.quiz import Quiz, Question, Choice
+    from src.services import search_index
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEMA_CHECK': False,
+                      'ANSWER_INDEX_PRELOAD': False})
+    quizzes, questions, choices = generate(args)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Quiz), quizzes)
+        db.session.execute(db.insert(Question), questions)
+        db.session.execute(db.insert(Choice), choices)
+        db.session.commit()
+        print(f'データ: クイズ {len(quizzes):,} / 問題 {len(questions):,} / 選択肢 {len(choices):,}')
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = search_index.warm()
+        elapsed = time.perf_counter() - started
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f'索引の作成: {elapsed:.2f}秒  文書 {index.documents():,} / bigram {index.grams():,}')
+    print(f'大きさ: 出現リスト {index.nbytes() / 1e6:.1f}MB / 全体（tracemalloc） {traced / 1e6:.1f}MB')
+
+    print()
+    print(f'検索（limit={args.limit}, {args.repeat}回）')
+    print(f"{'':<10}{'検索語':<24}{'件数':>8}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for name, queries in QUERIES.items():
+        for query in queries:
+            total, _ = index.search(query, args.limit)
+            ms = timings(lambda: index.search(query, args.limit), args.repeat)
+            print(f'{name:<10}{query:<24}{total:>8,}{percentile(ms, 50):>10.2f}{percentile(ms, 95):>10.2f}')
+
+    client = app.test_client()
+    print()
+    print('/api/search のリクエスト全体')
+    for query in ('アイ', '星野 誕生日', '苺プロダクション'):
+        ms = timings(lambda: client.get('/api/search', query_string={'q': query, 'limit': args.limit}), args.repeat)
+        print(f'  {query:<24}{percentile(ms, 50):>10.2f}{percentile(ms, 95):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
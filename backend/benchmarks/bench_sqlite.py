@@ -0,0 +1,164 @@
+"""
+SQLite の同時読み書きのベンチマーク
+
+gunicorn のワーカーを想定した複数のプロセスから、同じ SQLite ファイルに対して
+読み込み（クイズ詳細・一覧）と回答送信を一定時間混ぜて実行し、
+スループットと「database is locked」などのエラー件数を比べる。
+
+- 従来: ロールバックジャーナル・既定の PRAGMA・リトライなし（SQLITE_TUNING=0）
+- WAL: src/utils/sqlite_tuning.py の PRAGMA と書き込みのリトライ（SQLITE_TUNING=1）
+
+使い方:
+    cd backend
+    python benchmarks/bench_sqlite.py --processes 4 --seconds 10 --write-ratio 0.3
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+MODES = (
+    ('従来', '0', 'DELETE'),
+    ('WAL', '1', 'WAL'),
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='SQLite の同時読み書きのベンチマーク')
+    parser.add_argument('--processes', type=int, default=4, help='同時に実行するプロセス数（ワーカー数）')
+    parser.add_argument('--seconds', type=float, default=10.0, help='各モードの計測時間')
+    parser.add_argument('--write-ratio', type=float, default=0.3, help='リクエストのうち回答送信の割合')
+    parser.add_argument('--quizzes', type=int, default=200)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--attempts', type=int, default=20000)
+    return parser.parse_args()
+
+
+def build_template(path, spec):
+    """データセットを入れた SQLite ファイルを作る（各モードはこのコピーを使う）"""
+    from src.main import create_app
+    from src.models.user import db
+    from dataset import build_dataset
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLITE_TUNING': False,
+        'ANSWER_INDEX_PRELOAD': False,
+    })
+    with app.app_context():
+        build_dataset(spec, log=lambda *_: None)
+        db.engine.dispose()
+
+
+def worker(db_path, tuning, spec_dict, write_ratio, start_at, seconds, seed, results):
+    """1プロセス分の負荷をかけ、件数とエラーを results に入れる"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['SQLITE_TUNING'] = tuning
+    os.environ['SKIP_SCHEMA_CHECK'] = '1'
+    # 500 エラーのトレースバックやリトライのログで出力が埋まらないようにする
+    logging.disable(logging.CRITICAL)
+
+    from src.main import create_app
+    from dataset import DatasetSpec, correct_choice_id, question_ids
+
+    spec = DatasetSpec(**spec_dict)
+    rng = random.Random(seed)
+    client = create_app().test_client()
+
+    counts = {'read': 0, 'write': 0, 'errors': 0, 'write_ms': []}
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        quiz_id = rng.randint(1, spec.quizzes)
+        if rng.random() < write_ratio:
+            answers = [{
+                'question_id': question_id,
+                'selected_choice_id': correct_choice_id(spec, question_id) + rng.randrange(spec.choices_per_question)
+            } for question_id in question_ids(spec, quiz_id)]
+            started = time.perf_counter()
+            try:
+                response = client.post(f'/api/quizzes/{quiz_id}/submit', json={
+                    'user_id': rng.randint(1, spec.users), 'answers': answers, 'time_taken': rng.randint(30, 600)
+                })
+                ok = response.status_code == 201
+            except Exception:
+                ok = False
+            counts['write_ms'].append((time.perf_counter() - started) * 1000)
+            kind = 'write'
+        else:
+            url = f'/api/quizzes/{quiz_id}' if rng.random() < 0.5 else '/api/quizzes?limit=20'
+            try:
+                ok = client.get(url).status_code == 200
+            except Exception:
+                ok = False
+            kind = 'read'
+        counts[kind if ok else 'errors'] += 1
+    results.put(counts)
+
+
+def run_mode(template, tmp, name, tuning, journal_mode, args, spec):
+    db_path = os.path.join(tmp, f'bench_{tuning}.db')
+    shutil.copyfile(template, db_path)
+    connection = sqlite3.connect(db_path)
+    connection.execute(f'PRAGMA journal_mode={journal_mode}')
+    connection.close()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    # 全プロセスの起動（import とアプリ作成）を待ってから同時に始める
+    start_at = time.time() + 3.0
+    processes = [
+        context.Process(target=worker, args=(
+            db_path, tuning, spec.to_dict(), args.write_ratio, start_at, args.seconds, seed, results
+        ))
+        for seed in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    write_ms = sorted(ms for s in samples for ms in s['write_ms'])
+    reads = sum(s['read'] for s in samples)
+    writes = sum(s['write'] for s in samples)
+    errors = sum(s['errors'] for s in samples)
+    p95 = write_ms[int(0.95 * (len(write_ms) - 1))] if write_ms else 0.0
+    print(f'{name:<8}{reads / args.seconds:>10.1f}{writes / args.seconds:>10.1f}{errors:>8}{p95:>14.1f}')
+    return errors
+
+
+def main():
+    args = parse_args()
+    from dataset import DatasetSpec
+
+    spec = DatasetSpec(tags=10, quizzes=args.quizzes, questions_per_quiz=10,
+                       users=args.users, attempts=args.attempts)
+    tmp = tempfile.mkdtemp(prefix='bench_sqlite_')
+    try:
+        template = os.path.join(tmp, 'template.db')
+        print(f'データセットを作成中: {spec.to_dict()}')
+        build_template(template, spec)
+
+        print(f'{args.processes}プロセス・{args.seconds:.0f}秒・送信の割合 {args.write_ratio:.0%}')
+        print(f"{'':<8}{'読込/秒':>8}{'送信/秒':>8}{'エラー':>6}{'送信p95(ms)':>12}")
+        for name, tuning, journal_mode in MODES:
+            run_mode(template, tmp, name, tuning, journal_mode, args, spec)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
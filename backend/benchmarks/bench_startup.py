@@ -0,0 +1,93 @@
+"""
+起動時間（コールドスタート）の計測
+
+新しい Python プロセスで src.main の import からアプリ作成、最初のレスポンスまでの
+時間を計測し、中央値が予算（--budget-ms）を超えたら終了コード1で終わる。
+gunicorn の起動・max_requests によるワーカー再起動の時間の目安になる。
+
+使い方:
+    cd backend
+    python benchmarks/bench_startup.py                   # 既定の予算で計測
+    python benchmarks/bench_startup.py --runs 20 --budget-ms 400
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+# import から最初のレスポンスまでの予算（ミリ秒、中央値）
+DEFAULT_BUDGET_MS = 500
+
+# 子プロセスで実行するスクリプト（各段階の経過時間をJSONで出力する）
+CHILD = """
+import time
+started = time.perf_counter()
+import json
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app()
+created = time.perf_counter()
+response = app.test_client().get('/api/quizzes?limit=1')
+assert response.status_code == 200, response.status_code
+responded = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_response_ms': (responded - created) * 1000,
+    'total_ms': (responded - started) * 1000,
+}))
+"""
+
+
+def run_once(env):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(runs, env):
+    samples = [run_once(env) for _ in range(runs)]
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='起動時間の計測')
+    parser.add_argument('--runs', type=int, default=10, help='計測する起動回数')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='import から最初のレスポンスまでの予算（中央値、ミリ秒）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+        env.pop('SKIP_SCHEMA_CHECK', None)
+        # 1回目でテーブル作成とマイグレーションを済ませる（計測しない）
+        run_once(env)
+
+        results = {
+            'スキーマ確認あり': measure(args.runs, env),
+            'スキーマ確認なし': measure(args.runs, dict(env, SKIP_SCHEMA_CHECK='1')),
+        }
+
+    print(f"{'':<16}{'import':>10}{'create_app':>12}{'初回応答':>10}{'合計':>10}  (ms, {args.runs}回の中央値)")
+    for name, r in results.items():
+        print(f"{name:<14}{r['import_ms']:>10.1f}{r['create_app_ms']:>12.1f}"
+              f"{r['first_response_ms']:>10.1f}{r['total_ms']:>10.1f}")
+
+    total = results['スキーマ確認あり']['total_ms']
+    if total > args.budget_ms:
+        print(f'\n❌ 起動時間 {total:.1f}ms が予算 {args.budget_ms:.0f}ms を超えています')
+        return 1
+    print(f'\n✅ 起動時間 {total:.1f}ms（予算 {args.budget_ms:.0f}ms）')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
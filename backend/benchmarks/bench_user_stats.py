@@ -0,0 +1,110 @@
+"""
+ユーザーの成績（/api/users/<id>/stats）のベンチマーク
+
+合成データセットで、ユーザーの成績を次の方法で返す時間を比べる。
+
+- 累計行（user_stats）の読み込み（src/services/user_stats.py、エンドポイント全体）
+- quiz_attempts をユーザーごとに集計（全体・タグ別・難易度別の GROUP BY と挑戦日の一覧）
+
+あわせて、作り直し（rebuild-user-stats）の時間と、送信1件あたりの累計の加算時間を計測する。
+
+使い方:
+    cd backend
+    python benchmarks/bench_user_stats.py --users 200 --attempts 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def timings(func, repeat):
+    """repeat 回実行したそれぞれの時間（ミリ秒）"""
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        result.append((time.perf_counter() - started) * 1000)
+    return sorted(result)
+
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(p / 100 * (len(values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ユーザーの成績のベンチマーク')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--attempts', type=int, default=200000)
+    parser.add_argument('--quizzes', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.quiz import Quiz, QuizAttempt
+    from src.services import user_stats
+    from dataset import DatasetSpec, build_dataset
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SCHEMA_CHECK': False,
+                      'ANSWER_INDEX_PRELOAD': False})
+    spec = DatasetSpec(tags=20, quizzes=args.quizzes, questions_per_quiz=10, users=args.users,
+                       attempts=args.attempts)
+    with app.app_context():
+        db.create_all()
+        build_dataset(spec, log=lambda *_: None)
+        print(f'データ: ユーザー {args.users:,} / 挑戦 {args.attempts:,}'
+              f'（1人あたり約{args.attempts // args.users:,}件）')
+
+        started = time.perf_counter()
+        rows = user_stats.rebuild_user_stats()
+        print(f'作り直し: {time.perf_counter() - started:.2f}秒（{rows:,}行）')
+
+        def scan(user_id):
+            # 累計行がない場合の方法: リクエストごとに挑戦を集計する
+            attempts = db.select(
+                QuizAttempt.score, QuizAttempt.total_questions, QuizAttempt.rank, QuizAttempt.completed_at,
+                Quiz.oshi_tag_id, Quiz.difficulty
+            ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).where(QuizAttempt.user_id == user_id).subquery()
+            totals = (db.func.count(), db.func.sum(attempts.c.score), db.func.sum(attempts.c.total_questions),
+                      db.func.max(attempts.c.score * 100.0 / attempts.c.total_questions))
+            db.session.execute(db.select(*totals)).all()
+            db.session.execute(db.select(attempts.c.oshi_tag_id, *totals).group_by(attempts.c.oshi_tag_id)).all()
+            db.session.execute(db.select(attempts.c.difficulty, *totals).group_by(attempts.c.difficulty)).all()
+            db.session.execute(db.select(attempts.c.rank, db.func.count()).group_by(attempts.c.rank)).all()
+            db.session.execute(db.select(db.func.date(attempts.c.completed_at)).distinct()
+                               .order_by(db.func.date(attempts.c.completed_at))).all()
+
+        def record():
+            # 送信1件分の加算（全体・タグ・難易度の3行）
+            user_stats.record_attempt(QuizAttempt(
+                user_id=rng.randint(1, args.users), quiz_id=rng.randint(1, args.quizzes),
+                score=7, total_questions=10, rank='B', completed_at=datetime.utcnow()
+            ))
+            db.session.commit()
+
+        rng = random.Random(1)
+        client = app.test_client()
+        cases = {
+            '累計行を読む（エンドポイント全体）': lambda: client.get(f'/api/users/{rng.randint(1, args.users)}/stats'),
+            '挑戦をリクエストごとに集計（SQLのみ）': lambda: scan(rng.randint(1, args.users)),
+            '送信1件あたりの加算': record,
+        }
+        print()
+        print(f'  (ms, {args.repeat}回)')
+        print(f"{'':<36}{'p50':>8}{'p95':>8}")
+        for name, func in cases.items():
+            func()
+            values = timings(func, args.repeat)
+            print(f'{name:<36}{pct(values, 50):>8.2f}{pct(values, 95):>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+gunicorn のワーカーの種類（sync / gevent）の負荷試験
+
+gunicorn.conf.py の設定で実際に gunicorn を起動し、同時接続数を指定して
+読み込み（クイズ詳細・一覧）と回答送信を一定時間送り続け、
+スループット（req/s）とレイテンシ（p50/p99）を比べる。
+
+データベースは合成データを入れた SQLite ファイルを使う。PostgreSQL の
+ネットワーク往復を模擬するため、SQLの実行ごとに --db-latency-ms だけ待つ
+（gevent では time.sleep も協調的になるので、待ちの間に他のリクエストを処理できる）。
+SQLite は書き込みトランザクション中に待つと他の書き込みを止めてしまうため、
+トランザクション中のSQLでは待たない。
+PostgreSQL で計測する場合は --database-url を指定する（データは投入済みのこと）。
+
+使い方:
+    cd backend
+    python benchmarks/bench_workers.py --workers 2 --concurrency 64 --seconds 10 --db-latency-ms 5
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+MODES = ('sync', 'gevent')
+
+# gunicorn に読み込ませるアプリ（SQLの実行ごとに指定の時間だけ待つ）
+APP_MODULE = """
+import os
+import time
+from sqlalchemy import event
+from src.main import create_app
+from src.models.user import db
+
+app = create_app()
+_latency = float(os.environ.get('BENCH_DB_LATENCY_MS', '0')) / 1000
+if _latency:
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _wait(conn, *_):
+            # SQLite の書き込みトランザクション中に待つと、同じプロセスの他の書き込みが
+            # ロック待ちでプロセスごと止まるため、トランザクションの外でだけ待つ
+            if not getattr(conn.connection.dbapi_connection, 'in_transaction', False):
+                time.sleep(_latency)
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='gunicorn のワーカーの種類の負荷試験')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn のワーカー数')
+    parser.add_argument('--connections', type=int, default=100, help='gevent の worker_connections')
+    parser.add_argument('--concurrency', type=int, default=64, help='クライアントの同時接続数')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.1, help='リクエストのうち回答送信の割合')
+    parser.add_argument('--db-latency-ms', type=float, default=5.0, help='SQLごとに待つ時間（DBの往復の模擬）')
+    parser.add_argument('--database-url', help='計測に使うデータベース（省略時は合成データの SQLite）')
+    parser.add_argument('--quizzes', type=int, default=200)
+    parser.add_argument('--users', type=int, default=1000)
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(mode, args, database_url, tmp, port):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([tmp, BACKEND_DIR]),
+        DATABASE_URL=database_url,
+        SKIP_SCHEMA_CHECK='1',
+        GUNICORN_WORKER_CLASS=mode,
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_WORKER_CONNECTIONS=str(args.connections),
+        BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+         '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null', 'bench_app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    # 起動を待つ
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn（{mode}）が起動できませんでした')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'gunicorn（{mode}）の起動がタイムアウトしました')
+
+
+def client(port, spec, args, deadline, seed, latencies, counts):
+    """1つの接続（keep-alive）でリクエストを送り続ける"""
+    from dataset import correct_choice_id, question_ids
+
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.time() < deadline:
+        quiz_id = rng.randint(1, spec.quizzes)
+        if rng.random() < args.write_ratio:
+            body = json.dumps({
+                'user_id': rng.randint(1, spec.users),
+                'answers': [{
+                    'question_id': question_id,
+                    'selected_choice_id': correct_choice_id(spec, question_id) + rng.randrange(spec.choices_per_question)
+                } for question_id in question_ids(spec, quiz_id)],
+                'time_taken': rng.randint(30, 600)
+            })
+            request = ('POST', f'/api/quizzes/{quiz_id}/submit', body, {'Content-Type': 'application/json'})
+            expected = 201
+        elif rng.random() < 0.5:
+            request = ('GET', f'/api/quizzes/{quiz_id}', None, {})
+            expected = 200
+        else:
+            request = ('GET', '/api/quizzes?limit=20', None, {})
+            expected = 200
+
+        started = time.perf_counter()
+        try:
+            connection.request(*request)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == expected
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            ok = False
+        latencies.append((time.perf_counter() - started) * 1000)
+        counts['ok' if ok else 'errors'] += 1
+    connection.close()
+
+
+def run_mode(mode, args, spec, database_url, tmp):
+    port = free_port()
+    process = start_gunicorn(mode, args, database_url, tmp, port)
+    try:
+        latencies = []
+        counts = {'ok': 0, 'errors': 0}
+        deadline = time.time() + args.seconds
+        threads = [
+            threading.Thread(target=client, args=(port, spec, args, deadline, seed, latencies, counts))
+            for seed in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * (len(latencies) - 1)))] if latencies else 0.0
+
+    print(f'{mode:<8}{counts["ok"] / args.seconds:>10.1f}{pct(50):>10.1f}{pct(99):>10.1f}{counts["errors"]:>8}')
+
+
+def main():
+    args = parse_args()
+    from dataset import DatasetSpec
+    from bench_sqlite import build_template
+
+    spec = DatasetSpec(tags=10, quizzes=args.quizzes, questions_per_quiz=10, users=args.users, attempts=10000)
+    tmp = tempfile.mkdtemp(prefix='bench_workers_')
+    try:
+        with open(os.path.join(tmp, 'bench_app.py'), 'w', encoding='utf-8') as f:
+            f.write(APP_MODULE)
+        database_url = args.database_url
+        if not database_url:
+            path = os.path.join(tmp, 'bench.db')
+            print(f'データセットを作成中: {spec.to_dict()}')
+            build_template(path, spec)
+            database_url = f'sqlite:///{path}'
+
+        print(f'ワーカー {args.workers}・同時接続 {args.concurrency}・{args.seconds:.0f}秒・'
+              f'SQLごとの待ち {args.db_latency_ms}ms')
+        print(f"{'':<8}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'エラー':>6}")
+        for mode in MODES:
+            run_mode(mode, args, spec, database_url, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
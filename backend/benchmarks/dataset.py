@@ -0,0 +1,163 @@
+"""
+ベンチマーク用の合成データセット
+
+本番相当の件数（クイズ・問題・ユーザー・挑戦記録）を SQLite に一括投入する。
+件数は DatasetSpec で指定し、同じ指定・同じ乱数シードなら同じデータになる。
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from src.models.user import db, User
+from src.models.quiz import OshiTag, Quiz, Question, Choice, QuizAttempt, UserAnswer
+from src.services.grading import rank_for_percentage
+
+CATEGORIES = ('anime', 'manga', 'idol', 'vtuber', 'other')
+DIFFICULTIES = ('beginner', 'intermediate', 'advanced', 'mania')
+
+# executemany 1回あたりの行数
+CHUNK_SIZE = 50000
+
+
+class DatasetSpec:
+    """データセットの件数指定"""
+
+    def __init__(self, tags=20, quizzes=1000, questions_per_quiz=20, choices_per_question=4,
+                 users=10000, attempts=100000, answers_per_attempt=0, seed=42):
+        self.tags = tags
+        self.quizzes = quizzes
+        self.questions_per_quiz = questions_per_quiz
+        self.choices_per_question = choices_per_question
+        self.users = users
+        self.attempts = attempts
+        # 挑戦ごとに user_answers を作る件数（0なら作らない。挑戦数×問題数は大きくなりやすい）
+        self.answers_per_attempt = answers_per_attempt
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def _insert_chunks(model, rows):
+    """行のイテレーターを CHUNK_SIZE ずつ executemany で投入する"""
+    chunk = []
+    count = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            db.session.execute(db.insert(model), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(db.insert(model), chunk)
+        count += len(chunk)
+    db.session.commit()
+    return count
+
+
+def build_dataset(spec, log=print):
+    """
+    空のデータベースに spec の件数のデータを投入する
+
+    id は 1 から連番で振るので、子テーブルの外部キーは計算で求める。
+    最後にクイズ統計・ランキング・ユーザーの成績を再構築する。
+    """
+    from src.services.leaderboard import rebuild_leaderboards
+    from src.services.quiz_stats import recompute_quiz_stats
+    from src.services.user_stats import rebuild_user_stats
+
+    rng = random.Random(spec.seed)
+    base_time = datetime(2024, 1, 1)
+    q_per_quiz = spec.questions_per_quiz
+    c_per_q = spec.choices_per_question
+    total_questions = spec.quizzes * q_per_quiz
+
+    def step(name, model, rows):
+        started = time.perf_counter()
+        count = _insert_chunks(model, rows)
+        elapsed = time.perf_counter() - started
+        log(f'  {name:<13} {count:>10,}行 {elapsed:7.2f}秒')
+
+    step('users', User, ({
+        'id': i, 'username': f'user{i}', 'email': f'user{i}@bench.local'
+    } for i in range(1, spec.users + 1)))
+
+    step('oshi_tags', OshiTag, ({
+        'id': i, 'name': f'tag{i}', 'category': CATEGORIES[i % len(CATEGORIES)], 'description': ''
+    } for i in range(1, spec.tags + 1)))
+
+    step('quizzes', Quiz, ({
+        'id': i,
+        'creator_id': 1,
+        'title': f'ベンチマーク用クイズ {i}',
+        'description': f'ベンチマーク用のクイズです。全{q_per_quiz}問。',
+        'oshi_tag_id': (i % spec.tags) + 1,
+        'difficulty': DIFFICULTIES[i % len(DIFFICULTIES)],
+        'is_public': True,
+        'created_at': base_time + timedelta(minutes=i),
+        'updated_at': base_time + timedelta(minutes=i)
+    } for i in range(1, spec.quizzes + 1)))
+
+    step('questions', Question, ({
+        'id': i,
+        'quiz_id': (i - 1) // q_per_quiz + 1,
+        'question_text': f'問題 {i} の問題文です。正しいものはどれ？',
+        'question_type': 'multiple_choice',
+        'order_index': (i - 1) % q_per_quiz + 1,
+        'explanation': f'問題 {i} の解説です。'
+    } for i in range(1, total_questions + 1)))
+
+    # 各問題の最初の選択肢を正解にする（question_id から正解の choice_id を計算できる）
+    step('choices', Choice, ({
+        'id': i,
+        'question_id': (i - 1) // c_per_q + 1,
+        'choice_text': f'選択肢 {(i - 1) % c_per_q + 1}',
+        'is_correct': (i - 1) % c_per_q == 0,
+        'order_index': (i - 1) % c_per_q
+    } for i in range(1, total_questions * c_per_q + 1)))
+
+    def attempts():
+        for i in range(1, spec.attempts + 1):
+            score = rng.randint(0, q_per_quiz)
+            yield {
+                'id': i,
+                'user_id': rng.randint(1, spec.users),
+                'quiz_id': rng.randint(1, spec.quizzes),
+                'score': score,
+                'total_questions': q_per_quiz,
+                'time_taken': rng.randint(30, 600),
+                'rank': rank_for_percentage(score / q_per_quiz * 100),
+                'completed_at': base_time + timedelta(seconds=i)
+            }
+    step('quiz_attempts', QuizAttempt, attempts())
+
+    if spec.answers_per_attempt:
+        def answers():
+            for attempt_id in range(1, spec.attempts + 1):
+                for n in range(min(spec.answers_per_attempt, q_per_quiz)):
+                    question_id = rng.randint(1, total_questions)
+                    choice_offset = rng.randrange(c_per_q)
+                    yield {
+                        'attempt_id': attempt_id,
+                        'question_id': question_id,
+                        'selected_choice_id': (question_id - 1) * c_per_q + choice_offset + 1,
+                        'is_correct': choice_offset == 0,
+                        'answered_at': base_time
+                    }
+        step('user_answers', UserAnswer, answers())
+
+    started = time.perf_counter()
+    recompute_quiz_stats()
+    rebuild_leaderboards()
+    rebuild_user_stats()
+    log(f'  集計の再構築                {time.perf_counter() - started:7.2f}秒')
+
+
+def correct_choice_id(spec, question_id):
+    """build_dataset で作った問題の正解の choice_id"""
+    return (question_id - 1) * spec.choices_per_question + 1
+
+
+def question_ids(spec, quiz_id):
+    """build_dataset で作ったクイズの問題 id"""
+    first = (quiz_id - 1) * spec.questions_per_quiz + 1
+    return range(first, first + spec.questions_per_quiz)
@@ -1,23 +1,54 @@
 import multiprocessing
+import os
+
+# ワーカーの種類（GUNICORN_WORKER_CLASS）
+# - sync: 1ワーカーで同時に1リクエスト（従来）
+# - gevent: 1ワーカーで worker_connections 個のリクエストを協調的に並行処理する
+#   （DBの応答待ちの間に他のリクエストを処理できる。PostgreSQL 向け）
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+if worker_class == 'gevent':
+    # preload_app でアプリを読み込む前に標準ライブラリを協調的なものに置き換える
+    # （ロック・スレッド・ソケットがアプリの import 時に作られるため、ここで行う必要がある）
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        # psycopg2 の待ちを gevent のイベントループに任せる
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
 
 # Server socket
 bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker processes（Professional Plan最適化: 4GB RAM）
-workers = 4  # Professionalプランの潤沢なメモリを活用
-worker_class = 'sync'
-worker_connections = 1000
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))  # Professionalプランの潤沢なメモリを活用
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))  # gevent のみ有効
 timeout = 120  # 通常のタイムアウト設定
 keepalive = 5
 max_requests = 1000  # メモリリーク対策
 max_requests_jitter = 50
 
+# DB接続プールの大きさを1ワーカーの同時リクエスト数に合わせる（DB_POOL_SIZE で上書き）
+# sync は1リクエスト + 遅延書き込みのスレッド、gevent は同時リクエスト数に応じて増やすが、
+# 全ワーカーの合計が PostgreSQL の max_connections を超えないよう上限を設ける
+if worker_class == 'gevent':
+    os.environ.setdefault('DB_POOL_SIZE', str(min(worker_connections, 20)))
+else:
+    os.environ.setdefault('DB_POOL_SIZE', '2')
+
 # Logging
 accesslog = '-'
 errorlog = '-'
 loglevel = 'info'
 
 # パフォーマンス最適化
-preload_app = True  # アプリを事前読み込みして起動を高速化
+preload_app = True  # アプリを事前読み込みして起動を高速化（解答キーの索引もワーカー間で共有される）
+
 
+def worker_exit(server, worker):
+    """ワーカー終了時に遅延書き込み中の解答履歴を書き込む"""
+    from src.services import write_behind
+    write_behind.flush()
@@ -0,0 +1,216 @@
+"""
+クイズMarkdownの一括インポート
+
+ディレクトリ内のクイズMarkdown（parse_quiz.py と同じ書式）を
+プロセスプールで並列にパース・検証し、メインプロセスの1か所で
+Quiz / Question / Choice テーブルへ一括投入する。
+
+- ファイル名（拡張子なし）を推しタグ名として扱う（--tag で全ファイルを同じタグにできる）
+- 検証エラーのあるファイルは投入せず、行番号付きで報告する
+- 実行前からクイズがあるタグのファイルはスキップする（--force で追加投入）
+
+使い方:
+    python import_quizzes.py quizzes/ --category anime
+    python import_quizzes.py quizzes/ --dry-run      # パースと検証のみ
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parse_quiz import iter_file_events, build_parts, validate_question, QuizParseError
+
+CATEGORIES = ('anime', 'manga', 'idol', 'vtuber', 'other')
+
+
+class ParsedFile:
+    """1ファイル分のパース結果（ワーカーからメインプロセスへ渡す）"""
+
+    def __init__(self, path, parts, errors, size, parse_seconds):
+        self.path = path
+        self.parts = parts
+        self.errors = errors
+        self.size = size
+        self.parse_seconds = parse_seconds
+
+    @property
+    def tag_name(self):
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    @property
+    def question_count(self):
+        return sum(len(s['questions']) for part in self.parts for s in part['sets'])
+
+
+def parse_file(path):
+    """
+    1ファイルをパースして検証する（ワーカープロセスで実行）
+
+    パートが1つもない・問題が1問もない場合もエラーにする。
+    """
+    started = time.perf_counter()
+    errors = []
+
+    def checked(events):
+        for event in events:
+            if event['type'] == 'question':
+                for problem in validate_question(event):
+                    errors.append(f"{path}:{event['line']}: {problem}")
+            yield event
+
+    try:
+        parts = build_parts(checked(iter_file_events(path)))
+    except (OSError, UnicodeDecodeError, QuizParseError) as e:
+        parts = []
+        errors.append(f'{path}: {e}')
+
+    parsed = ParsedFile(path, parts, errors, os.path.getsize(path), time.perf_counter() - started)
+    if not errors and parsed.question_count == 0:
+        errors.append(f'{path}: 問題が見つかりません')
+    return parsed
+
+
+def find_markdown_files(directory):
+    """ディレクトリ直下の .md ファイルを名前順に返す"""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.md') and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def get_or_create_creator(username):
+    """投入者のユーザーを取得（なければ作成）する"""
+    from src.models.user import db, User
+
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        user = User(username=username, email=f'{username}@example.com')
+        db.session.add(user)
+        db.session.commit()
+        print(f'✅ ユーザー {username} を作成しました')
+    return user
+
+
+def get_or_create_tag(name, category):
+    """推しタグを取得（なければ作成）する"""
+    from src.models.user import db
+    from src.models.quiz import OshiTag
+
+    tag = OshiTag.query.filter_by(name=name).first()
+    if not tag:
+        tag = OshiTag(name=name, category=category, description=f'{name}のクイズ')
+        db.session.add(tag)
+        db.session.commit()
+        print(f'✅ タグ「{name}」を作成しました')
+    return tag
+
+
+def import_parsed(parsed, tag_name, category, creator_id, force=False, imported_tags=()):
+    """
+    パース済みの1ファイルを一括投入し、LoadStats を返す（スキップ時は None）
+
+    imported_tags はこの実行で投入済みのタグ名。--tag で複数ファイルを同じタグに
+    入れる場合、2ファイル目以降は既存クイズの確認をしない。
+    """
+    from src.models.user import db
+    from src.models.quiz import Quiz
+    from src.services.bulk_loader import load_parts
+
+    tag = get_or_create_tag(tag_name, category)
+    if not force and tag_name not in imported_tags:
+        existing = db.session.execute(
+            db.select(db.func.count()).select_from(Quiz).where(Quiz.oshi_tag_id == tag.id)
+        ).scalar()
+        if existing:
+            print(f'   - スキップ: タグ「{tag_name}」には既に {existing} 件のクイズがあります（--force で追加投入）')
+            return None
+
+    return load_parts(parsed.parts, oshi_tag_id=tag.id, creator_id=creator_id,
+                      title_prefix=f'【{tag_name}】')
+
+
+def run_import(files, category='anime', tag=None, creator='admin', workers=None,
+               dry_run=False, force=False):
+    """
+    files を並列にパースし、検証を通ったものから順に投入する
+
+    戻り値は検証エラーのあったファイル数。
+    """
+    started = time.perf_counter()
+    total_rows = 0
+    failed = 0
+    creator_id = None
+    imported_tags = set()
+
+    if not dry_run:
+        creator_id = get_or_create_creator(creator).id
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_file, path) for path in files]
+        for done, future in enumerate(as_completed(futures), 1):
+            parsed = future.result()
+            name = os.path.basename(parsed.path)
+            print(f'[{done}/{len(files)}] {name}: {parsed.question_count}問 '
+                  f'パース {parsed.parse_seconds:.2f}秒 '
+                  f'({parsed.size / 1024 / max(parsed.parse_seconds, 1e-9):,.0f} KiB/秒)')
+
+            if parsed.errors:
+                failed += 1
+                for error in parsed.errors[:20]:
+                    print(f'   ❌ {error}')
+                if len(parsed.errors) > 20:
+                    print(f'   ... ほか {len(parsed.errors) - 20} 件')
+                continue
+            if dry_run:
+                continue
+
+            tag_name = tag or parsed.tag_name
+            stats = import_parsed(parsed, tag_name, category, creator_id, force, imported_tags)
+            if stats:
+                imported_tags.add(tag_name)
+                total_rows += stats.rows
+                print(f'   ✓ {stats}')
+
+    if not dry_run:
+        from src.services import quiz_rankings
+        quiz_rankings.invalidate()
+
+    elapsed = time.perf_counter() - started
+    print(f'\n{len(files)}ファイル（エラー {failed}件）、{total_rows}行を {elapsed:.2f}秒で処理しました'
+          f'（{total_rows / elapsed if elapsed > 0 else 0:,.0f}行/秒）')
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='クイズMarkdownのディレクトリを一括インポートする')
+    parser.add_argument('directory', help='クイズMarkdown（*.md）のディレクトリ')
+    parser.add_argument('--category', choices=CATEGORIES, default='anime',
+                        help='新しく作るタグのカテゴリ')
+    parser.add_argument('--tag', help='全ファイルをこのタグで投入する（省略時はファイル名）')
+    parser.add_argument('--creator', default='admin', help='投入者のユーザー名')
+    parser.add_argument('--workers', type=int, help='パースに使うプロセス数（省略時はCPU数）')
+    parser.add_argument('--dry-run', action='store_true', help='パースと検証のみ行う')
+    parser.add_argument('--force', action='store_true', help='既にクイズがあるタグにも追加投入する')
+    args = parser.parse_args(argv)
+
+    files = find_markdown_files(args.directory)
+    if not files:
+        print(f'❌ {args.directory} に .md ファイルがありません')
+        return 1
+
+    options = dict(category=args.category, tag=args.tag, creator=args.creator,
+                   workers=args.workers, dry_run=args.dry_run, force=args.force)
+    if args.dry_run:
+        failed = run_import(files, **options)
+    else:
+        from src.main import app
+        with app.app_context():
+            failed = run_import(files, **options)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
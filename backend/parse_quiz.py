@@ -1,238 +1,269 @@
+"""
+【推しの子】究極クイズのMarkdownパーサー
+
+Markdownファイルを1行ずつ1回だけ読み進める状態機械で、パート・セット・問題を
+見つけた順にイベントとして返す。ファイル全体をメモリに載せないため、
+数万問規模の問題集でも使用メモリは一定。
+
+使い方:
+    python parse_quiz.py 問題集.md -o oshinoko_quiz_data.json   # パート→セット→問題のJSON
+    python parse_quiz.py 問題集.md --jsonl -o quiz.jsonl         # イベントを1行1件のJSONLで出力
+    python parse_quiz.py 問題集.md --jsonl -o -                  # 標準出力へ
+"""
+import argparse
 import re
 import json
-
-def parse_quiz_markdown(md_file_path):
-    """
-    【推しの子】究極クイズのMarkdownファイルをパースして、
-    クイズデータを構造化して返す
+import sys
+
+# パート見出し（## **第一部：初級編 ...）と難易度の対応
+PARTS = (
+    ('初級編', 'beginner'),
+    ('中級編', 'intermediate'),
+    ('上級編', 'mania'),  # 上級なのでmaniaレベルに設定
+)
+
+PART_HEADING = re.compile(r'^## \*\*第')
+SET_HEADING = re.compile(r'^### \*\*セット\d+[：:](.*?)\*\*')
+QUESTION_HEADING = re.compile(r'^問題\d+\s*$')
+CHOICE_LINE = re.compile(r'^([ABCD])\.\s*')
+ANSWER_LETTER = re.compile(r'([ABCD])\.')
+EXPLANATION_PREFIX = re.compile(r'^解説[：:]\s*')
+
+
+class QuizParseError(ValueError):
+    """Markdownの内容に問題がある（行番号付き）"""
+
+    def __init__(self, source, line_no, message):
+        super().__init__(f'{source}:{line_no}: {message}')
+        self.source = source
+        self.line_no = line_no
+
+
+class _Question:
+    """組み立て中の問題"""
+
+    def __init__(self, line_no):
+        self.line_no = line_no
+        self.question_text = ''
+        self.choices = []
+        self.correct_answer = ''
+        self.explanation = ''
+        self.mode = 'question'
+
+    def feed(self, line):
+        if CHOICE_LINE.match(line):
+            self.choices.append(CHOICE_LINE.sub('', line, count=1))
+            self.mode = 'choices'
+        elif line.startswith('答え'):
+            answer_match = ANSWER_LETTER.search(line)
+            if answer_match:
+                self.correct_answer = answer_match.group(1)
+            self.mode = 'answer'
+        elif line.startswith('解説'):
+            self.explanation = EXPLANATION_PREFIX.sub('', line)
+            self.mode = 'explanation'
+        elif self.mode == 'question':
+            if self.question_text:
+                self.question_text += ' ' + line
+            else:
+                self.question_text = line
+
+    def is_complete(self):
+        # 問題文と選択肢が両方存在する場合のみ問題として扱う
+        return bool(self.question_text) and len(self.choices) >= 2
+
+    def to_dict(self):
+        return {
+            'question_text': self.question_text,
+            'choices': self.choices,
+            'correct_answer': self.correct_answer,
+            'explanation': self.explanation
+        }
+
+
+def validate_question(question):
+    """問題の辞書を検査し、問題点のメッセージのリストを返す（問題なければ空）"""
+    problems = []
+    choices = question['choices']
+    answer = question['correct_answer']
+    if not question['question_text']:
+        problems.append('問題文がありません')
+    if not 2 <= len(choices) <= 4:
+        problems.append(f'選択肢の数が不正です（{len(choices)}個）')
+    if any(not choice for choice in choices):
+        problems.append('空の選択肢があります')
+    if not answer:
+        problems.append('答えがありません')
+    elif ord(answer) - ord('A') >= len(choices):
+        problems.append(f'答え {answer} に対応する選択肢がありません（選択肢{len(choices)}個）')
+    return problems
+
+
+def iter_quiz_events(lines, source='<input>', strict=False):
     """
-    with open(md_file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    Markdownの行を読み進め、イベントの辞書を順に返す
 
-    quizzes = []
-    current_part = None
-    current_set = None
-    current_quiz = None
-    current_question = None
+    - {'type': 'part', 'name', 'difficulty', 'line'}
+    - {'type': 'set', 'part', 'title', 'line'}        問題を1つ以上含むセットだけ
+    - {'type': 'question', 'part', 'set', 'question_text', 'choices',
+       'correct_answer', 'explanation', 'line'}
 
-    lines = content.split('\n')
-    i = 0
+    strict=True の場合、答えのない問題や選択肢にない答えを
+    QuizParseError（行番号付き）として報告する。
+    """
+    part = None
+    set_title = None
+    set_line = None
+    set_emitted = False
+    question = None
+    in_content = False
+
+    def finish_question():
+        nonlocal set_emitted
+        if question is None or not question.is_complete():
+            return
+        if strict:
+            problems = validate_question(question.to_dict())
+            if problems:
+                raise QuizParseError(source, question.line_no, problems[0])
+        if not set_emitted:
+            yield {'type': 'set', 'part': part['name'], 'title': set_title, 'line': set_line}
+            set_emitted = True
+        event = {'type': 'question', 'part': part['name'], 'set': set_title}
+        event.update(question.to_dict())
+        event['line'] = question.line_no
+        yield event
+
+    for line_no, raw in enumerate(lines, 1):
+        line = raw.strip()
+
+        # パートの検出
+        if PART_HEADING.match(line):
+            yield from finish_question()
+            question = None
+            set_title = None
+            part = None
+            in_content = False
+            for name, difficulty in PARTS:
+                if name in line:
+                    part = {'name': name, 'difficulty': difficulty}
+                    in_content = True
+                    yield {'type': 'part', 'name': name, 'difficulty': difficulty, 'line': line_no}
+                    break
+            continue
 
-    while i < len(lines):
-        line = lines[i].strip()
+        if not in_content:
+            continue
 
-        # 第一部、第二部、第三部の検出
-        if line.startswith('## **第'):
-            if '初級編' in line:
-                current_part = {'name': '初級編', 'difficulty': 'beginner', 'sets': []}
-            elif '中級編' in line:
-                current_part = {'name': '中級編', 'difficulty': 'intermediate', 'sets': []}
-            elif '上級編' in line:
-                current_part = {'name': '上級編', 'difficulty': 'advanced', 'sets': []}
+        # 引用文献などの見出しに到達したらパートの問題は終わり
+        if line.startswith('####'):
+            yield from finish_question()
+            question = None
+            set_title = None
+            in_content = False
+            continue
 
         # セットの検出
-        elif line.startswith('### **セット'):
-            set_title = line.replace('###', '').replace('**', '').strip()
-            set_title = re.sub(r'^セット\d+[:：]', '', set_title).strip()
-            current_set = {
-                'title': set_title,
-                'questions': []
-            }
-            if current_part:
-                current_part['sets'].append(current_set)
-
-        # 問題の検出
-        elif line.startswith('問題') and not line.startswith('問題文'):
-            # 新しい問題の開始
-            if current_question and current_set:
-                current_set['questions'].append(current_question)
-
-            current_question = {
-                'question_text': '',
-                'choices': [],
-                'correct_answer': '',
-                'explanation': ''
-            }
-            i += 1
+        set_match = SET_HEADING.match(line)
+        if set_match:
+            yield from finish_question()
+            set_title = set_match.group(1).strip()
+            set_line = line_no
+            set_emitted = False
+            # 「問題N」の見出しより前の行もひとつの問題ブロックとして扱う
+            question = _Question(line_no + 1)
             continue
 
-        # 問題文の収集
-        elif current_question is not None and not line.startswith(('A.', 'B.', 'C.', 'D.', '答え', '解説')):
-            if line and current_question['question_text'] == '':
-                current_question['question_text'] = line
-
-        # 選択肢の検出
-        elif line.startswith(('A.', 'B.', 'C.', 'D.')):
-            choice_text = line[3:].strip()
-            current_question['choices'].append(choice_text)
-
-        # 正解の検出
-        elif line.startswith('答え'):
-            answer_match = re.search(r'[ABCD]\.', line)
-            if answer_match:
-                current_question['correct_answer'] = answer_match.group()[0]
-
-        # 解説の検出
-        elif line.startswith('解説'):
-            explanation = line.replace('解説：', '').replace('解説:', '').strip()
-            current_question['explanation'] = explanation
-
-        # 引用文献セクションに到達したら終了
-        elif '引用文献' in line:
-            if current_question and current_set:
-                current_set['questions'].append(current_question)
-            break
-
-        i += 1
+        if set_title is None:
+            continue
 
-    # 最後の問題を追加
-    if current_question and current_set:
-        current_set['questions'].append(current_question)
+        # 問題の検出
+        if QUESTION_HEADING.match(line):
+            yield from finish_question()
+            question = _Question(line_no)
+            continue
 
-    # パートごとにクイズを整理
-    all_parts = []
+        if line:
+            question.feed(line)
 
-    # 初級編、中級編、上級編を探す
-    for part_data in [current_part]:  # この実装では最後のパートのみ保持されているので改善が必要
-        if part_data:
-            all_parts.append(part_data)
+    yield from finish_question()
 
-    return all_parts
 
-def extract_all_parts(md_file_path):
-    """
-    Markdownファイルから全てのパート（初級、中級、上級）を抽出
-    """
+def iter_file_events(md_file_path, strict=False):
+    """Markdownファイルを1行ずつ読み、イベントを順に返す"""
     with open(md_file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    parts = []
+        yield from iter_quiz_events(f, source=md_file_path, strict=strict)
 
-    # 第一部（初級編）を抽出
-    beginner_match = re.search(r'## \*\*第一部：初級編.*?\n(.*?)(?=## \*\*第二部|$)', content, re.DOTALL)
-    if beginner_match:
-        parts.append({
-            'name': '初級編',
-            'difficulty': 'beginner',
-            'content': beginner_match.group(1)
-        })
-
-    # 第二部（中級編）を抽出
-    intermediate_match = re.search(r'## \*\*第二部：中級編.*?\n(.*?)(?=## \*\*第三部|$)', content, re.DOTALL)
-    if intermediate_match:
-        parts.append({
-            'name': '中級編',
-            'difficulty': 'intermediate',
-            'content': intermediate_match.group(1)
-        })
-
-    # 第三部（上級編）を抽出
-    advanced_match = re.search(r'## \*\*第三部：上級編.*?\n(.*?)(?=####|$)', content, re.DOTALL)
-    if advanced_match:
-        parts.append({
-            'name': '上級編',
-            'difficulty': 'mania',  # 上級なのでmaniaレベルに設定
-            'content': advanced_match.group(1)
-        })
-
-    # 各パートから問題を抽出
-    for part in parts:
-        part['sets'] = parse_questions_from_content(part['content'])
-        del part['content']
 
+def build_parts(events):
+    """イベント列をパート → セット → 問題の入れ子構造に組み立てる"""
+    parts = []
+    for event in events:
+        if event['type'] == 'part':
+            parts.append({'name': event['name'], 'difficulty': event['difficulty'], 'sets': []})
+        elif event['type'] == 'set':
+            parts[-1]['sets'].append({'title': event['title'], 'questions': []})
+        elif event['type'] == 'question':
+            parts[-1]['sets'][-1]['questions'].append({
+                'question_text': event['question_text'],
+                'choices': event['choices'],
+                'correct_answer': event['correct_answer'],
+                'explanation': event['explanation']
+            })
     return parts
 
-def parse_questions_from_content(content):
+
+def extract_all_parts(md_file_path, strict=False):
     """
-    コンテンツから問題を抽出
+    Markdownファイルから全てのパート（初級、中級、上級）を抽出
     """
-    sets = []
-
-    # セットを分割
-    set_pattern = r'### \*\*セット\d+[：:](.*?)\*\*\n(.*?)(?=### \*\*セット|$)'
-    set_matches = re.finditer(set_pattern, content, re.DOTALL)
-
-    for set_match in set_matches:
-        set_title = set_match.group(1).strip()
-        set_content = set_match.group(2)
-
-        questions = []
+    return build_parts(iter_file_events(md_file_path, strict=strict))
 
-        # 問題を分割
-        question_blocks = re.split(r'\n問題\d+\s*\n', set_content)
 
-        for block in question_blocks:
-            if not block.strip():
-                continue
-
-            question = parse_single_question(block)
-            if question:
-                questions.append(question)
-
-        if questions:
-            sets.append({
-                'title': set_title,
-                'questions': questions
-            })
-
-    return sets
-
-def parse_single_question(block):
+def parse_quiz_markdown(md_file_path):
     """
-    単一の問題ブロックをパース
+    【推しの子】究極クイズのMarkdownファイルをパースして、
+    クイズデータを構造化して返す（extract_all_parts と同じ）
     """
-    lines = block.strip().split('\n')
-
-    question_data = {
-        'question_text': '',
-        'choices': [],
-        'correct_answer': '',
-        'explanation': ''
-    }
-
-    mode = 'question'
-
-    for line in lines:
-        line = line.strip()
-
-        if not line:
-            continue
-
-        # 選択肢の検出
-        if re.match(r'^[ABCD]\.', line):
-            choice_text = line[3:].strip()
-            question_data['choices'].append(choice_text)
-            mode = 'choices'
-
-        # 答えの検出
-        elif line.startswith('答え'):
-            answer_match = re.search(r'([ABCD])\.', line)
-            if answer_match:
-                question_data['correct_answer'] = answer_match.group(1)
-            mode = 'answer'
-
-        # 解説の検出
-        elif line.startswith('解説'):
-            explanation = re.sub(r'^解説[：:]\s*', '', line)
-            question_data['explanation'] = explanation
-            mode = 'explanation'
-
-        # 問題文の収集
-        elif mode == 'question':
-            if question_data['question_text']:
-                question_data['question_text'] += ' ' + line
+    return extract_all_parts(md_file_path)
+
+
+def write_jsonl(events, out):
+    """イベントを1行1件のJSONとして書き出し、件数を返す"""
+    count = 0
+    for event in events:
+        out.write(json.dumps(event, ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='クイズのMarkdownをJSON/JSONLに変換する')
+    parser.add_argument('md_path', nargs='?',
+                        default='/Users/daisukeinoue/APP開発/推しの子クイズ/【推しの子】究極クイズ（4択選択式）.md')
+    parser.add_argument('-o', '--output',
+                        default='/Users/daisukeinoue/APP開発/推しの子クイズ/oshi-quiz-deploy/backend/oshinoko_quiz_data.json',
+                        help='出力先（- で標準出力）')
+    parser.add_argument('--jsonl', action='store_true', help='イベントをJSONLで逐次出力する')
+    parser.add_argument('--strict', action='store_true', help='答えの欠落などをエラーにする')
+    args = parser.parse_args(argv)
+
+    events = iter_file_events(args.md_path, strict=args.strict)
+    try:
+        if args.jsonl:
+            if args.output == '-':
+                count = write_jsonl(events, sys.stdout)
             else:
-                question_data['question_text'] = line
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    count = write_jsonl(events, f)
+            print(f'{count}件のイベントを書き出しました', file=sys.stderr)
+            return 0
 
-    # 問題文と選択肢が両方存在する場合のみ返す
-    if question_data['question_text'] and len(question_data['choices']) >= 2:
-        return question_data
-
-    return None
-
-if __name__ == '__main__':
-    md_path = '/Users/daisukeinoue/APP開発/推しの子クイズ/【推しの子】究極クイズ（4択選択式）.md'
-    parts = extract_all_parts(md_path)
+        parts = build_parts(events)
+    except QuizParseError as e:
+        print(f'❌ {e}', file=sys.stderr)
+        return 1
 
     print(f"抽出されたパート数: {len(parts)}")
 
@@ -247,8 +278,14 @@ if __name__ == '__main__':
             print(f"    セット{i}: {quiz_set['title']} ({len(quiz_set['questions'])}問)")
 
     # JSONとして保存
-    output_path = '/Users/daisukeinoue/APP開発/推しの子クイズ/oshi-quiz-deploy/backend/oshinoko_quiz_data.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(parts, f, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        json.dump(parts, sys.stdout, ensure_ascii=False, indent=2)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(parts, f, ensure_ascii=False, indent=2)
+        print(f"\n問題データを {args.output} に保存しました")
+    return 0
+
 
-    print(f"\n問題データを {output_path} に保存しました")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,24 +1,22 @@
 """
-100問版シードデータ - Professional Plan対応（バッチ処理）
-推しの子クイズ（100問）を段階的に投入
+100問版シードデータ
+推しの子クイズ（100問）を一括INSERTで投入
 """
 import os
 import sys
-import json
-import time
 
 # Flaskアプリのコンテキストをインポート
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.models.user import db, User
-from src.models.quiz import Quiz, Question, Choice, OshiTag
+from src.models.quiz import OshiTag
+from src.services.bulk_loader import load_quiz_file
 
-def seed_data_batch(batch_size=20):
+def seed_data_bulk():
     """
-    バッチ処理でシードデータを投入（Professional Plan対応）
+    一括INSERTでシードデータを投入する
 
-    Args:
-        batch_size: 一度に処理する問題数（デフォルト20問）
+    クイズ・問題・選択肢を集合単位でINSERTし、パートごとにコミットする。
     """
 
     # ユーザーを作成
@@ -51,104 +49,30 @@ def seed_data_batch(batch_size=20):
         print(f'❌ エラー: {json_path} が見つかりません')
         return
 
-    with open(json_path, 'r', encoding='utf-8') as f:
-        quiz_data = json.load(f)
-
     print('📚 【推しの子】クイズデータを投入中...')
-    print(f'   バッチサイズ: {batch_size}問ずつ処理')
-
-    quiz_count = 0
-    question_count = 0
-
-    # 各難易度のクイズを作成
-    for part in quiz_data:
-        difficulty = part['difficulty']
-        part_name = part['name']
-
-        # 各セットをクイズとして作成
-        for set_data in part['sets']:
-            set_title = set_data['title']
-            questions = set_data['questions']
-
-            # クイズタイトルを生成
-            quiz_title = f'【推しの子】{part_name} - {set_title}'
-
-            # クイズの説明を生成
-            quiz_description = f'{part_name}の{set_title}に関する問題です。全{len(questions)}問。'
-
-            # クイズを作成
-            quiz = Quiz(
-                creator_id=admin.id,
-                title=quiz_title,
-                description=quiz_description,
-                oshi_tag_id=oshinoko_tag.id,
-                difficulty=difficulty,
-                is_public=True
-            )
-            db.session.add(quiz)
-            db.session.flush()
-            quiz_count += 1
-
-            print(f'   📝 クイズ作成: {quiz_title} ({len(questions)}問)')
-
-            # 問題をバッチ処理で作成
-            total_questions = len(questions)
-            for batch_start in range(0, total_questions, batch_size):
-                batch_end = min(batch_start + batch_size, total_questions)
-                batch_questions = questions[batch_start:batch_end]
-
-                # バッチ内の各問題を処理
-                for q_index, q_data in enumerate(batch_questions, batch_start + 1):
-                    question_text = q_data['question_text']
-                    choices_list = q_data['choices']
-                    correct_answer = q_data['correct_answer']  # A, B, C, D
-                    explanation = q_data.get('explanation', '')
-
-                    # 問題タイプを判定（選択肢が2つなら○×、4つなら4択）
-                    question_type = 'true_false' if len(choices_list) == 2 else 'multiple_choice'
-
-                    question = Question(
-                        quiz_id=quiz.id,
-                        question_text=question_text,
-                        question_type=question_type,
-                        order_index=q_index,
-                        explanation=explanation
-                    )
-                    db.session.add(question)
-                    db.session.flush()
-                    question_count += 1
-
-                    # 選択肢を作成
-                    correct_index = ord(correct_answer) - ord('A')  # A=0, B=1, C=2, D=3
-
-                    for c_index, choice_text in enumerate(choices_list):
-                        is_correct = (c_index == correct_index)
-
-                        choice = Choice(
-                            question_id=question.id,
-                            choice_text=choice_text,
-                            is_correct=is_correct,
-                            order_index=c_index
-                        )
-                        db.session.add(choice)
 
-                # バッチごとにコミット（メモリ解放）
-                db.session.commit()
-                print(f'      ✓ 問題 {batch_start + 1}~{batch_end} を投入完了')
+    def report(part, stats):
+        print(f"   ✓ {part['name']}: {len(part['sets'])}クイズを投入完了")
 
-                # メモリ解放のため少し待機（無料プラン対策）
-                if batch_end < total_questions:
-                    time.sleep(0.1)
+    stats = load_quiz_file(
+        json_path,
+        oshi_tag_id=oshinoko_tag.id,
+        creator_id=admin.id,
+        title_prefix='【推しの子】',
+        on_part=report
+    )
 
     print('\n✅ 【推しの子】クイズデータの投入が完了しました！')
-    print(f'   - クイズ数: {quiz_count}個')
-    print(f'   - 総問題数: {question_count}問')
+    print(f'   - クイズ数: {stats.quizzes}個')
+    print(f'   - 総問題数: {stats.questions}問')
+    print(f'   - {stats}')
+    return stats
 
 def seed_data():
     """
-    メイン関数：バッチサイズ20で実行（Professional Plan対応）
+    メイン関数：一括INSERTで投入する
     """
-    seed_data_batch(batch_size=20)
+    return seed_data_bulk()
 
 if __name__ == '__main__':
     from src.main import app
@@ -0,0 +1,101 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('recompute-quiz-stats')
+@with_appcontext
+def recompute_quiz_stats_command():
+    """quiz_attempts からクイズ統計（挑戦回数・平均正答率）を再構築する"""
+    from src.services.quiz_stats import recompute_quiz_stats
+
+    count = recompute_quiz_stats()
+    click.echo(f'✅ {count}件のクイズ統計を再構築しました')
+
+
+@click.command('rebuild-leaderboards')
+@with_appcontext
+def rebuild_leaderboards_command():
+    """quiz_attempts からクイズ別ランキング（上位K件）を作り直す"""
+    from src.services.leaderboard import rebuild_leaderboards
+
+    count = rebuild_leaderboards()
+    click.echo(f'✅ ランキングを再構築しました（{count}件）')
+
+
+@click.command('rebuild-user-stats')
+@with_appcontext
+def rebuild_user_stats_command():
+    """quiz_attempts からユーザーごとの成績の累計（全体・タグ別・難易度別）を作り直す"""
+    from src.services.user_stats import rebuild_user_stats
+
+    count = rebuild_user_stats()
+    click.echo(f'✅ ユーザーの成績を再構築しました（{count}行）')
+
+
+@click.command('compute-question-analytics')
+@click.option('--quiz-id', type=int, default=None, help='このクイズの問題だけ集計する')
+@click.option('--chunk-rows', type=int, default=None, help='一度に読む回答の行数')
+@with_appcontext
+def compute_question_analytics_command(quiz_id, chunk_rows):
+    """user_answers から問題ごとの分析（選択肢の分布・正答率・識別力）を作り直す"""
+    from src.services import question_analytics
+
+    result = question_analytics.compute(
+        quiz_id=quiz_id, chunk_rows=chunk_rows or question_analytics.CHUNK_ROWS,
+        log=lambda message: click.echo(f'  {message}')
+    )
+    click.echo(f"✅ {result['questions']}問の分析を作成しました"
+               f"（回答 {result['rows']:,}行, {result['backend']}, {result['seconds']:.1f}秒）")
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """未適用のマイグレーションを適用する"""
+    from src import migrations
+
+    done = migrations.upgrade()
+    if not done:
+        click.echo('適用するマイグレーションはありません')
+
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """マイグレーションの適用状況を表示する"""
+    from src import migrations
+
+    applied = migrations.applied_versions()
+    for version, description, _ in migrations.MIGRATIONS:
+        mark = '✅' if version in applied else '  '
+        click.echo(f'{mark} {version:>3} {description}')
+
+
+@click.command('check-indexes')
+@with_appcontext
+def check_indexes_command():
+    """主要クエリの実行計画を表示し、全件走査やORDER BYのソート、使うべきインデックスの未使用があれば終了コード1で終わる（SQLite）"""
+    from src.query_plans import check_index_usage
+
+    failed = False
+    for name, plan, scans in check_index_usage():
+        click.echo(f'{"NG" if scans else "OK"}  {name}')
+        for detail in plan:
+            click.echo(f'      {detail}')
+        for problem in scans:
+            if problem not in plan:
+                click.echo(f'      ! {problem}')
+        failed = failed or bool(scans)
+    if failed:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    """Flask CLI コマンドを登録する"""
+    app.cli.add_command(recompute_quiz_stats_command)
+    app.cli.add_command(rebuild_leaderboards_command)
+    app.cli.add_command(rebuild_user_stats_command)
+    app.cli.add_command(compute_question_analytics_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_status_command)
+    app.cli.add_command(check_indexes_command)
@@ -6,132 +6,183 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.quiz import quiz_bp
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
-
-# CORS設定 - フロントエンドからのアクセスを許可
-CORS(app, resources={r"/api/*": {"origins": "*"}})
-
-# ブループリントの登録
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(quiz_bp, url_prefix='/api')
-
-# データベース設定
-database_url = os.environ.get('DATABASE_URL')
-if database_url:
-    # Render.comのPostgreSQL URLを修正
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-
-    # SSL設定を追加（PostgreSQL接続エラー対策）
-    if '?' not in database_url:
-        database_url += '?sslmode=require'
-
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-    }
-else:
+
+
+def _database_config():
+    """環境変数 DATABASE_URL からデータベース設定を作る"""
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url and database_url.startswith('sqlite'):
+        # SQLiteのURLが明示的に指定された場合（ベンチマークなど）
+        return {'SQLALCHEMY_DATABASE_URI': database_url}
+    if database_url:
+        # Render.comのPostgreSQL URLを修正
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+        # SSL設定を追加（PostgreSQL接続エラー対策）
+        if '?' not in database_url:
+            database_url += '?sslmode=require'
+
+        # 接続プールの大きさ（gunicorn.conf.py がワーカーの同時リクエスト数に合わせて設定する）
+        pool_size = int(os.environ.get('DB_POOL_SIZE', 5))
+        return {
+            'SQLALCHEMY_DATABASE_URI': database_url,
+            'SQLALCHEMY_ENGINE_OPTIONS': {
+                'pool_pre_ping': True,
+                'pool_recycle': 300,
+                'pool_size': pool_size,
+                'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', pool_size)),
+                'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            }
+        }
     # ローカル開発環境ではSQLiteを使用
     db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'database', 'app.db'))
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    return {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}"}
+
+
+def create_app(config=None):
+    """
+    アプリケーションを作成する
+
+    config で設定を上書きできる。SCHEMA_CHECK が有効（既定）なら
+    起動時に1回だけスキーマを確認する（SKIP_SCHEMA_CHECK=1 で省略）。
+    """
+    from src.utils import compression, metrics, sqlite_tuning
+    from src.commands import register_commands
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    app.config.update(_database_config())
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # 解答履歴（user_answers）をバックグラウンドでまとめて書き込む（イベント時の負荷対策）
+    app.config['ANSWER_WRITE_BEHIND'] = os.environ.get('ANSWER_WRITE_BEHIND', '0') == '1'
+
+    # レスポンスにSQLの実行件数・時間のヘッダーを付ける（開発・負荷試験用）
+    app.config['SQL_QUERY_COUNT_HEADER'] = os.environ.get('SQL_QUERY_COUNT_HEADER', '0') == '1'
+
+    # マイグレーション適用済みの環境では起動時のスキーマ確認を省略できる
+    app.config['SCHEMA_CHECK'] = os.environ.get('SKIP_SCHEMA_CHECK', '0') != '1'
+
+    # 解答キーの索引を起動時（preload_app ならフォーク前）に作っておく
+    app.config['ANSWER_INDEX_PRELOAD'] = os.environ.get('ANSWER_INDEX_PRELOAD', '1') == '1'
+
+    # 検索の索引を起動時に作る（既定は最初の検索時に作る）
+    app.config['SEARCH_INDEX_PRELOAD'] = os.environ.get('SEARCH_INDEX_PRELOAD', '0') == '1'
+
+    # ファイルの SQLite で WAL・PRAGMA・書き込みのリトライを使う（SQLITE_TUNING=0 で従来の設定）
+    app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') == '1'
+
+    # レスポンスの gzip / brotli 圧縮（COMPRESSION=0 で無効）
+    app.config['COMPRESSION'] = os.environ.get('COMPRESSION', '1') == '1'
+
+    # JSONのエンコーダー（auto: orjson があれば使う / stdlib: 標準の json）
+    app.config['JSON_BACKEND'] = os.environ.get('JSON_BACKEND', 'auto')
+
+    if config:
+        app.config.update(config)
+
+    # orjson があれば使う JSON プロバイダー
+    from src.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    # CORS設定 - フロントエンドからのアクセスを許可
+    CORS(app, resources={r"/api/*": {
+        "origins": "*",
+        "expose_headers": ["X-Next-Cursor", metrics.QUERY_COUNT_HEADER, metrics.SQL_TIME_HEADER]
+    }})
+
+    # データベースの初期化
+    db.init_app(app)
+
+    # リクエストごとの処理時間・SQL件数の計測
+    metrics.init_app(app)
 
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # キャッシュしていないJSONレスポンスの圧縮
+    compression.init_app(app)
+
+    # ブループリントの登録
+    from src.routes.core import core_bp
+    from src.routes.user import user_bp
+    from src.routes.quiz import quiz_bp
+    app.register_blueprint(core_bp)
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(quiz_bp, url_prefix='/api')
+
+    # CLIコマンドの登録（flask --app src.main <command>）
+    register_commands(app)
+
+    with app.app_context():
+        # ファイルの SQLite なら接続ごとに WAL などの PRAGMA を設定する
+        sqlite_tuning.init_app(app)
+
+        # 起動時のスキーマ確認（シードデータは手動）と解答キーの索引の作成
+        if app.config['SCHEMA_CHECK']:
+            init_db()
+        if app.config['ANSWER_INDEX_PRELOAD']:
+            warm_answer_index()
+        if app.config['SEARCH_INDEX_PRELOAD']:
+            warm_search_index()
+        # フォーク前に開いた接続をワーカーに引き継がない（メモリ上のSQLiteは除く）
+        if db.engine.url.database not in (None, '', ':memory:'):
+            db.engine.dispose()
+
+    return app
 
-# データベースの初期化
-db.init_app(app)
 
-# 起動時の初期化処理（テーブル作成のみ、高速化）
 def init_db():
-    """データベーステーブルを作成する"""
-    try:
-        from src.models.quiz import Quiz, Question, Choice, QuizAttempt, UserAnswer, OshiTag
-        from src.models.user import User
+    """
+    足りないテーブルを作成し、未適用のマイグレーションを適用する
+
+    テーブル一覧は1回だけ取得し、全て揃っていれば create_all を省略する。
+    """
+    from src import migrations
+    import src.models.quiz  # noqa: F401  全モデルをメタデータに登録する
 
-        print('データベーステーブルを作成中...')
-        db.create_all()
-        print('✅ データベーステーブルの作成が完了しました')
+    try:
+        existing = set(db.inspect(db.engine).get_table_names())
+        missing = sorted(set(db.metadata.tables) - existing)
+        if missing:
+            print(f'データベーステーブルを作成中: {", ".join(missing)}')
+            db.create_all()
+        migrations.upgrade()
     except Exception as e:
         print(f'⚠ データベース初期化エラー: {e}')
         import traceback
         traceback.print_exc()
 
-# アプリ起動時にデータベーステーブルを作成のみ（シードデータは手動）
-with app.app_context():
-    init_db()
-
-# ヘルスチェックエンドポイント
-@app.route('/')
-def health_check():
-    return {'status': 'ok', 'message': 'Oshi-Katsu Quiz API is running'}
-
-@app.route('/api')
-def api_info():
-    return {
-        'name': 'Oshi-Katsu Quiz API',
-        'version': '1.0.0',
-        'endpoints': {
-            'quizzes': '/api/quizzes',
-            'tags': '/api/tags',
-            'users': '/api/users',
-            'seed': '/api/seed (POST)'
-        }
-    }
 
-# シードデータ投入エンドポイント（デプロイ後に一度だけ実行）
-@app.route('/api/seed', methods=['POST'])
-def seed_data_endpoint():
-    """
-    シードデータを投入する（管理者用）
+def warm_answer_index():
+    """解答キーの索引を作る（失敗しても起動は続け、最初の採点時に作る）"""
+    from src.services import answer_index
 
-    100問を5問ずつバッチ処理で投入します。
-    無料プランのメモリ制約に対応しています。
-    """
     try:
-        from src.models.quiz import Quiz, Question
-
-        # 既にデータが存在する場合はスキップ
-        count = db.session.execute(db.select(db.func.count()).select_from(Quiz)).scalar()
-        if count > 0:
-            return {
-                'status': 'skipped',
-                'message': f'既存のクイズデータが {count} 件存在します',
-                'count': count
-            }, 200
-
-        # シードデータを投入（バッチ処理）
-        import sys
-        import os
-        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        sys.path.insert(0, backend_dir)
-
-        import seed_data
-        print('📚 100問版シードデータの投入を開始します（バッチ処理）')
-        seed_data.seed_data()
-
-        # 投入後のカウント
-        new_count = db.session.execute(db.select(db.func.count()).select_from(Quiz)).scalar()
-        question_count = db.session.execute(db.select(db.func.count()).select_from(Question)).scalar()
+        answer_index.warm()
+    except Exception as e:
+        print(f'⚠ 解答キーの索引の作成に失敗しました: {e}')
 
-        return {
-            'status': 'success',
-            'message': '100問版シードデータの投入が完了しました',
-            'quiz_count': new_count,
-            'question_count': question_count
-        }, 200
+
+def warm_search_index():
+    """検索の索引を作る（失敗しても起動は続け、最初の検索時に作る）"""
+    from src.services import search_index
+
+    try:
+        search_index.warm()
     except Exception as e:
-        import traceback
-        return {
-            'status': 'error',
-            'message': str(e),
-            'traceback': traceback.format_exc()
-        }, 500
+        print(f'⚠ 検索の索引の作成に失敗しました: {e}')
+
+
+def __getattr__(name):
+    # `gunicorn src.main:app` や `from src.main import app` のために、
+    # 最初に参照されたときにアプリを作成する（import だけでは何もしない）
+    if name == 'app':
+        app = create_app()
+        globals()['app'] = app
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_ENV') != 'production')
-
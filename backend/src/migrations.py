@@ -0,0 +1,139 @@
+"""
+データベースのバージョン管理付きマイグレーション
+
+db.create_all() は新しいテーブルを作るだけで既存テーブルは変更しないため、
+既存のデータベースに対するカラム追加・インデックス追加などはここに
+バージョン番号付きで登録する。適用済みのバージョンは schema_migrations
+テーブルに記録され、未適用のものだけが番号順に1回ずつ実行される。
+
+各マイグレーションは、create_all で作られたばかりの新しいデータベースに
+対して実行されても問題ないように書くこと（存在確認をしてから変更する）。
+"""
+from datetime import datetime
+from src.models.user import db
+
+MIGRATIONS = []
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+def migration(version, description):
+    """マイグレーション関数を登録するデコレーター"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _columns(conn, table):
+    return {c['name'] for c in db.inspect(conn).get_columns(table)}
+
+
+def _create_indexes(conn, model):
+    """
+    モデルのインデックスをなければ作る
+
+    SQLite のリフレクションは式のインデックスを返さず checkfirst では存在を確認できない
+    ため、CREATE INDEX IF NOT EXISTS で作る。
+    """
+    for index in model.__table__.indexes:
+        conn.execute(db.schema.CreateIndex(index, if_not_exists=True))
+
+
+@migration(1, 'quizzes に統計の累計カラム（total_score / total_answered）を追加')
+def _add_quiz_totals(conn):
+    from src.services.quiz_stats import recompute_quiz_stats
+
+    for name in ('total_score', 'total_answered'):
+        if name not in _columns(conn, 'quizzes'):
+            conn.execute(db.text(f'ALTER TABLE quizzes ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'))
+    return recompute_quiz_stats
+
+
+@migration(2, 'quiz_leaderboard を quiz_attempts から作成')
+def _fill_leaderboard(conn):
+    from src.services.leaderboard import rebuild_leaderboards
+    return rebuild_leaderboards
+
+
+@migration(3, '一覧・採点・ランキング用のインデックスを追加')
+def _add_hot_path_indexes(conn):
+    from src.models.quiz import Quiz, Question, Choice, QuizAttempt, UserAnswer, LeaderboardEntry
+
+    for model in (Quiz, Question, Choice, QuizAttempt, UserAnswer, LeaderboardEntry):
+        _create_indexes(conn, model)
+
+
+@migration(4, 'user_stats（ユーザーごとの成績の累計）を quiz_attempts から作成')
+def _create_user_stats(conn):
+    from src.models.quiz import UserStat
+    from src.services.user_stats import rebuild_user_stats
+
+    UserStat.__table__.create(conn, checkfirst=True)
+    _create_indexes(conn, UserStat)
+    return rebuild_user_stats
+
+
+@migration(5, 'question_analytics（問題ごとの回答の分析結果）を追加')
+def _create_question_analytics(conn):
+    from src.models.quiz import QuestionAnalytics
+
+    # 中身は compute-question-analytics で作る（回答が多いと時間がかかるため起動時には集計しない）
+    QuestionAnalytics.__table__.create(conn, checkfirst=True)
+    _create_indexes(conn, QuestionAnalytics)
+
+
+@migration(6, 'quiz_leaderboard のインデックスをランキングの並び順（式）に合わせて作り直す')
+def _rebuild_leaderboard_index(conn):
+    from src.models.quiz import LeaderboardEntry
+
+    conn.execute(db.text('DROP INDEX IF EXISTS ix_quiz_leaderboard_order'))
+    _create_indexes(conn, LeaderboardEntry)
+
+
+@migration(7, 'quizzes に推しタグ・難易度で絞った一覧用のインデックスを追加')
+def _add_filtered_listing_indexes(conn):
+    from src.models.quiz import Quiz
+
+    _create_indexes(conn, Quiz)
+
+
+def applied_versions():
+    """適用済みのバージョン番号の集合"""
+    schema_migrations.create(db.engine, checkfirst=True)
+    with db.engine.connect() as conn:
+        return {row.version for row in conn.execute(db.select(schema_migrations.c.version))}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def upgrade():
+    """
+    未適用のマイグレーションを番号順に適用する。適用したバージョンのリストを返す
+
+    マイグレーションがデータの再構築処理（関数）を返した場合は、
+    スキーマ変更のコミット後にセッション経由で実行し、それが終わってから
+    バージョンを記録する。途中で失敗した場合は次回の起動時にやり直される。
+    """
+    done = []
+    for version, description, func in pending_migrations():
+        with db.engine.begin() as conn:
+            backfill = func(conn)
+        if backfill is not None:
+            backfill()
+        with db.engine.begin() as conn:
+            conn.execute(db.insert(schema_migrations).values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        print(f'✅ マイグレーション {version} を適用しました: {description}')
+        done.append(version)
+    return done
@@ -24,6 +24,8 @@ class Quiz(db.Model):
     difficulty = db.Column(db.String(20), nullable=False)  # beginner/intermediate/advanced/mania
     play_count = db.Column(db.Integer, default=0)
     average_score = db.Column(db.Float, default=0.0)
+    total_score = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 全挑戦の正解数の累計
+    total_answered = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 全挑戦の出題数の累計
     rating = db.Column(db.Float, default=0.0)
     rating_count = db.Column(db.Integer, default=0)
     is_public = db.Column(db.Boolean, default=True)
@@ -33,8 +35,26 @@ class Quiz(db.Model):
     questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan')
     attempts = db.relationship('QuizAttempt', backref='quiz', lazy=True)
     
+    __table_args__ = (
+        # 公開クイズ一覧（新着順のキーセットページネーション）
+        db.Index('ix_quizzes_public_created', 'is_public', created_at.desc(), id.desc()),
+        # 推しタグ・難易度で絞った一覧（同じく新着順のキーセットページネーション）
+        db.Index('ix_quizzes_public_tag_created', 'is_public', 'oshi_tag_id', created_at.desc(), id.desc()),
+        db.Index('ix_quizzes_public_difficulty_created', 'is_public', 'difficulty', created_at.desc(), id.desc()),
+        # 人気ランキング
+        db.Index('ix_quizzes_public_play_count', 'is_public', play_count.desc()),
+        db.Index('ix_quizzes_oshi_tag_id', 'oshi_tag_id'),
+    )
+    
     def to_dict(self, include_questions=False):
-        data = {
+        data = self.to_summary_dict(len(self.questions))
+        if include_questions:
+            data['questions'] = [q.to_dict() for q in self.questions]
+        return data
+
+    def to_summary_dict(self, question_count):
+        """一覧表示用の軽量なシリアライズ（questionsリレーションには触れない）"""
+        return {
             'id': self.id,
             'creator_id': self.creator_id,
             'title': self.title,
@@ -50,11 +70,8 @@ class Quiz(db.Model):
             'rating': self.rating,
             'rating_count': self.rating_count,
             'created_at': self.created_at.isoformat(),
-            'question_count': len(self.questions)
+            'question_count': question_count
         }
-        if include_questions:
-            data['questions'] = [q.to_dict() for q in self.questions]
-        return data
 
 class Question(db.Model):
     __tablename__ = 'questions'
@@ -69,6 +86,10 @@ class Question(db.Model):
     
     choices = db.relationship('Choice', backref='question', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('ix_questions_quiz_order', 'quiz_id', 'order_index'),
+    )
+    
     def to_dict(self, include_answer=False):
         data = {
             'id': self.id,
@@ -90,6 +111,10 @@ class Choice(db.Model):
     is_correct = db.Column(db.Boolean, default=False)
     order_index = db.Column(db.Integer, nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_choices_question_order', 'question_id', 'order_index'),
+    )
+    
     def to_dict(self, include_answer=False):
         data = {
             'id': self.id,
@@ -114,6 +139,12 @@ class QuizAttempt(db.Model):
     
     answers = db.relationship('UserAnswer', backref='attempt', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # クイズ別ランキング（スコア降順・時間昇順）と統計の再集計
+        db.Index('ix_quiz_attempts_ranking', 'quiz_id', score.desc(), 'time_taken'),
+        db.Index('ix_quiz_attempts_user_id', 'user_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -137,6 +168,11 @@ class UserAnswer(db.Model):
     is_correct = db.Column(db.Boolean, nullable=False)
     answered_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_user_answers_attempt_id', 'attempt_id'),
+        db.Index('ix_user_answers_question_id', 'question_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -145,3 +181,76 @@ class UserAnswer(db.Model):
             'is_correct': self.is_correct
         }
 
+
+# 時間が記録されていない挑戦をランキングの最後に並べるための値
+# （ORDER BY とインデックスで同じ式にするため、バインド変数ではなくリテラルで埋め込む）
+UNKNOWN_TIME_TAKEN = 2 ** 31 - 1
+
+
+def ranking_time_taken(column):
+    """ランキングの並び順に使う time_taken の式（NULL を最後にする）"""
+    return db.func.coalesce(column, db.literal_column(str(UNKNOWN_TIME_TAKEN)))
+
+
+class LeaderboardEntry(db.Model):
+    """クイズ別ランキングの上位K件（送信時に更新し、読み込みは件数に依存しない）"""
+    __tablename__ = 'quiz_leaderboard'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempts.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    total_questions = db.Column(db.Integer, nullable=False)
+    time_taken = db.Column(db.Integer)  # seconds
+    rank_grade = db.Column(db.String(1))  # S/A/B/C/D
+    
+    __table_args__ = (
+        # NULLS LAST の ORDER BY はインデックスの並びと一致しないので、式のインデックスにする
+        db.Index('ix_quiz_leaderboard_rank', 'quiz_id', score.desc(), ranking_time_taken(time_taken), 'attempt_id'),
+    )
+
+
+class UserStat(db.Model):
+    """ユーザーごとの成績の累計（全体・タグ別・難易度別に1行ずつ、送信時に加算する）"""
+    __tablename__ = 'user_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)  # all/tag/difficulty
+    dimension_value = db.Column(db.String(50), nullable=False, default='')  # タグid・難易度（all は空文字）
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)  # 正解数の累計
+    total_answered = db.Column(db.Integer, nullable=False, default=0)  # 出題数の累計
+    best_percentage = db.Column(db.Float, nullable=False, default=0.0)
+    rank_s = db.Column(db.Integer, nullable=False, default=0)
+    rank_a = db.Column(db.Integer, nullable=False, default=0)
+    rank_b = db.Column(db.Integer, nullable=False, default=0)
+    rank_c = db.Column(db.Integer, nullable=False, default=0)
+    rank_d = db.Column(db.Integer, nullable=False, default=0)
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # 連続日数（UTC）
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_played_day = db.Column(db.Integer)  # 最後に遊んだ日（1970-01-01 からの日数、UTC）
+    
+    __table_args__ = (
+        db.Index('ix_user_stats_key', 'user_id', 'dimension', 'dimension_value', unique=True),
+    )
+
+
+class QuestionAnalytics(db.Model):
+    """問題ごとの回答の分析結果（分析ジョブで user_answers から作り直す）"""
+    __tablename__ = 'question_analytics'
+    
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    answers = db.Column(db.Integer, nullable=False, default=0)  # 回答数（未選択を含む）
+    skipped = db.Column(db.Integer, nullable=False, default=0)  # 選択肢を選ばなかった回答数
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_rate = db.Column(db.Float, nullable=False, default=0.0)
+    discrimination = db.Column(db.Float)  # 識別力（正誤と他の問題の正答率の相関、-1〜1）
+    choice_counts = db.Column(db.Text, nullable=False, default='{}')  # {"選択肢id": 選ばれた回数} のJSON
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_question_analytics_quiz_id', 'quiz_id'),
+    )
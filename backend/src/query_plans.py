@@ -0,0 +1,108 @@
+"""
+主要エンドポイントのクエリがインデックスを使っているかを確認する
+
+SQLite の EXPLAIN QUERY PLAN で各クエリの実行計画を取り、
+テーブルを先頭から全件読む "SCAN <table>"（インデックスなし）や、
+ORDER BY のための一時的なソート（USE TEMP B-TREE FOR ... ORDER BY）が
+含まれていないかを調べる。EXPECTED_INDEXES に挙げたクエリは、そのインデックスを
+使っているかも調べる（別のインデックスで読んで1行ずつ絞り込む計画は全件走査と
+ソートの確認だけでは見つからないため）。`flask --app src.main check-indexes` から使う。
+"""
+from datetime import datetime
+from src.models.user import db, User
+from src.models.quiz import Quiz, OshiTag
+
+# 使うべきインデックス（hot_queries の名前 → インデックス名）
+EXPECTED_INDEXES = {
+    'GET /api/quizzes?tag_id=&cursor=': 'ix_quizzes_public_tag_created',
+    'GET /api/quizzes?difficulty=&cursor=': 'ix_quizzes_public_difficulty_created',
+}
+
+
+def hot_queries():
+    """(名前, SELECT文) のリスト。各エンドポイントが実際に発行するクエリと同じもの"""
+    from src.services import grading, leaderboard, question_analytics, quiz_cache, quiz_listing, user_stats
+
+    fields = quiz_listing.QUIZ_LIST_FIELDS
+    listing = quiz_listing.listing_query(fields).filter(Quiz.is_public == True)
+    newest_first = (Quiz.created_at.desc(), Quiz.id.desc())
+    before = db.tuple_(Quiz.created_at, Quiz.id) < (datetime(2030, 1, 1), 1)
+    entries = leaderboard.entries
+
+    return [
+        ('GET /api/quizzes',
+         listing.order_by(*newest_first).limit(51)),
+        ('GET /api/quizzes?cursor=',
+         listing.filter(before).order_by(*newest_first).limit(51)),
+        ('GET /api/quizzes?tag_id=&cursor=',
+         listing.filter(Quiz.oshi_tag_id == 1, before).order_by(*newest_first).limit(51)),
+        ('GET /api/quizzes?difficulty=&cursor=',
+         listing.filter(Quiz.difficulty == 'beginner', before).order_by(*newest_first).limit(51)),
+        ('GET /api/quizzes?category=',
+         quiz_listing.listing_query(fields, join_tag=True)
+         .filter(Quiz.is_public == True, OshiTag.category == 'anime')
+         .order_by(*newest_first).limit(51)),
+        ('GET /api/rankings/quizzes',
+         listing.order_by(Quiz.play_count.desc(), Quiz.id).limit(10)),
+        ('GET /api/quizzes/<id> (questions)',
+         quiz_cache.questions_query(1)),
+        ('POST /api/quizzes/<id>/submit (answer key)',
+         grading.answer_key_query(1)),
+        ('POST /api/quizzes/<id>/submit (leaderboard cutoff)',
+         db.select(entries.c.score).where(entries.c.quiz_id == 1)
+         .order_by(*leaderboard.RANKING_ORDER).offset(99).limit(1)),
+        ('GET /api/quizzes/<id>/rankings',
+         leaderboard.leaderboard_query(1)),
+        ('GET /api/quizzes/<id>/analytics',
+         question_analytics.analytics_query(1)),
+        ('GET /api/users/<id>/stats',
+         user_stats.stats_query(1)),
+        ('GET /api/users',
+         db.session.query(User.id, User.username).filter(User.id > 1).order_by(User.id).limit(51)),
+    ]
+
+
+def _statement(query):
+    return query.statement if hasattr(query, 'statement') else query
+
+
+def explain(query):
+    """実行計画の detail 列のリストを返す（SQLiteのみ）"""
+    sql = str(_statement(query).compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+
+
+def full_scans(plan):
+    """インデックスを使わずにテーブル全体を読んでいる行を返す"""
+    return [
+        detail for detail in plan
+        if detail.startswith('SCAN ') and ' USING ' not in detail
+        and not detail.startswith(('SCAN (', 'SCAN CONSTANT ROW'))
+    ]
+
+
+def temp_sorts(plan):
+    """インデックスの順に読めず、ORDER BY のために結果をソートしている行を返す"""
+    return [detail for detail in plan if detail.startswith('USE TEMP B-TREE') and 'ORDER BY' in detail]
+
+
+def missing_index(plan, index):
+    """index を使っていなければ、そのことを示す行を返す"""
+    if any(f'INDEX {index} ' in detail or detail.endswith(f'INDEX {index}') for detail in plan):
+        return []
+    return [f'{index} を使っていない']
+
+
+def check_index_usage():
+    """[(名前, 実行計画, 全件走査・ソート・使っていないインデックスの行)] を返す"""
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('check_index_usage は SQLite でのみ実行できます')
+    results = []
+    for name, query in hot_queries():
+        plan = explain(query)
+        problems = full_scans(plan) + temp_sorts(plan)
+        if name in EXPECTED_INDEXES:
+            problems += missing_index(plan, EXPECTED_INDEXES[name])
+        results.append((name, plan, problems))
+    return results
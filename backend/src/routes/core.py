@@ -0,0 +1,94 @@
+import os
+import sys
+from flask import Blueprint, current_app
+from src.models.user import db
+from src.utils import metrics
+
+core_bp = Blueprint('core', __name__)
+
+# ヘルスチェックエンドポイント
+@core_bp.route('/')
+def health_check():
+    return {'status': 'ok', 'message': 'Oshi-Katsu Quiz API is running'}
+
+@core_bp.route('/api/_write_behind')
+def write_behind_status():
+    """解答履歴の遅延書き込みのキュー長・書き込み時間"""
+    from src.services import write_behind
+
+    result = write_behind.stats()
+    result['enabled'] = write_behind.enabled()
+    return result
+
+@core_bp.route('/api/_metrics')
+def metrics_endpoint():
+    """計測値（Prometheusのテキスト形式、このワーカープロセスの値）"""
+    from src.services import write_behind
+
+    wb = write_behind.stats()
+    metrics.registry.set_gauge('quiz_write_behind_queue_depth', '遅延書き込みキューに積まれている挑戦数', wb['queue_depth'])
+    metrics.registry.set_gauge('quiz_write_behind_pending_rows', '未書き込みの解答行数', wb['pending_rows'])
+    metrics.registry.set_gauge('quiz_write_behind_flushed_rows', '書き込み済みの解答行数', wb['flushed_rows'])
+    metrics.registry.set_gauge('quiz_write_behind_failed_rows', '書き込みに失敗した解答行数', wb['failed_rows'])
+    metrics.registry.set_gauge('quiz_write_behind_last_flush_seconds', '直近の書き込み時間（秒）', wb['last_flush_ms'] / 1000)
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@core_bp.route('/api')
+def api_info():
+    return {
+        'name': 'Oshi-Katsu Quiz API',
+        'version': '1.0.0',
+        'endpoints': {
+            'quizzes': '/api/quizzes',
+            'tags': '/api/tags',
+            'users': '/api/users',
+            'seed': '/api/seed (POST)'
+        }
+    }
+
+# シードデータ投入エンドポイント（デプロイ後に一度だけ実行）
+@core_bp.route('/api/seed', methods=['POST'])
+def seed_data_endpoint():
+    """
+    シードデータを投入する（管理者用）
+
+    100問を一括INSERTで投入します（パートごとにコミット）。
+    """
+    try:
+        from src.models.quiz import Quiz, Question
+
+        # 既にデータが存在する場合はスキップ
+        count = db.session.execute(db.select(db.func.count()).select_from(Quiz)).scalar()
+        if count > 0:
+            return {
+                'status': 'skipped',
+                'message': f'既存のクイズデータが {count} 件存在します',
+                'count': count
+            }, 200
+
+        # シードデータを投入（バッチ処理）
+        backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        sys.path.insert(0, backend_dir)
+
+        import seed_data
+        current_app.logger.info('100問版シードデータの投入を開始します（一括INSERT）')
+        stats = seed_data.seed_data()
+
+        # 投入後のカウント
+        new_count = db.session.execute(db.select(db.func.count()).select_from(Quiz)).scalar()
+        question_count = db.session.execute(db.select(db.func.count()).select_from(Question)).scalar()
+
+        return {
+            'status': 'success',
+            'message': '100問版シードデータの投入が完了しました',
+            'quiz_count': new_count,
+            'question_count': question_count,
+            'rows_per_sec': round(stats.rows_per_sec) if stats else None
+        }, 200
+    except Exception as e:
+        import traceback
+        return {
+            'status': 'error',
+            'message': str(e),
+            'traceback': traceback.format_exc()
+        }, 500
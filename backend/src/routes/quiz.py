@@ -1,6 +1,11 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, User
+from flask import Blueprint, request, jsonify, abort, current_app
+from src.models.user import db
 from src.models.quiz import Quiz, Question, Choice, QuizAttempt, UserAnswer, OshiTag
+from src.services.grading import grade_answers, answer_details, rank_for_percentage
+from src.services import answer_index, batch_grading, leaderboard, question_analytics, quiz_cache, question_pool, quiz_listing, quiz_rankings, quiz_stats, search_index, user_stats, write_behind
+from src.utils import compression
+from src.utils.pagination import parse_limit, parse_fields, encode_cursor, decode_cursor
+from src.utils.sqlite_tuning import retry_locked
 from datetime import datetime
 
 quiz_bp = Blueprint('quiz', __name__)
@@ -18,6 +23,7 @@ def get_tags():
 
 # タグ作成
 @quiz_bp.route('/tags', methods=['POST'])
+@retry_locked
 def create_tag():
     data = request.json
     tag = OshiTag(
@@ -36,26 +42,110 @@ def get_quizzes():
     difficulty = request.args.get('difficulty')
     tag_id = request.args.get('tag_id')
 
-    query = Quiz.query.filter_by(is_public=True)
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        fields = parse_fields(request.args.get('fields'), quiz_listing.QUIZ_LIST_FIELDS)
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor = decode_cursor(cursor, datetime, int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = quiz_listing.listing_query(fields, join_tag=bool(category)).filter(Quiz.is_public == True)
 
     if category:
-        query = query.join(OshiTag).filter(OshiTag.category == category)
+        query = query.filter(OshiTag.category == category)
     if difficulty:
-        query = query.filter_by(difficulty=difficulty)
+        query = query.filter(Quiz.difficulty == difficulty)
     if tag_id:
-        query = query.filter_by(oshi_tag_id=tag_id)
+        query = query.filter(Quiz.oshi_tag_id == tag_id)
+
+    # キーセットページネーション（created_at, id の降順）
+    if cursor:
+        query = query.filter(db.tuple_(Quiz.created_at, Quiz.id) < cursor)
+
+    rows = query.order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(limit + 1).all()
+    response = current_app.response_class(
+        quiz_listing.listing_json(rows[:limit], fields), mimetype='application/json'
+    )
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last.created_at, last.id)
+    return response
+
+# クイズ検索（タイトル・説明・問題文・選択肢）
+@quiz_bp.route('/search', methods=['GET'])
+def search_quizzes():
+    query = request.args.get('q', '').strip()
+    try:
+        if not query:
+            raise ValueError('q is required')
+        limit = parse_limit(request.args.get('limit'), default=20)
+        fields = parse_fields(request.args.get('fields'), quiz_listing.QUIZ_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    total, hits = search_index.search(query, limit)
+    return current_app.response_class(
+        quiz_listing.search_json(query, total, hits, fields), mimetype='application/json'
+    )
 
-    quizzes = query.order_by(Quiz.created_at.desc()).all()
-    return jsonify([quiz.to_dict() for quiz in quizzes])
+# ミックスクイズ（タグ・難易度で絞り込んだ問題からランダムに出題）
+@quiz_bp.route('/quizzes/random', methods=['GET'])
+def get_random_quiz():
+    try:
+        count = parse_limit(request.args.get('count'), default=question_pool.DEFAULT_QUESTIONS,
+                            max_limit=question_pool.MAX_QUESTIONS, name='count')
+        tag_id = request.args.get('tag_id')
+        if tag_id:
+            if not tag_id.isdigit():
+                raise ValueError('tag_id must be an integer')
+            tag_id = int(tag_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # seed を指定すると同じ絞り込みから同じ問題が選ばれる（同じ問題で遊ぶ場合など）
+    body = question_pool.random_quiz(
+        count,
+        tag_id=tag_id or None,
+        difficulty=request.args.get('difficulty') or None,
+        category=request.args.get('category') or None,
+        seed=request.args.get('seed') or None
+    )
+    return current_app.response_class(body, mimetype='application/json')
+
+# ミックスクイズの回答送信（問題の属するクイズごとに挑戦記録を登録する）
+@quiz_bp.route('/quizzes/random/submit', methods=['POST'])
+@retry_locked
+def submit_random_quiz():
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'request body must be an object'}), 400
+    try:
+        result = question_pool.submit_answers(
+            data.get('user_id', 1),  # デモ用
+            data.get('answers'),
+            data.get('time_taken', 0)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 201
 
 # クイズ詳細取得
 @quiz_bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
 def get_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    return jsonify(quiz.to_dict(include_questions=True))
+    # エンコード済み（圧縮済み）のレスポンスをキャッシュから返す（ETagが一致すれば304）
+    entry = quiz_cache.get_quiz_detail(quiz_id)
+    if entry is None:
+        abort(404)
+
+    response = compression.send(entry.compressed, etag=entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 # クイズ作成
 @quiz_bp.route('/quizzes', methods=['POST'])
+@retry_locked
 def create_quiz():
     data = request.json
     
@@ -93,127 +183,119 @@ def create_quiz():
             db.session.add(choice)
     
     db.session.commit()
+    quiz_cache.invalidate(quiz.id)
+    quiz_rankings.invalidate()
+    answer_index.invalidate()
+    question_pool.invalidate()
+    search_index.add_quiz(quiz.id)
     return jsonify(quiz.to_dict(include_questions=True)), 201
 
 # クイズ回答送信
 @quiz_bp.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
+@retry_locked
 def submit_quiz(quiz_id):
     data = request.json
-    quiz = Quiz.query.get_or_404(quiz_id)
-    
-    # 正解数カウント
-    score = 0
-    total = len(data['answers'])
-    
+    for answer_data in data['answers']:
+        choice_id = answer_data.get('selected_choice_id')
+        if choice_id is not None and not batch_grading._is_int(choice_id):
+            return jsonify({'error': 'selected_choice_id must be an integer'}), 400
+
+    # 共有の解答キー索引で採点する（SELECTなし）。索引にない問題を含む場合は
+    # （索引の作成後に作られたクイズなど）DBから解答キーを読み直して確認する
+    key = answer_index.quiz_answers(quiz_id)
+    details_key = None
+    if not data['answers'] or any(a['question_id'] not in key for a in data['answers']):
+        Quiz.query.get_or_404(quiz_id)
+        key = details_key = answer_index.answer_key(quiz_id, reload=True)
+        for answer_data in data['answers']:
+            if answer_data['question_id'] not in key:
+                return jsonify({'error': f"question {answer_data['question_id']} does not belong to quiz {quiz_id}"}), 400
+
+    score, graded = grade_answers(key, data['answers'])
+    total = len(graded)
+
+    # スコアとランク計算
+    percentage = (score / total * 100) if total > 0 else 0
+
     # 挑戦記録作成
     attempt = QuizAttempt(
         user_id=data.get('user_id', 1),  # デモ用
         quiz_id=quiz_id,
-        score=0,  # 後で更新
+        score=score,
         total_questions=total,
-        time_taken=data.get('time_taken', 0)
+        time_taken=data.get('time_taken', 0),
+        rank=rank_for_percentage(percentage)
     )
     db.session.add(attempt)
     db.session.flush()
-    
-    # 各回答を処理
-    for answer_data in data['answers']:
-        question = Question.query.get(answer_data['question_id'])
-        selected_choice = Choice.query.get(answer_data['selected_choice_id'])
-        
-        is_correct = selected_choice.is_correct if selected_choice else False
-        if is_correct:
-            score += 1
-        
-        user_answer = UserAnswer(
-            attempt_id=attempt.id,
-            question_id=answer_data['question_id'],
-            selected_choice_id=answer_data['selected_choice_id'],
-            is_correct=is_correct
-        )
-        db.session.add(user_answer)
-    
-    # スコアとランク計算
-    attempt.score = score
-    percentage = (score / total * 100) if total > 0 else 0
-    
-    if percentage >= 90:
-        rank = 'S'
-    elif percentage >= 75:
-        rank = 'A'
-    elif percentage >= 60:
-        rank = 'B'
-    elif percentage >= 40:
-        rank = 'C'
-    else:
-        rank = 'D'
-    
-    attempt.rank = rank
-    
-    # クイズ統計更新
-    quiz.play_count += 1
-    if quiz.play_count > 0:
-        # 平均スコア再計算
-        all_attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id).all()
-        total_score = sum(a.score for a in all_attempts)
-        total_questions_sum = sum(a.total_questions for a in all_attempts)
-        quiz.average_score = (total_score / total_questions_sum * 100) if total_questions_sum > 0 else 0
-    
+
+    # 各回答を一括INSERT（遅延書き込みが有効ならコミット後にキューへ積む）
+    rows = write_behind.answer_rows(attempt.id, graded)
+    deferred = write_behind.enabled()
+    if rows and not deferred:
+        db.session.execute(db.insert(UserAnswer), rows)
+
+    # クイズ統計・ランキング・ユーザーの成績の更新
+    quiz_stats.record_attempt(quiz_id, score, total)
+    leaderboard.record_attempt(attempt)
+    user_stats.record_attempt(attempt)
+
     db.session.commit()
-    
-    # 結果を返す
+    if deferred:
+        write_behind.enqueue(rows)
+
+    # 結果を返す（問題文・解説はクイズごとにキャッシュした解答キーから組み立てる）
     result = attempt.to_dict()
-    result['answers'] = []
-    
-    for user_answer in attempt.answers:
-        question = Question.query.get(user_answer.question_id)
-        selected_choice = Choice.query.get(user_answer.selected_choice_id) if user_answer.selected_choice_id else None
-        correct_choice = next((c for c in question.choices if c.is_correct), None)
-        
-        result['answers'].append({
-            'question_id': question.id,
-            'question_text': question.question_text,
-            'selected_choice_id': user_answer.selected_choice_id,
-            'selected_choice_text': selected_choice.choice_text if selected_choice else None,
-            'correct_choice_id': correct_choice.id if correct_choice else None,
-            'correct_choice_text': correct_choice.choice_text if correct_choice else None,
-            'is_correct': user_answer.is_correct,
-            'explanation': question.explanation
-        })
-    
+    result['answers'] = answer_details(details_key or answer_index.answer_key(quiz_id), graded)
+
     return jsonify(result), 201
 
+# 回答の一括送信（オフラインで集めた回答など）
+@quiz_bp.route('/attempts/batch', methods=['POST'])
+@retry_locked
+def submit_attempts_batch():
+    data = request.json
+    try:
+        results = batch_grading.submit_batch(data.get('submissions') if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    accepted = sum(1 for r in results if 'attempt' in r)
+    return jsonify({
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results
+    }), 201
+
 # ランキング取得
 @quiz_bp.route('/rankings/quizzes', methods=['GET'])
 def get_quiz_rankings():
-    quizzes = Quiz.query.filter_by(is_public=True).order_by(Quiz.play_count.desc()).limit(10).all()
-    return jsonify([quiz.to_dict() for quiz in quizzes])
+    # 定期的に作り直している集計結果（圧縮版も保持）をそのまま返す
+    body = quiz_rankings.get_ranking(
+        category=request.args.get('category'),
+        difficulty=request.args.get('difficulty')
+    )
+    return compression.send(body)
 
 # クイズ別ランキング取得
 @quiz_bp.route('/quizzes/<int:quiz_id>/rankings', methods=['GET'])
 def get_quiz_specific_rankings(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
 
-    # スコアが高い順、同点の場合は時間が短い順でソート
-    attempts = QuizAttempt.query.filter_by(quiz_id=quiz_id)\
-        .order_by(QuizAttempt.score.desc(), QuizAttempt.time_taken.asc())\
-        .limit(100)\
-        .all()
-
+    # 送信時に更新している上位K件をプレイヤー名と一緒に取得
     rankings = []
-    for idx, attempt in enumerate(attempts, 1):
-        user = User.query.get(attempt.user_id)
-        percentage = (attempt.score / attempt.total_questions * 100) if attempt.total_questions > 0 else 0
+    for idx, entry in enumerate(leaderboard.get_leaderboard(quiz_id), 1):
+        percentage = (entry.score / entry.total_questions * 100) if entry.total_questions > 0 else 0
 
         rankings.append({
             'rank': idx,
-            'attempt_id': attempt.id,
-            'player_name': user.username if user else 'Unknown',
-            'score': attempt.score,
-            'total_questions': attempt.total_questions,
+            'attempt_id': entry.attempt_id,
+            'player_name': entry.username or 'Unknown',
+            'score': entry.score,
+            'total_questions': entry.total_questions,
             'percentage': round(percentage, 1),
-            'time_taken': attempt.time_taken,
-            'rank_grade': attempt.rank
+            'time_taken': entry.time_taken,
+            'rank_grade': entry.rank_grade
         })
 
     return jsonify({
@@ -222,3 +304,9 @@ def get_quiz_specific_rankings(quiz_id):
         'rankings': rankings
     })
 
+
+@quiz_bp.route('/quizzes/<int:quiz_id>/analytics', methods=['GET'])
+def get_quiz_analytics(quiz_id):
+    # 分析結果は compute-question-analytics で作ったもの（computed_at が集計の時刻）
+    Quiz.query.get_or_404(quiz_id)
+    return jsonify(question_analytics.quiz_analytics(quiz_id))
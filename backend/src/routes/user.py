@@ -1,14 +1,39 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.services import user_stats
+from src.utils.pagination import parse_limit, parse_fields, encode_cursor, decode_cursor
+from src.utils.sqlite_tuning import retry_locked
 
 user_bp = Blueprint('user', __name__)
 
+# 一覧APIで指定できるフィールド（fields=で射影できる）
+USER_LIST_FIELDS = ('id', 'username', 'email')
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        fields = parse_fields(request.args.get('fields'), USER_LIST_FIELDS)
+        cursor = request.args.get('cursor')
+        if cursor:
+            (cursor,) = decode_cursor(cursor, int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 指定された列だけをSELECTし、id順のキーセットでページングする
+    columns = [User.id] + [getattr(User, f) for f in fields if f != 'id']
+    query = db.session.query(*columns)
+    if cursor:
+        query = query.filter(User.id > cursor)
+    rows = query.order_by(User.id).limit(limit + 1).all()
+
+    response = jsonify([{f: getattr(row, f) for f in fields} for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(rows[limit - 1].id)
+    return response
 
 @user_bp.route('/users', methods=['POST'])
+@retry_locked
 def create_user():
     data = request.json
     # emailはオプショナル（クイズアプリでは不要）
@@ -25,7 +50,18 @@ def get_user(user_id):
     user = User.query.get_or_404(user_id)
     return jsonify(user.to_dict())
 
+# ユーザーの成績（送信時に更新している累計行をそのまま返す）
+@user_bp.route('/users/<int:user_id>/stats', methods=['GET'])
+def get_user_stats(user_id):
+    stats = user_stats.get_user_stats(user_id)
+    if stats is None:
+        # まだ挑戦のないユーザー
+        User.query.get_or_404(user_id)
+        stats = {'user_id': user_id, 'attempts': 0, 'by_tag': [], 'by_difficulty': []}
+    return jsonify(stats)
+
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
+@retry_locked
 def update_user(user_id):
     user = User.query.get_or_404(user_id)
     data = request.json
@@ -35,6 +71,7 @@ def update_user(user_id):
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
+@retry_locked
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
@@ -0,0 +1,191 @@
+"""
+全クイズの解答キーの索引（配列ベース、ワーカー間で共有）
+
+問題id → クイズid・正解の選択肢id、選択肢id → 問題id・正誤を、id を添字にした
+array / bytearray で持つ。gunicorn の preload_app でフォーク前に作っておけば、
+配列はそれぞれ1つのオブジェクトなので参照カウントの更新でページが書き換わらず、
+全ワーカーでコピーオンライトのまま共有される。
+
+- 採点（問題がクイズに属するか・選択肢が正解か）はこの索引だけで行い、SELECT しない
+- 索引にない問題（索引の作成後に作られたクイズなど）は従来どおりDBから読んで採点する
+- INDEX_CHECK_SECONDS ごとに内容のバージョン（件数・最大id・quizzes.updated_at）を
+  確認し、変わっていれば作り直す。クイズを作成したプロセスでは次の参照時にすぐ確認する
+- 結果表示用の問題文・解説・選択肢の文言はクイズごとに AnswerKey をLRUで保持し、
+  索引を作り直したときに捨てる
+"""
+import logging
+import threading
+import time
+from array import array
+from src.models.user import db
+from src.models.quiz import Quiz, Question, Choice
+from src.services.grading import load_answer_key
+from src.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# 内容のバージョンを確認する間隔（秒）
+INDEX_CHECK_SECONDS = 30
+# 索引を作るときに一度に読む行数
+BUILD_BATCH_ROWS = 50000
+# 結果表示用の AnswerKey を保持するクイズ数
+ANSWER_KEY_CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_index = None
+_checked_at = 0.0
+_answer_keys = LRUCache(ANSWER_KEY_CACHE_SIZE)
+
+
+class AnswerIndex:
+    """id を添字にした配列の解答キー（0 は「なし」）"""
+
+    __slots__ = ('version', 'question_quiz', 'question_correct', 'choice_question', 'choice_correct')
+
+    def __init__(self, version, max_question_id, max_choice_id):
+        self.version = version
+        self.question_quiz = array('i', [0]) * (max_question_id + 1)
+        self.question_correct = array('i', [0]) * (max_question_id + 1)
+        self.choice_question = array('i', [0]) * (max_choice_id + 1)
+        self.choice_correct = bytearray(max_choice_id + 1)
+
+    def quiz_of(self, question_id):
+        """問題が属するクイズid（索引にない場合は 0）"""
+        if 0 < question_id < len(self.question_quiz):
+            return self.question_quiz[question_id]
+        return 0
+
+    def is_correct(self, question_id, choice_id):
+        """選択肢がその問題に属し、かつ正解であれば True"""
+        if not isinstance(choice_id, int) or not 0 < choice_id < len(self.choice_question):
+            return False
+        return self.choice_question[choice_id] == question_id and bool(self.choice_correct[choice_id])
+
+    def has_choice(self, question_id, choice_id):
+        """選択肢がその問題に属していれば True"""
+        if not isinstance(choice_id, int) or not 0 < choice_id < len(self.choice_question):
+            return False
+        return self.choice_question[choice_id] == question_id
+
+    def correct_choice(self, question_id):
+        """問題の正解の選択肢id（索引にない場合は None）"""
+        if 0 < question_id < len(self.question_correct):
+            return self.question_correct[question_id] or None
+        return None
+
+    def nbytes(self):
+        return (self.question_quiz.itemsize * len(self.question_quiz) * 2
+                + self.choice_question.itemsize * len(self.choice_question)
+                + len(self.choice_correct))
+
+
+class QuizAnswers:
+    """1クイズ分の索引のビュー（grade_answers に AnswerKey の代わりに渡せる）"""
+
+    def __init__(self, index, quiz_id):
+        self.index = index
+        self.quiz_id = quiz_id
+
+    def __contains__(self, question_id):
+        return isinstance(question_id, int) and self.index.quiz_of(question_id) == self.quiz_id
+
+    def is_correct(self, question_id, choice_id):
+        return self.index.is_correct(question_id, choice_id)
+
+    def has_choice(self, question_id, choice_id):
+        return self.index.has_choice(question_id, choice_id)
+
+
+def _version_query():
+    """内容のバージョン: (問題数, 最大問題id, 選択肢数, 最大選択肢id, 最終更新日時)"""
+    return db.select(
+        db.select(db.func.count(Question.id)).scalar_subquery(),
+        db.select(db.func.max(Question.id)).scalar_subquery(),
+        db.select(db.func.count(Choice.id)).scalar_subquery(),
+        db.select(db.func.max(Choice.id)).scalar_subquery(),
+        db.select(db.func.max(Quiz.updated_at)).scalar_subquery(),
+    )
+
+
+def _current_version():
+    return tuple(db.session.execute(_version_query()).one())
+
+
+def build_index(version=None):
+    """全ての問題と選択肢のid・正誤だけを読み、AnswerIndex を作る"""
+    if version is None:
+        version = _current_version()
+    index = AnswerIndex(version, version[1] or 0, version[3] or 0)
+    query = db.select(Question.id, Question.quiz_id, Choice.id, Choice.is_correct)\
+        .outerjoin(Choice, Choice.question_id == Question.id)\
+        .execution_options(yield_per=BUILD_BATCH_ROWS)
+    for question_id, quiz_id, choice_id, is_correct in db.session.execute(query):
+        # バージョン確認の後に追加された行は、索引に入れず DB から採点する
+        if question_id >= len(index.question_quiz):
+            continue
+        index.question_quiz[question_id] = quiz_id
+        if choice_id is None or choice_id >= len(index.choice_question):
+            continue
+        index.choice_question[choice_id] = question_id
+        if is_correct:
+            index.choice_correct[choice_id] = 1
+            # 正解の選択肢が複数ある場合はidが最も小さいものを採用する（AnswerKey と同じ）
+            current = index.question_correct[question_id]
+            if current == 0 or choice_id < current:
+                index.question_correct[question_id] = choice_id
+    return index
+
+
+def warm():
+    """索引を作っておく（preload_app のフォーク前に呼ぶ）"""
+    global _index, _checked_at
+    started = time.perf_counter()
+    with _lock:
+        _index = build_index()
+        _checked_at = time.monotonic()
+        _answer_keys.clear()
+    logger.info('解答キーの索引を作成しました（%d問, %.1fKB, %.3f秒）',
+                _index.version[0], _index.nbytes() / 1024, time.perf_counter() - started)
+    return _index
+
+
+def get_index():
+    """
+    現在の索引を返す
+
+    INDEX_CHECK_SECONDS を過ぎていればバージョンを確認し、
+    変わっていれば作り直す。
+    """
+    global _index, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+        return _index
+    with _lock:
+        if _index is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+            return _index
+        version = _current_version()
+        if _index is None or version != _index.version:
+            _index = build_index(version)
+            _answer_keys.clear()
+        _checked_at = now
+        return _index
+
+
+def quiz_answers(quiz_id):
+    """クイズの採点用ビュー（QuizAnswers）を返す"""
+    return QuizAnswers(get_index(), quiz_id)
+
+
+def answer_key(quiz_id, reload=False):
+    """結果表示用の AnswerKey（問題文・解説・選択肢の文言）を返す。reload=True ならDBから読み直す"""
+    key = None if reload else _answer_keys.get(quiz_id)
+    if key is None:
+        key = load_answer_key(quiz_id)
+        _answer_keys.set(quiz_id, key)
+    return key
+
+
+def invalidate():
+    """このプロセスでクイズの内容を変えたときに呼ぶ（次の参照時にバージョンを確認する）"""
+    global _checked_at
+    _checked_at = float('-inf')
@@ -0,0 +1,201 @@
+"""
+回答の一括送信（オフラインのイベントや教室で集めた回答をまとめて登録する）
+
+複数のクイズへの送信をまとめて受け取り、1トランザクションで次を行う。
+
+- 送信に含まれる全クイズの解答キーを1クエリで読み込み、メモリ上で採点する
+- quiz_attempts / user_answers をそれぞれ1回の一括INSERTで登録する
+- クイズの統計とランキングはクイズごとに1回だけ更新する
+- ユーザーの成績は同じ行・同じ日の挑戦をまとめて加算する
+
+不正な送信はその送信だけ登録せず、結果にエラーを返す（他の送信は登録する）。
+atomic=True なら1件でも不正な送信があれば何も登録しない。
+"""
+from datetime import datetime, timezone
+from src.models.user import db, User
+from src.models.quiz import Quiz, QuizAttempt, UserAnswer
+from src.services.grading import AnswerKey, load_answer_keys, grade_answers, rank_for_percentage
+from src.services import leaderboard, quiz_stats, user_stats, write_behind
+
+# 1リクエストで受け付ける送信数の上限
+MAX_SUBMISSIONS = 5000
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_completed_at(value):
+    """ISO 8601 の回答日時をUTCのnaiveな datetime にする（省略時は現在時刻）"""
+    if value is None:
+        return datetime.utcnow()
+    if not isinstance(value, str):
+        raise ValueError('completed_at must be an ISO 8601 string')
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'invalid completed_at: {value}')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _check_submission(submission, keys, user_ids):
+    """送信を検証して (quiz_id, user_id, answers, time_taken, completed_at) を返す"""
+    if not isinstance(submission, dict):
+        raise ValueError('submission must be an object')
+    quiz_id = submission.get('quiz_id')
+    if not _is_int(quiz_id):
+        raise ValueError('quiz_id is required')
+    key = keys.get(quiz_id)
+    if key is None:
+        raise ValueError(f'quiz {quiz_id} not found')
+
+    user_id = submission.get('user_id', 1)  # デモ用
+    if not _is_int(user_id) or user_id not in user_ids:
+        raise ValueError(f'user {user_id} not found')
+
+    answers = submission.get('answers')
+    if not isinstance(answers, list):
+        raise ValueError('answers must be a list')
+    for answer in answers:
+        if not isinstance(answer, dict):
+            raise ValueError('answer must be an object')
+        question_id = answer.get('question_id')
+        if not _is_int(question_id) or question_id not in key:
+            raise ValueError(f'question {question_id} does not belong to quiz {quiz_id}')
+        choice_id = answer.get('selected_choice_id')
+        if choice_id is not None and not _is_int(choice_id):
+            raise ValueError('selected_choice_id must be an integer')
+        if choice_id is not None and not key.has_choice(question_id, choice_id):
+            # 存在しない選択肢は外部キー違反で一括INSERT全体を失敗させるので、この送信だけ拒否する
+            raise ValueError(f'choice {choice_id} does not belong to question {question_id}')
+
+    time_taken = submission.get('time_taken', 0)
+    if time_taken is not None and not _is_int(time_taken):
+        raise ValueError('time_taken must be an integer')
+
+    completed_at = _parse_completed_at(submission.get('completed_at'))
+    return quiz_id, user_id, answers, time_taken, completed_at
+
+
+def submit_batch(submissions, atomic=False):
+    """
+    送信のリストを採点して登録し、送信ごとの結果のリストを返す
+
+    結果は送信と同じ順番で、登録したものは挑戦記録（attempt）と回答ごとの正誤、
+    登録しなかったものは error を持つ。client_id が指定されていればそのまま返す。
+    atomic=True で不正な送信が含まれていた場合は、全ての送信を登録せずに返す
+    （error のない送信も attempt を持たない）。
+    """
+    if not isinstance(submissions, list):
+        raise ValueError('submissions must be a list')
+    if len(submissions) > MAX_SUBMISSIONS:
+        raise ValueError(f'too many submissions (max {MAX_SUBMISSIONS})')
+
+    # 解答キーと存在するユーザーを、送信全体でそれぞれ1クエリで読み込む
+    quiz_ids = {s.get('quiz_id') for s in submissions if isinstance(s, dict) and _is_int(s.get('quiz_id'))}
+    requested_users = {s.get('user_id', 1) for s in submissions
+                       if isinstance(s, dict) and _is_int(s.get('user_id', 1))}
+    keys = load_answer_keys(sorted(quiz_ids))
+    if quiz_ids - keys.keys():
+        # 問題のないクイズも送信自体は受け付ける（個別の送信APIと同じ）
+        for quiz_id in db.session.scalars(db.select(Quiz.id).where(Quiz.id.in_(sorted(quiz_ids - keys.keys())))):
+            keys[quiz_id] = AnswerKey({}, {})
+    user_ids = set(db.session.scalars(
+        db.select(User.id).where(User.id.in_(sorted(requested_users)))
+    )) if requested_users else set()
+
+    results = []
+    accepted = []  # (結果の添字, 挑戦の行, 採点結果)
+    for i, submission in enumerate(submissions):
+        result = {'index': i}
+        if isinstance(submission, dict) and 'client_id' in submission:
+            result['client_id'] = submission['client_id']
+        results.append(result)
+        try:
+            quiz_id, user_id, answers, time_taken, completed_at = _check_submission(submission, keys, user_ids)
+        except ValueError as e:
+            result['error'] = str(e)
+            continue
+
+        score, graded = grade_answers(keys[quiz_id], answers)
+        total = len(graded)
+        percentage = (score / total * 100) if total > 0 else 0
+        accepted.append((i, {
+            'user_id': user_id,
+            'quiz_id': quiz_id,
+            'score': score,
+            'total_questions': total,
+            'time_taken': time_taken,
+            'rank': rank_for_percentage(percentage),
+            'completed_at': completed_at
+        }, graded))
+
+    if not accepted:
+        return results
+    if atomic and len(accepted) < len(submissions):
+        # 検証は登録の前に全て終わっているので、ここで返せば何も書き込まれない
+        return results
+
+    # 挑戦記録を一括INSERTし、送信順に採番されたidを受け取る
+    attempt_ids = db.session.scalars(
+        db.insert(QuizAttempt).returning(QuizAttempt.id, sort_by_parameter_order=True),
+        [attempt for _, attempt, _ in accepted]
+    ).all()
+
+    answer_rows = []
+    by_quiz = {}
+    for (i, attempt, graded), attempt_id in zip(accepted, attempt_ids):
+        attempt['id'] = attempt_id
+        rows = write_behind.answer_rows(attempt_id, graded)
+        for row in rows:
+            # オフラインで回答した日時を残す
+            row['answered_at'] = attempt['completed_at']
+        answer_rows += rows
+        by_quiz.setdefault(attempt['quiz_id'], []).append(attempt)
+        key = keys[attempt['quiz_id']]
+        results[i]['attempt'] = _attempt_dict(attempt)
+        results[i]['answers'] = [{
+            'question_id': question_id,
+            'selected_choice_id': selected_choice_id,
+            'correct_choice_id': key.questions[question_id][3],
+            'is_correct': is_correct
+        } for question_id, selected_choice_id, is_correct in graded]
+
+    # 各回答を一括INSERT（遅延書き込みが有効ならコミット後にキューへ積む）
+    deferred = write_behind.enabled()
+    if answer_rows and not deferred:
+        db.session.execute(db.insert(UserAnswer), answer_rows)
+
+    # クイズ統計とランキングはクイズごとに1回だけ更新する
+    for quiz_id, attempts in by_quiz.items():
+        quiz_stats.record_attempt(
+            quiz_id,
+            sum(a['score'] for a in attempts),
+            sum(a['total_questions'] for a in attempts),
+            attempts=len(attempts)
+        )
+        leaderboard.record_attempts(quiz_id, attempts)
+    user_stats.record_attempts([attempt for _, attempt, _ in accepted])
+
+    db.session.commit()
+    if deferred:
+        write_behind.enqueue(answer_rows)
+    return results
+
+
+def _attempt_dict(attempt):
+    """QuizAttempt.to_dict と同じ形の辞書"""
+    total = attempt['total_questions']
+    return {
+        'id': attempt['id'],
+        'user_id': attempt['user_id'],
+        'quiz_id': attempt['quiz_id'],
+        'score': attempt['score'],
+        'total_questions': total,
+        'percentage': round((attempt['score'] / total * 100), 1) if total > 0 else 0,
+        'time_taken': attempt['time_taken'],
+        'rank': attempt['rank'],
+        'completed_at': attempt['completed_at'].isoformat()
+    }
@@ -0,0 +1,176 @@
+"""
+クイズデータの一括投入
+
+oshinoko_quiz_data.json 形式（パート → セット → 問題）のデータを、
+1行ずつ flush せずに集合単位のINSERTで投入する。
+
+- クイズ・問題は INSERT ... RETURNING の executemany で一度に投入し、
+  返ってきた id を子テーブルの行に割り当てる（PostgreSQL / SQLite 3.35+）
+- RETURNING を使えないデータベースでは bulk_insert_mappings で投入する
+- 選択肢は id が不要なので executemany で一度に投入する
+- JSONファイルはパート単位で読み進め、パートごとにコミットする
+"""
+import json
+import time
+from src.models.user import db
+from src.models.quiz import Quiz, Question, Choice
+
+_decoder = json.JSONDecoder()
+
+
+class LoadStats:
+    """投入件数と所要時間"""
+
+    def __init__(self):
+        self.quizzes = 0
+        self.questions = 0
+        self.choices = 0
+        self.started_at = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows(self):
+        return self.quizzes + self.questions + self.choices
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def __str__(self):
+        return (f'クイズ {self.quizzes}件 / 問題 {self.questions}件 / 選択肢 {self.choices}件 '
+                f'({self.rows}行, {self.elapsed:.2f}秒, {self.rows_per_sec:,.0f}行/秒)')
+
+
+def iter_json_array(path, chunk_size=65536):
+    """
+    トップレベルがJSON配列のファイルから要素を1つずつ読み出す
+
+    ファイル全体を読み込まず、チャンク単位で読み進めながら
+    要素ごとにデコードする。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # 空白と区切り文字を読み飛ばす
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if not started and pos < len(buffer):
+                if buffer[pos] != '[':
+                    raise ValueError(f'{path}: トップレベルがJSON配列ではありません')
+                started = True
+                pos += 1
+                continue
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            if pos < len(buffer):
+                try:
+                    item, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield item
+                    buffer = buffer[end:]
+                    pos = 0
+                    continue
+            if eof:
+                if started:
+                    raise ValueError(f'{path}: JSON配列が閉じられていません')
+                return
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _insert_returning_ids(model, rows):
+    """rows を一括INSERTし、各行の id を同じ順番で返す"""
+    if not rows:
+        return []
+    if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.session.scalars(
+            db.insert(model).returning(model.id, sort_by_parameter_order=True),
+            rows
+        ))
+    db.session.bulk_insert_mappings(model, rows, return_defaults=True)
+    return [row['id'] for row in rows]
+
+
+def load_part(part, oshi_tag_id, creator_id, stats, title_prefix='', choice_order_start=0):
+    """1パート分（複数セット）のクイズ・問題・選択肢を一括投入する"""
+    part_name = part['name']
+    sets = part['sets']
+
+    quiz_ids = _insert_returning_ids(Quiz, [{
+        'creator_id': creator_id,
+        'title': f"{title_prefix}{part_name} - {set_data['title']}",
+        'description': f"{part_name}の{set_data['title']}に関する問題です。全{len(set_data['questions'])}問。",
+        'oshi_tag_id': oshi_tag_id,
+        'difficulty': part['difficulty'],
+        'is_public': True
+    } for set_data in sets])
+
+    question_rows = []
+    question_choices = []
+    for quiz_id, set_data in zip(quiz_ids, sets):
+        for q_index, q_data in enumerate(set_data['questions'], 1):
+            choices_list = q_data['choices']
+            question_rows.append({
+                'quiz_id': quiz_id,
+                'question_text': q_data['question_text'],
+                # 選択肢が2つなら○×、それ以外は4択
+                'question_type': 'true_false' if len(choices_list) == 2 else 'multiple_choice',
+                'order_index': q_index,
+                'explanation': q_data.get('explanation', '')
+            })
+            question_choices.append((choices_list, ord(q_data['correct_answer']) - ord('A')))
+
+    question_ids = _insert_returning_ids(Question, question_rows)
+
+    choice_rows = [{
+        'question_id': question_id,
+        'choice_text': choice_text,
+        'is_correct': c_index == correct_index,
+        'order_index': c_index + choice_order_start
+    } for question_id, (choices_list, correct_index) in zip(question_ids, question_choices)
+        for c_index, choice_text in enumerate(choices_list)]
+    if choice_rows:
+        db.session.execute(db.insert(Choice), choice_rows)
+
+    stats.quizzes += len(quiz_ids)
+    stats.questions += len(question_ids)
+    stats.choices += len(choice_rows)
+
+
+def load_quiz_file(json_path, oshi_tag_id, creator_id, title_prefix='', choice_order_start=0, on_part=None):
+    """
+    JSONファイルのクイズデータを一括投入し、LoadStats を返す
+
+    パートごとにコミットする。on_part(part, stats) を渡すと
+    パートの投入が終わるたびに呼ばれる（進捗表示用）。
+    """
+    from src.services import quiz_rankings
+
+    stats = load_parts(iter_json_array(json_path), oshi_tag_id, creator_id,
+                       title_prefix, choice_order_start, on_part)
+    quiz_rankings.invalidate()
+    return stats
+
+
+def load_parts(parts, oshi_tag_id, creator_id, title_prefix='', choice_order_start=0, on_part=None):
+    """パートのイテレーターを順に一括投入し、パートごとにコミットして LoadStats を返す"""
+    stats = LoadStats()
+    for part in parts:
+        load_part(part, oshi_tag_id, creator_id, stats, title_prefix, choice_order_start)
+        db.session.commit()
+        if on_part:
+            on_part(part, stats)
+    return stats.finish()
@@ -0,0 +1,138 @@
+from src.models.user import db
+from src.models.quiz import Question, Choice
+
+
+class AnswerKey:
+    """
+    クイズの解答キー（問題・選択肢・正誤・解説）
+
+    questions: {question_id: (quiz_id, question_text, explanation, correct_choice_id)}
+    choices:   {choice_id: (question_id, choice_text, is_correct)}
+    """
+
+    def __init__(self, questions, choices):
+        self.questions = questions
+        self.choices = choices
+
+    def __contains__(self, question_id):
+        return question_id in self.questions
+
+    def is_correct(self, question_id, choice_id):
+        """選択肢がその問題に属し、かつ正解であれば True"""
+        choice = self.choices.get(choice_id)
+        return bool(choice and choice[0] == question_id and choice[2])
+
+    def has_choice(self, question_id, choice_id):
+        """選択肢がその問題に属していれば True"""
+        choice = self.choices.get(choice_id)
+        return bool(choice and choice[0] == question_id)
+
+    def choice_text(self, choice_id):
+        choice = self.choices.get(choice_id)
+        return choice[1] if choice else None
+
+
+def _answer_key_columns():
+    return db.session.query(
+        Question.id,
+        Question.quiz_id,
+        Question.question_text,
+        Question.explanation,
+        Choice.id,
+        Choice.choice_text,
+        Choice.is_correct
+    ).outerjoin(Choice, Choice.question_id == Question.id)
+
+
+def answer_key_query(quiz_id):
+    """クイズの解答キー（問題と選択肢）を読み込むクエリ"""
+    return _answer_key_columns().filter(Question.quiz_id == quiz_id)
+
+
+def load_answer_key(quiz_id):
+    """クイズの解答キーを1クエリで読み込む"""
+    return _build_answer_key(answer_key_query(quiz_id).all())
+
+
+def load_answer_keys(quiz_ids):
+    """
+    複数のクイズの解答キーを1クエリで読み込む
+
+    {quiz_id: AnswerKey} を返す（存在しない・問題のないクイズは含まない）。
+    """
+    grouped = {}
+    if quiz_ids:
+        for row in _answer_key_columns().filter(Question.quiz_id.in_(quiz_ids)).all():
+            grouped.setdefault(row[1], []).append(row)
+    return {quiz_id: _build_answer_key(rows) for quiz_id, rows in grouped.items()}
+
+
+def _build_answer_key(rows):
+    questions = {}
+    choices = {}
+    for question_id, quiz_id, question_text, explanation, choice_id, choice_text, is_correct in rows:
+        if question_id not in questions:
+            questions[question_id] = (quiz_id, question_text, explanation, None)
+        if choice_id is None:
+            continue
+        choices[choice_id] = (question_id, choice_text, bool(is_correct))
+        # 正解の選択肢が複数ある場合はidが最も小さいものを採用する
+        current = questions[question_id][3]
+        if is_correct and (current is None or choice_id < current):
+            questions[question_id] = questions[question_id][:3] + (choice_id,)
+    return AnswerKey(questions, choices)
+
+
+def rank_for_percentage(percentage):
+    """正答率（%）からS〜Dのランクを返す"""
+    if percentage >= 90:
+        return 'S'
+    elif percentage >= 75:
+        return 'A'
+    elif percentage >= 60:
+        return 'B'
+    elif percentage >= 40:
+        return 'C'
+    return 'D'
+
+
+def grade_answers(key, answers):
+    """
+    回答をメモリ上で採点する
+
+    answers は {'question_id', 'selected_choice_id'} の辞書のリスト。
+    (score, graded) を返す。graded は回答ごとの
+    (question_id, selected_choice_id, is_correct) のリスト。
+    その問題の選択肢ではない selected_choice_id は未選択（None）として扱う
+    （user_answers に存在しない選択肢を記録しない）。
+    """
+    score = 0
+    graded = []
+    for answer in answers:
+        question_id = answer['question_id']
+        selected_choice_id = answer.get('selected_choice_id')
+        if selected_choice_id is not None and not key.has_choice(question_id, selected_choice_id):
+            selected_choice_id = None
+        is_correct = key.is_correct(question_id, selected_choice_id)
+        if is_correct:
+            score += 1
+        graded.append((question_id, selected_choice_id, is_correct))
+    return score, graded
+
+
+def answer_details(key, graded):
+    """採点結果を読み込み済みの解答キーから結果表示用の辞書に変換する"""
+    details = []
+    for question_id, selected_choice_id, is_correct in graded:
+        _, question_text, explanation, correct_choice_id = key.questions[question_id]
+        details.append({
+            'question_id': question_id,
+            'question_text': question_text,
+            'selected_choice_id': selected_choice_id,
+            'selected_choice_text': key.choice_text(selected_choice_id),
+            'correct_choice_id': correct_choice_id,
+            'correct_choice_text': key.choice_text(correct_choice_id),
+            'is_correct': is_correct,
+            'explanation': explanation
+        })
+    return details
@@ -0,0 +1,165 @@
+from src.models.user import db, User
+from src.models.quiz import LeaderboardEntry, QuizAttempt, UNKNOWN_TIME_TAKEN, ranking_time_taken
+
+# クイズごとに保持するランキングの件数
+LEADERBOARD_SIZE = 100
+
+entries = LeaderboardEntry.__table__
+
+# スコアが高い順、同点の場合は時間が短い順（記録なしは最後）、さらに同じなら先に挑戦した順
+# ix_quiz_leaderboard_rank と同じ式なので、上位K件はソートせずにインデックスの順で読める
+RANKING_ORDER = (entries.c.score.desc(), ranking_time_taken(entries.c.time_taken).asc(), entries.c.attempt_id.asc())
+
+
+def _sort_key(score, time_taken, attempt_id):
+    """RANKING_ORDER と同じ並び順のPython側のキー（小さいほど上位）"""
+    return (-score, time_taken if time_taken is not None else UNKNOWN_TIME_TAKEN, attempt_id)
+
+
+def record_attempt(attempt):
+    """
+    挑戦結果がランキング上位K件に入る場合だけ登録する
+
+    K件を超えた分は同じトランザクション内で削除するため、
+    テーブルの行数はクイズあたり常にK件以下に保たれる。
+    """
+    quiz_id = attempt.quiz_id
+    count = db.session.query(db.func.count()).select_from(entries)\
+        .where(entries.c.quiz_id == quiz_id).scalar()
+
+    if count >= LEADERBOARD_SIZE:
+        worst = db.session.execute(
+            db.select(entries.c.score, entries.c.time_taken, entries.c.attempt_id)
+            .where(entries.c.quiz_id == quiz_id)
+            .order_by(*RANKING_ORDER)
+            .offset(LEADERBOARD_SIZE - 1)
+            .limit(1)
+        ).first()
+        if worst and _sort_key(attempt.score, attempt.time_taken, attempt.id) >= _sort_key(*worst):
+            return False
+
+    db.session.execute(db.insert(entries).values(
+        quiz_id=quiz_id,
+        attempt_id=attempt.id,
+        user_id=attempt.user_id,
+        score=attempt.score,
+        total_questions=attempt.total_questions,
+        time_taken=attempt.time_taken,
+        rank_grade=attempt.rank
+    ))
+    if count >= LEADERBOARD_SIZE:
+        _trim(quiz_id)
+    return True
+
+
+def record_attempts(quiz_id, attempts):
+    """
+    同じクイズの複数の挑戦結果をまとめてランキングに登録する（一括送信用）
+
+    attempts は id / user_id / score / total_questions / time_taken / rank を持つ辞書のリスト。
+    上位K件に入りうるものだけを1回のINSERTで登録し、K件を超えた分は最後に1回だけ削除する。
+    登録した件数を返す。
+    """
+    candidates = sorted(attempts, key=lambda a: _sort_key(a['score'], a['time_taken'], a['id']))
+    candidates = candidates[:LEADERBOARD_SIZE]
+    if not candidates:
+        return 0
+
+    count = db.session.query(db.func.count()).select_from(entries)\
+        .where(entries.c.quiz_id == quiz_id).scalar()
+    if count >= LEADERBOARD_SIZE:
+        worst = db.session.execute(
+            db.select(entries.c.score, entries.c.time_taken, entries.c.attempt_id)
+            .where(entries.c.quiz_id == quiz_id)
+            .order_by(*RANKING_ORDER)
+            .offset(LEADERBOARD_SIZE - 1)
+            .limit(1)
+        ).first()
+        if worst:
+            worst_key = _sort_key(*worst)
+            candidates = [a for a in candidates
+                          if _sort_key(a['score'], a['time_taken'], a['id']) < worst_key]
+        if not candidates:
+            return 0
+
+    db.session.execute(db.insert(entries), [{
+        'quiz_id': quiz_id,
+        'attempt_id': a['id'],
+        'user_id': a['user_id'],
+        'score': a['score'],
+        'total_questions': a['total_questions'],
+        'time_taken': a['time_taken'],
+        'rank_grade': a['rank']
+    } for a in candidates])
+    if count + len(candidates) > LEADERBOARD_SIZE:
+        _trim(quiz_id)
+    return len(candidates)
+
+
+def _trim(quiz_id):
+    """上位K件に入らなくなった行を削除する"""
+    keep = db.select(entries.c.id)\
+        .where(entries.c.quiz_id == quiz_id)\
+        .order_by(*RANKING_ORDER)\
+        .limit(LEADERBOARD_SIZE)\
+        .scalar_subquery()
+    db.session.execute(
+        db.delete(entries)
+        .where(entries.c.quiz_id == quiz_id)
+        .where(entries.c.id.not_in(keep))
+    )
+
+
+def leaderboard_query(quiz_id):
+    """ランキングをプレイヤー名と一緒に取得するSELECT文"""
+    return db.select(
+        entries.c.attempt_id,
+        entries.c.score,
+        entries.c.total_questions,
+        entries.c.time_taken,
+        entries.c.rank_grade,
+        User.username
+    ).outerjoin(User, User.id == entries.c.user_id)\
+        .where(entries.c.quiz_id == quiz_id)\
+        .order_by(*RANKING_ORDER)\
+        .limit(LEADERBOARD_SIZE)
+
+
+def get_leaderboard(quiz_id):
+    """ランキングをプレイヤー名と一緒に1クエリで取得する"""
+    return db.session.execute(leaderboard_query(quiz_id)).all()
+
+
+def rebuild_leaderboards():
+    """
+    quiz_attempts から全クイズのランキングを作り直す（修復用）
+
+    ROW_NUMBER() でクイズごとの上位K件を選び、INSERT ... SELECT で一括登録する。
+    登録した行数を返す。
+    """
+    position = db.func.row_number().over(
+        partition_by=QuizAttempt.quiz_id,
+        order_by=(QuizAttempt.score.desc(), ranking_time_taken(QuizAttempt.time_taken).asc(), QuizAttempt.id.asc())
+    ).label('position')
+    ranked = db.select(
+        QuizAttempt.quiz_id,
+        QuizAttempt.id.label('attempt_id'),
+        QuizAttempt.user_id,
+        QuizAttempt.score,
+        QuizAttempt.total_questions,
+        QuizAttempt.time_taken,
+        QuizAttempt.rank.label('rank_grade'),
+        position
+    ).subquery()
+
+    columns = ('quiz_id', 'attempt_id', 'user_id', 'score', 'total_questions', 'time_taken', 'rank_grade')
+    db.session.execute(db.delete(entries))
+    result = db.session.execute(
+        db.insert(entries).from_select(
+            columns,
+            db.select(*(ranked.c[name] for name in columns))
+            .where(ranked.c.position <= LEADERBOARD_SIZE)
+        )
+    )
+    db.session.commit()
+    return result.rowcount
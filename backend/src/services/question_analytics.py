@@ -0,0 +1,310 @@
+"""
+問題ごとの回答の分析（選択肢の分布・正答率・識別力）
+
+user_answers を挑戦の点数と結合して CHUNK_ROWS 行ずつ読み、問題id・選択肢idを
+添字にした配列に加算していく（NumPy があれば bincount でチャンクごとにまとめて、
+なければ標準の array で1行ずつ。NumPy は requirements.txt に含めない任意の依存）。
+メモリは問題数・選択肢数に比例し、回答の行数には依存しないので、数千万行でも
+一定のメモリで集計できる。選択肢idは choices と結合して、その問題の選択肢で
+ないもの（削除済み・不正な値）は未選択として数える。
+
+- 選択肢の分布: 選択肢ごとに選ばれた回数（選ばなかった回答は skipped）
+- 正答率: 正解した回答の割合（%）
+- 識別力: 問題の正誤と、同じ挑戦の他の問題の正答率の相関（点双列相関、-1〜1）。
+  高いほど、よくできる人が正解し、そうでない人が間違える問題。回答が
+  DISCRIMINATION_MIN_ANSWERS 件未満の問題や、全員が正解・不正解の問題は null
+
+結果は question_analytics に書き込む（対象の問題の行を作り直す）。
+`flask --app src.main compute-question-analytics` から実行する。
+"""
+import json
+import math
+import time
+from array import array
+from datetime import datetime
+from src.models.user import db
+from src.models.quiz import Question, Choice, QuizAttempt, UserAnswer, QuestionAnalytics
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy は任意
+    numpy = None
+
+analytics = QuestionAnalytics.__table__
+
+# 一度に読む回答の行数
+CHUNK_ROWS = 100000
+# 書き込むときに一度にINSERTする行数
+WRITE_BATCH_ROWS = 5000
+# 識別力を求める最小の回答数
+DISCRIMINATION_MIN_ANSWERS = 20
+
+# 問題ごとの累計の種類（回答数, 正解数, 未選択数, Σx, Σx², Σx・正誤）
+# x は同じ挑戦の他の問題の正答率（0〜1）
+_TOTALS = ('answers', 'correct', 'skipped', 'sum_x', 'sum_xx', 'sum_xc')
+
+
+class _NumpyTotals:
+    """チャンクごとに bincount で加算する累計"""
+
+    name = 'numpy'
+
+    def __init__(self, questions=0, choices=0):
+        self.totals = {key: numpy.zeros(questions) for key in _TOTALS}
+        self.picks = numpy.zeros(choices, dtype=numpy.int64)
+
+    @staticmethod
+    def _accumulate(total, counts):
+        if len(counts) > len(total):
+            total = numpy.concatenate([total, numpy.zeros(len(counts) - len(total), dtype=total.dtype)])
+        total[:len(counts)] += counts
+        return total
+
+    def add(self, rows):
+        # Row のリストを直接 numpy.array にすると要素ごとの変換になり遅いので、列ごとに変換する
+        question_id, choice_id, correct, score, total_questions = (
+            numpy.array(column, dtype=numpy.int64) for column in zip(*rows)
+        )
+        correct = correct.astype(numpy.float64)
+        others = numpy.maximum(total_questions - 1, 1)
+        x = numpy.clip((score - correct) / others, 0.0, 1.0)
+        weights = {
+            'answers': None,
+            'correct': correct,
+            'skipped': (choice_id == 0).astype(numpy.float64),
+            'sum_x': x,
+            'sum_xx': x * x,
+            'sum_xc': x * correct,
+        }
+        for key, weight in weights.items():
+            self.totals[key] = self._accumulate(self.totals[key], numpy.bincount(question_id, weights=weight))
+        self.picks = self._accumulate(self.picks, numpy.bincount(choice_id))
+
+    def questions(self):
+        """(question_id, {累計の種類: 値}) のイテレーター"""
+        answers = self.totals['answers']
+        for question_id in numpy.flatnonzero(answers).tolist():
+            yield question_id, {key: float(self.totals[key][question_id]) for key in _TOTALS}
+
+    def choice_picks(self):
+        """{choice_id: 選ばれた回数}（0 は未選択なので除く）"""
+        picks = self.picks
+        return {choice_id: int(picks[choice_id]) for choice_id in numpy.flatnonzero(picks).tolist() if choice_id}
+
+
+class _ArrayTotals:
+    """NumPy がない場合の累計（標準の array に1行ずつ加算する）"""
+
+    name = 'array'
+
+    def __init__(self, questions=0, choices=0):
+        self.totals = {key: array('d', bytes(8 * questions)) for key in _TOTALS}
+        self.picks = array('q', bytes(8 * choices))
+
+    @staticmethod
+    def _grow(values, size):
+        if size > len(values):
+            values.extend([0] * (size - len(values)))
+
+    def add(self, rows):
+        totals = self.totals
+        answers, correct_total, skipped = totals['answers'], totals['correct'], totals['skipped']
+        sum_x, sum_xx, sum_xc = totals['sum_x'], totals['sum_xx'], totals['sum_xc']
+        picks = self.picks
+        for question_id, choice_id, correct, score, total_questions in rows:
+            if question_id >= len(answers):
+                # 集計中に追加された問題
+                for values in totals.values():
+                    self._grow(values, question_id + 1)
+            if choice_id >= len(picks):
+                self._grow(picks, choice_id + 1)
+            x = min(max((score - correct) / max(total_questions - 1, 1), 0.0), 1.0)
+            answers[question_id] += 1
+            correct_total[question_id] += correct
+            sum_x[question_id] += x
+            sum_xx[question_id] += x * x
+            sum_xc[question_id] += x * correct
+            if choice_id:
+                picks[choice_id] += 1
+            else:
+                skipped[question_id] += 1
+
+    def questions(self):
+        answers = self.totals['answers']
+        for question_id, count in enumerate(answers):
+            if count:
+                yield question_id, {key: self.totals[key][question_id] for key in _TOTALS}
+
+    def choice_picks(self):
+        return {choice_id: count for choice_id, count in enumerate(self.picks) if count}
+
+
+def backend_name():
+    """集計に使う実装（numpy / array）"""
+    return _NumpyTotals.name if numpy is not None else _ArrayTotals.name
+
+
+def _answers_query(quiz_id=None):
+    """
+    回答と挑戦の点数（問題id, 選択肢id, 正誤（0/1）, 点数, 問題数）
+
+    選択肢idはその問題の choices の行と結合した値で、未選択・その問題の選択肢で
+    ないもの（削除済み・負の値・数値でない値）は0（未選択）にする。
+    """
+    query = db.select(
+        UserAnswer.question_id,
+        db.func.coalesce(Choice.id, 0),
+        db.case((UserAnswer.is_correct == True, 1), else_=0),
+        QuizAttempt.score,
+        QuizAttempt.total_questions
+    ).join(QuizAttempt, QuizAttempt.id == UserAnswer.attempt_id)\
+        .outerjoin(Choice, (Choice.id == UserAnswer.selected_choice_id)
+                   & (Choice.question_id == UserAnswer.question_id))
+    if quiz_id is not None:
+        query = query.where(QuizAttempt.quiz_id == quiz_id)
+    return query
+
+
+def _discrimination(totals):
+    """点双列相関（回答が少ない・正誤や他の問題の正答率にばらつきがない場合は None）"""
+    n = totals['answers']
+    if n < DISCRIMINATION_MIN_ANSWERS:
+        return None
+    p = totals['correct'] / n
+    mean_x = totals['sum_x'] / n
+    variance_x = totals['sum_xx'] / n - mean_x * mean_x
+    denominator = variance_x * p * (1 - p)
+    if denominator <= 1e-12:
+        return None
+    r = (totals['sum_xc'] / n - p * mean_x) / math.sqrt(denominator)
+    return round(min(max(r, -1.0), 1.0), 4)
+
+
+def compute(quiz_id=None, chunk_rows=CHUNK_ROWS, use_numpy=True, log=None):
+    """
+    回答を集計して question_analytics を作り直す
+
+    quiz_id を指定すればそのクイズの問題だけ。use_numpy=False なら NumPy があっても
+    標準の array で集計する（比較用）。{'questions', 'rows', 'backend', 'seconds'} を返す。
+    """
+    started = time.perf_counter()
+    # 配列は実在する問題id・選択肢idの最大値で確保する
+    max_question_id = db.session.scalar(db.select(db.func.max(Question.id))) or 0
+    max_choice_id = db.session.scalar(db.select(db.func.max(Choice.id))) or 0
+    backend = _NumpyTotals if use_numpy and numpy is not None else _ArrayTotals
+    totals = backend(max_question_id + 1, max_choice_id + 1)
+    result = db.session.execute(_answers_query(quiz_id).execution_options(yield_per=chunk_rows))
+    rows = 0
+    for chunk in result.partitions():
+        totals.add(chunk)
+        rows += len(chunk)
+        if log:
+            log(f'{rows:,}行')
+
+    # 問題 → クイズ、選択肢 → 問題 の対応は集計の後に読む（問題数・選択肢数に比例）
+    picks = totals.choice_picks()
+    question_quiz = {}
+    choices_of = {}
+    query = db.select(Question.id, Question.quiz_id, Choice.id)\
+        .outerjoin(Choice, Choice.question_id == Question.id)
+    if quiz_id is not None:
+        query = query.where(Question.quiz_id == quiz_id)
+    for question_id, question_quiz_id, choice_id in db.session.execute(query.execution_options(yield_per=chunk_rows)):
+        question_quiz[question_id] = question_quiz_id
+        if choice_id is not None and choice_id in picks:
+            choices_of.setdefault(question_id, {})[str(choice_id)] = picks[choice_id]
+
+    computed_at = datetime.utcnow()
+    delete = db.delete(analytics)
+    if quiz_id is not None:
+        delete = delete.where(analytics.c.quiz_id == quiz_id)
+    db.session.execute(delete)
+
+    batch = []
+    count = 0
+    for question_id, question_totals in totals.questions():
+        if question_id not in question_quiz:
+            # 集計中に削除された問題
+            continue
+        answers = int(question_totals['answers'])
+        correct = int(question_totals['correct'])
+        batch.append({
+            'question_id': question_id,
+            'quiz_id': question_quiz[question_id],
+            'answers': answers,
+            'skipped': int(question_totals['skipped']),
+            'correct_count': correct,
+            'correct_rate': round(correct / answers * 100, 1),
+            'discrimination': _discrimination(question_totals),
+            'choice_counts': json.dumps(choices_of.get(question_id, {}), separators=(',', ':')),
+            'computed_at': computed_at
+        })
+        if len(batch) >= WRITE_BATCH_ROWS:
+            db.session.execute(db.insert(analytics), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(analytics), batch)
+        count += len(batch)
+    db.session.commit()
+    return {'questions': count, 'rows': rows, 'backend': totals.name,
+            'seconds': time.perf_counter() - started}
+
+
+def analytics_query(quiz_id):
+    """クイズの分析結果（ix_question_analytics_quiz_id の範囲読み込み）"""
+    return db.select(analytics).where(analytics.c.quiz_id == quiz_id)
+
+
+def _questions_query(quiz_id):
+    return db.select(
+        Question.id, Question.order_index, Question.question_text,
+        Choice.id, Choice.choice_text
+    ).outerjoin(Choice, Choice.question_id == Question.id)\
+        .where(Question.quiz_id == quiz_id)\
+        .order_by(Question.order_index, Question.id, Choice.order_index, Choice.id)
+
+
+def quiz_analytics(quiz_id):
+    """
+    クイズの問題ごとの分析結果（まだ集計していない問題は回答数0）
+
+    認証なしで公開するため、選択肢の正誤（解答キー）は含めない（クイズ詳細と同じ）。
+    """
+    results = {row.question_id: row for row in db.session.execute(analytics_query(quiz_id))}
+    questions = []
+    current = None
+    for question_id, order_index, question_text, choice_id, choice_text \
+            in db.session.execute(_questions_query(quiz_id)):
+        if current is None or current['question_id'] != question_id:
+            row = results.get(question_id)
+            current = {
+                'question_id': question_id,
+                'order_index': order_index,
+                'question_text': question_text,
+                'answers': row.answers if row else 0,
+                'skipped': row.skipped if row else 0,
+                'correct_rate': row.correct_rate if row else None,
+                'discrimination': row.discrimination if row else None,
+                'choices': [],
+                '_picks': json.loads(row.choice_counts) if row else {}
+            }
+            questions.append(current)
+        if choice_id is None:
+            continue
+        picks = current['_picks'].get(str(choice_id), 0)
+        current['choices'].append({
+            'id': choice_id,
+            'choice_text': choice_text,
+            'picks': picks,
+            'rate': round(picks / current['answers'] * 100, 1) if current['answers'] else None
+        })
+    for question in questions:
+        del question['_picks']
+
+    computed_at = max((row.computed_at for row in results.values()), default=None)
+    return {
+        'quiz_id': quiz_id,
+        'computed_at': computed_at.isoformat() if computed_at else None,
+        'questions': questions
+    }
@@ -0,0 +1,279 @@
+"""
+ミックスクイズ（タグ・難易度で絞り込んだ問題からランダムに出題）
+
+公開クイズの問題idを (タグid, 難易度) ごとの配列（プール）に分けて持っておき、
+絞り込みに一致するプールを並べた範囲から一様に抜き出す。
+
+- ORDER BY RANDOM() や問題の全件読み込みをせず、抜き出す件数分の乱数だけで選ぶ
+- 選んだ問題と選択肢は1クエリでまとめて読み込み、行から直接JSONを組み立てる
+- 採点は問題の属するクイズごとの送信に分けて、一括送信（batch_grading）で行う
+
+プールはプロセスごとに最初の出題時に作り、INDEX_CHECK_SECONDS ごとに内容の
+バージョンを確認して作り直す（answer_index と同じ）。
+"""
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, groupby
+from src.models.user import db
+from src.models.quiz import Quiz, Question, Choice, OshiTag
+from src.services import answer_index, batch_grading
+from src.services.grading import rank_for_percentage
+from src.utils.serializers import JSONSerializer
+
+# 内容のバージョンを確認する間隔（秒）
+INDEX_CHECK_SECONDS = 30
+# プールを作るときに一度に読む行数
+BUILD_BATCH_ROWS = 50000
+# 出題数（既定と上限）
+DEFAULT_QUESTIONS = 10
+MAX_QUESTIONS = 50
+
+_lock = threading.Lock()
+_pools = None
+_checked_at = float('-inf')
+
+_CHOICE_JSON = JSONSerializer([
+    ('id', 'int', 0),
+    ('choice_text', 'str', 1),
+    ('order_index', 'int', 2),
+], name='pool_choice_row')
+
+# (question_id, quiz_id, question_text, question_type, order_index, choices)
+_QUESTION_JSON = JSONSerializer([
+    ('id', 'int', 0),
+    ('quiz_id', 'int', 1),
+    ('question_text', 'str', 2),
+    ('question_type', 'str', 3),
+    ('order_index', 'int', 4),
+    ('choices', [_CHOICE_JSON], 5),
+], name='pool_question_row')
+
+
+class QuestionPools:
+    """(タグid, 難易度) → 問題idの配列"""
+
+    def __init__(self, version):
+        self.version = version
+        self.pools = {}
+        self.tag_categories = {}
+
+    def select(self, tag_id=None, difficulty=None, category=None):
+        """絞り込みに一致するプールのリスト（キーの順、空のプールは含まない）"""
+        return [
+            pool for (pool_tag_id, pool_difficulty), pool in sorted(self.pools.items())
+            if (tag_id is None or pool_tag_id == tag_id)
+            and (difficulty is None or pool_difficulty == difficulty)
+            and (category is None or self.tag_categories.get(pool_tag_id) == category)
+        ]
+
+    def nbytes(self):
+        return sum(pool.itemsize * len(pool) for pool in self.pools.values())
+
+
+def _version_query():
+    """内容のバージョン: (問題数, 最大問題id, クイズ数, 最終更新日時, タグ数)"""
+    return db.select(
+        db.select(db.func.count(Question.id)).scalar_subquery(),
+        db.select(db.func.max(Question.id)).scalar_subquery(),
+        db.select(db.func.count(Quiz.id)).scalar_subquery(),
+        db.select(db.func.max(Quiz.updated_at)).scalar_subquery(),
+        db.select(db.func.count(OshiTag.id)).scalar_subquery(),
+    )
+
+
+def _current_version():
+    return tuple(db.session.execute(_version_query()).one())
+
+
+def build_pools(version=None):
+    """公開クイズの問題idを (タグid, 難易度) ごとに読み込む"""
+    if version is None:
+        version = _current_version()
+    result = QuestionPools(version)
+    result.tag_categories = dict(db.session.execute(db.select(OshiTag.id, OshiTag.category)).all())
+    query = db.select(Question.id, Quiz.oshi_tag_id, Quiz.difficulty)\
+        .join(Quiz, Quiz.id == Question.quiz_id)\
+        .where(Quiz.is_public == True)\
+        .order_by(Question.id)\
+        .execution_options(yield_per=BUILD_BATCH_ROWS)
+    pools = result.pools
+    for question_id, tag_id, difficulty in db.session.execute(query):
+        pool = pools.get((tag_id, difficulty))
+        if pool is None:
+            pool = pools[(tag_id, difficulty)] = array('i')
+        pool.append(question_id)
+    return result
+
+
+def get_pools():
+    """
+    現在のプールを返す
+
+    INDEX_CHECK_SECONDS を過ぎていればバージョンを確認し、
+    変わっていれば作り直す。
+    """
+    global _pools, _checked_at
+    now = time.monotonic()
+    if _pools is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+        return _pools
+    with _lock:
+        if _pools is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+            return _pools
+        version = _current_version()
+        if _pools is None or version != _pools.version:
+            _pools = build_pools(version)
+        _checked_at = now
+        return _pools
+
+
+def invalidate():
+    """このプロセスでクイズの内容を変えたときに呼ぶ（次の参照時にバージョンを確認する）"""
+    global _checked_at
+    _checked_at = float('-inf')
+
+
+def sample(pools, count, rng=random):
+    """
+    プールを並べた範囲から重複なしで count 件を一様に選ぶ
+
+    並べた範囲の通し番号を選び、プールの累積の大きさから元のプールを二分探索で引く
+    （プールの連結やコピーはしない）。
+    """
+    ends = list(accumulate(len(pool) for pool in pools))
+    total = ends[-1] if ends else 0
+    question_ids = []
+    for position in rng.sample(range(total), min(count, total)):
+        i = bisect_right(ends, position)
+        question_ids.append(pools[i][position - (ends[i - 1] if i else 0)])
+    return question_ids
+
+
+def load_questions(question_ids):
+    """
+    問題と選択肢を1クエリで読み込み、question_ids の順のJSON配列にする
+
+    order_index はミックスクイズの中での出題順（1から）にする。
+    """
+    if not question_ids:
+        return '[]'
+    rows = db.session.execute(
+        db.select(
+            Question.id, Question.quiz_id, Question.question_text, Question.question_type,
+            Choice.id, Choice.choice_text, Choice.order_index
+        ).outerjoin(Choice, Choice.question_id == Question.id)
+        .where(Question.id.in_(question_ids))
+        .order_by(Question.id, Choice.order_index, Choice.id)
+    ).all()
+
+    loaded = {}
+    for question_id, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        first = group[0]
+        choices = [(row[4], row[5], row[6]) for row in group if row[4] is not None]
+        loaded[question_id] = (first[1], first[2], first[3], choices)
+
+    # プールを作った後に削除された問題は飛ばす
+    questions = [
+        (question_id,) + loaded[question_id][:3] + (position,) + loaded[question_id][3:]
+        for position, question_id in enumerate((q for q in question_ids if q in loaded), 1)
+    ]
+    return _QUESTION_JSON.encode_list(questions)
+
+
+def random_quiz(count, tag_id=None, difficulty=None, category=None, seed=None):
+    """
+    絞り込みに一致する問題から count 問を選び、レスポンスのJSON文字列を返す
+
+    seed を指定すると同じプールからは同じ問題が同じ順で選ばれる（出題の共有用）。
+    """
+    pools = get_pools().select(tag_id, difficulty, category)
+    rng = random.Random(seed) if seed is not None else random
+    question_ids = sample(pools, count, rng)
+    questions_json = load_questions(question_ids)
+    pool_size = sum(len(pool) for pool in pools)
+    return f'{{"pool_size":{pool_size},"questions":{questions_json}}}'
+
+
+def _split_by_quiz(answers):
+    """回答を問題の属するクイズごとに分ける（{quiz_id: [(回答の位置, 回答), ...]}）"""
+    index = answer_index.get_index()
+    quiz_of = {}
+    for answer in answers:
+        quiz_of[answer['question_id']] = index.quiz_of(answer['question_id'])
+    # 解答キーの索引にない問題（索引の作成後に作られたクイズなど）はDBで引く
+    missing = sorted(q for q, quiz_id in quiz_of.items() if not quiz_id)
+    if missing:
+        quiz_of.update(db.session.execute(
+            db.select(Question.id, Question.quiz_id).where(Question.id.in_(missing))
+        ).all())
+    groups = {}
+    for position, answer in enumerate(answers):
+        quiz_id = quiz_of[answer['question_id']]
+        if not quiz_id:
+            raise ValueError(f"question {answer['question_id']} not found")
+        groups.setdefault(quiz_id, []).append((position, answer))
+    return groups
+
+
+def submit_answers(user_id, answers, time_taken=0):
+    """
+    ミックスクイズの回答を採点して登録する
+
+    問題の属するクイズごとの送信に分けて一括送信と同じ処理で登録する（クイズごとに
+    挑戦記録が1件でき、統計・ランキングもそれぞれ更新される）。time_taken は
+    クイズごとの回答数で按分する。全体のスコアと挑戦記録、回答ごとの正誤を返す。
+    """
+    if not isinstance(answers, list) or not answers:
+        raise ValueError('answers must be a non-empty list')
+    for answer in answers:
+        if not isinstance(answer, dict) or not batch_grading._is_int(answer.get('question_id')):
+            raise ValueError('question_id is required')
+        choice_id = answer.get('selected_choice_id')
+        if choice_id is not None and not batch_grading._is_int(choice_id):
+            raise ValueError('selected_choice_id must be an integer')
+    if time_taken is not None and not batch_grading._is_int(time_taken):
+        raise ValueError('time_taken must be an integer')
+
+    groups = _split_by_quiz(answers)
+    submissions = []
+    remaining = time_taken
+    for quiz_id, group in groups.items():
+        share = None
+        if time_taken is not None:
+            share = time_taken * len(group) // len(answers)
+            remaining -= share
+        submissions.append({
+            'quiz_id': quiz_id,
+            'user_id': user_id,
+            'answers': [answer for _, answer in group],
+            'time_taken': share
+        })
+    if time_taken is not None:
+        # 端数は最初のクイズに足す
+        submissions[0]['time_taken'] += remaining
+
+    # 1つのクイズの送信でも不正なら全体を登録しない（一部のクイズの挑戦だけが残らないようにする）
+    results = batch_grading.submit_batch(submissions, atomic=True)
+    for result in results:
+        if 'error' in result:
+            raise ValueError(result['error'])
+
+    details = [None] * len(answers)
+    for (quiz_id, group), result in zip(groups.items(), results):
+        for (position, _), graded in zip(group, result['answers']):
+            details[position] = dict(graded, quiz_id=quiz_id)
+    score = sum(1 for d in details if d['is_correct'])
+    total = len(details)
+    percentage = score / total * 100
+    return {
+        'score': score,
+        'total_questions': total,
+        'percentage': round(percentage, 1),
+        'rank': rank_for_percentage(percentage),
+        'time_taken': time_taken,
+        'attempts': [result['attempt'] for result in results],
+        'answers': details
+    }
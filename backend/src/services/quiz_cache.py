@@ -0,0 +1,168 @@
+import hashlib
+import time
+from datetime import datetime
+from flask import current_app
+from itertools import groupby
+from src.models.user import db
+from src.models.quiz import Quiz, Question, Choice, OshiTag
+from src.utils.cache import LRUCache
+from src.utils.compression import CompressedBody
+from src.utils.serializers import JSONSerializer
+
+# キャッシュするクイズ数の上限
+DETAIL_CACHE_SIZE = 256
+# この秒数以内に確認したエントリはDBに問い合わせずにそのまま返す
+DETAIL_CACHE_TTL = 30
+
+_cache = LRUCache(DETAIL_CACHE_SIZE)
+
+# _load_questions の行から Question.to_dict / Choice.to_dict と同じJSONを直接組み立てる
+_CHOICE_JSON = JSONSerializer([
+    ('id', 'int', 0),
+    ('choice_text', 'str', 1),
+    ('order_index', 'int', 2),
+], name='choice_row')
+
+_QUESTION_JSON = JSONSerializer([
+    ('id', 'int', 0),
+    ('question_text', 'str', 1),
+    ('question_type', 'str', 2),
+    ('order_index', 'int', 3),
+    ('choices', [_CHOICE_JSON], 4),
+], name='question_row')
+
+
+class CachedQuiz:
+    """エンコード済みのクイズ詳細レスポンス（圧縮版は compressed に作って保持する）"""
+
+    def __init__(self, version, header, questions_json, checked_at):
+        self.version = version
+        self.header = header
+        self.questions_json = questions_json
+        self.checked_at = checked_at
+        self.body = _encode_body(header, questions_json)
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.compressed = CompressedBody(self.body)
+
+    def revalidated(self, header, checked_at):
+        """内容はそのままに、統計などのヘッダー部分だけ差し替えたエントリを返す"""
+        if header == self.header:
+            self.checked_at = checked_at
+            return self
+        return CachedQuiz(self.version, header, self.questions_json, checked_at)
+
+
+def _dumps(obj):
+    """jsonify と同じ設定でコンパクトにエンコードする"""
+    return current_app.json.dumps(obj, separators=(',', ':'))
+
+
+def _encode_body(header, questions_json):
+    """ヘッダー部分をエンコードし、エンコード済みの問題一覧を埋め込む"""
+    header_json = _dumps(header)
+    return (header_json[:-1] + ',"questions":' + questions_json + '}').encode('utf-8')
+
+
+def _load_header(quiz_id):
+    """クイズ本体とタグを1クエリで読み込み、(version, header) を返す"""
+    row = db.session.query(Quiz, OshiTag)\
+        .outerjoin(OshiTag, OshiTag.id == Quiz.oshi_tag_id)\
+        .filter(Quiz.id == quiz_id)\
+        .first()
+    if row is None:
+        return None, None
+    quiz, tag = row
+    header = {
+        'id': quiz.id,
+        'creator_id': quiz.creator_id,
+        'title': quiz.title,
+        'description': quiz.description,
+        'oshi_tag': {
+            'id': tag.id,
+            'name': tag.name,
+            'category': tag.category
+        } if tag else None,
+        'difficulty': quiz.difficulty,
+        'play_count': quiz.play_count,
+        'average_score': quiz.average_score,
+        'rating': quiz.rating,
+        'rating_count': quiz.rating_count,
+        'created_at': quiz.created_at.isoformat()
+    }
+    return quiz.updated_at, header
+
+
+def questions_query(quiz_id):
+    """クイズの問題と選択肢を表示順に並べたSELECT（問題1行 × 選択肢の数だけ行が返る）"""
+    return db.select(
+        Question.id, Question.question_text, Question.question_type, Question.order_index,
+        Choice.id, Choice.choice_text, Choice.order_index
+    ).outerjoin(Choice, Choice.question_id == Question.id)\
+        .where(Question.quiz_id == quiz_id)\
+        .order_by(Question.order_index, Question.id, Choice.order_index, Choice.id)
+
+
+def _load_questions(quiz_id):
+    """
+    問題と選択肢を1クエリで読み込み、エンコード済みのJSONと問題数を返す
+
+    ORMオブジェクトや辞書は作らず、行から直接JSONを組み立てる。
+    """
+    rows = db.session.execute(questions_query(quiz_id)).all()
+
+    questions = []
+    for question_id, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        first = group[0]
+        choices = [(row[4], row[5], row[6]) for row in group if row[4] is not None]
+        questions.append((question_id, first[1], first[2], first[3], choices))
+    return _QUESTION_JSON.encode_list(questions), len(questions)
+
+
+def get_quiz_detail(quiz_id):
+    """
+    クイズ詳細のレスポンス（CachedQuiz）を返す。存在しない場合は None
+
+    TTL以内のエントリはDBに触れずに返す。TTLを過ぎたエントリは
+    クイズ本体の1行だけを読み直し、内容のバージョン（updated_at）が
+    変わっていなければ、エンコード済みの問題一覧を再利用する。
+    """
+    now = time.monotonic()
+    entry = _cache.get(quiz_id)
+    if entry is not None and now - entry.checked_at < DETAIL_CACHE_TTL:
+        return entry
+
+    version, header = _load_header(quiz_id)
+    if header is None:
+        _cache.pop(quiz_id)
+        return None
+
+    if entry is not None and entry.version == version:
+        header['question_count'] = entry.header['question_count']
+        entry = entry.revalidated(header, now)
+    else:
+        questions_json, question_count = _load_questions(quiz_id)
+        header['question_count'] = question_count
+        entry = CachedQuiz(version, header, questions_json, now)
+    _cache.set(quiz_id, entry)
+    return entry
+
+
+def invalidate(quiz_id):
+    """このプロセスのキャッシュからクイズを取り除く"""
+    _cache.pop(quiz_id)
+
+
+def mark_quiz_changed(quiz_id):
+    """
+    問題や選択肢を編集した後に呼ぶ
+
+    クイズの内容バージョン（updated_at）を進め、他のワーカーも
+    次回の確認時に作り直すようにする。呼び出し側でコミットすること。
+    """
+    db.session.execute(
+        db.update(Quiz.__table__)
+        .where(Quiz.__table__.c.id == quiz_id)
+        .values(updated_at=datetime.utcnow())
+    )
+    invalidate(quiz_id)
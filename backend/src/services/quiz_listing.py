@@ -0,0 +1,128 @@
+from functools import lru_cache
+from flask import current_app
+from src.models.user import db
+from src.models.quiz import Quiz, Question, OshiTag
+from src.utils.serializers import JSONSerializer
+
+# 一覧APIで指定できるフィールド（fields=で射影できる）
+QUIZ_LIST_FIELDS = (
+    'id', 'creator_id', 'title', 'description', 'oshi_tag', 'difficulty',
+    'play_count', 'average_score', 'rating', 'rating_count', 'created_at',
+    'question_count'
+)
+
+# 一覧のフィールドの型（listing_query の列名と同じ）
+_FIELD_TYPES = {
+    'id': 'int',
+    'creator_id': 'int',
+    'title': 'str',
+    'description': 'str',
+    'difficulty': 'str',
+    'play_count': 'int',
+    'average_score': 'float',
+    'rating': 'float',
+    'rating_count': 'int',
+    'created_at': 'datetime',
+    'question_count': 'int',
+}
+
+
+def listing_query(fields, join_tag=False):
+    """
+    一覧表示用のクエリ（1クエリで完結）
+
+    fields で指定された列だけをSELECTする。タグはJOINで、問題数は相関
+    サブクエリで取得するため、クイズごとの遅延ロード（N+1）が発生しない。
+    キーセットページネーション用に id と created_at は常に含める。
+    """
+    columns = [Quiz.id, Quiz.created_at]
+    for field in fields:
+        if field in ('id', 'created_at'):
+            continue
+        if field == 'oshi_tag':
+            join_tag = True
+            columns += [
+                OshiTag.id.label('oshi_tag_id'),
+                OshiTag.name.label('oshi_tag_name'),
+                OshiTag.category.label('oshi_tag_category'),
+            ]
+        elif field == 'question_count':
+            # 返す行の分だけインデックスで数える（questions全体は集計しない）
+            columns.append(
+                db.select(db.func.count(Question.id))
+                .where(Question.quiz_id == Quiz.id)
+                .correlate(Quiz)
+                .scalar_subquery()
+                .label('question_count')
+            )
+        else:
+            columns.append(getattr(Quiz, field))
+
+    query = db.session.query(*columns).select_from(Quiz)
+    if join_tag:
+        query = query.outerjoin(OshiTag, OshiTag.id == Quiz.oshi_tag_id)
+    return query
+
+
+def listing_serializer(fields, columns):
+    """
+    listing_query の行を直接JSONにするシリアライザーを返す
+
+    fields と行の列名（Row._fields）の組み合わせごとに作って使い回す。
+    """
+    return _listing_serializer(tuple(sorted(fields)), tuple(columns))
+
+
+@lru_cache(maxsize=128)
+def _listing_serializer(fields, columns):
+    position = {name: i for i, name in enumerate(columns)}
+    spec = []
+    for field in fields:
+        if field == 'oshi_tag':
+            # タグ列（oshi_tag_*）を oshi_tag オブジェクトとしてエンコードする
+            tag_id = position['oshi_tag_id']
+            tag = JSONSerializer([
+                ('id', 'int', tag_id),
+                ('name', 'str', position['oshi_tag_name']),
+                ('category', 'str', position['oshi_tag_category']),
+            ], name='oshi_tag_row')
+            spec.append(('oshi_tag', tag, lambda row: row if row[tag_id] is not None else None))
+        else:
+            spec.append((field, _FIELD_TYPES[field], position[field]))
+    return JSONSerializer(spec, name='quiz_row')
+
+
+def listing_json(rows, fields):
+    """listing_query の行を Quiz.to_summary_dict と同じ形のJSON配列（文字列）にする"""
+    if not rows:
+        return '[]'
+    return listing_serializer(fields, rows[0]._fields).encode_list(rows)
+
+
+@lru_cache(maxsize=32)
+def _search_serializer(fields, columns):
+    hit = JSONSerializer([
+        ('quiz', _listing_serializer(fields, columns), 0),
+        ('score', 'int', 1),
+        ('question_ids', ['int'], 2),
+    ], name='search_hit')
+    return JSONSerializer([
+        ('query', 'str', 0),
+        ('total', 'int', 1),
+        ('results', [hit], 2),
+    ], name='search_result')
+
+
+def search_json(query, total, hits, fields):
+    """
+    検索結果 [(quiz_id, score, [question_id, ...])] を一覧と同じ形のクイズと一緒にJSONにする
+
+    クイズは1クエリでまとめて読み込み、検索結果の順番に並べる。
+    """
+    rows = listing_query(fields).filter(Quiz.id.in_([quiz_id for quiz_id, _, _ in hits])).all() if hits else []
+    by_id = {row.id: row for row in rows}
+    results = [(by_id[quiz_id], score, question_ids)
+               for quiz_id, score, question_ids in hits if quiz_id in by_id]
+    if not results:
+        return current_app.json.dumps({'query': query, 'total': total, 'results': []}, separators=(',', ':'))
+    return _search_serializer(tuple(sorted(fields)), tuple(rows[0]._fields)).encode((query, total, results))
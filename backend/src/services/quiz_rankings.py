@@ -0,0 +1,47 @@
+import time
+from src.models.quiz import Quiz, OshiTag
+from src.services.quiz_listing import QUIZ_LIST_FIELDS, listing_query, listing_json
+from src.utils.cache import LRUCache
+from src.utils.compression import CompressedBody
+
+# ランキングに載せるクイズ数
+RANKING_SIZE = 10
+# ランキングを作り直す間隔（秒）。この間はキャッシュをそのまま返す
+RANKING_REFRESH_SECONDS = 60
+
+# (category, difficulty) -> (作成時刻, エンコード済みJSON の CompressedBody)
+_cache = LRUCache(64)
+
+
+def _build_ranking(category, difficulty):
+    """人気順（挑戦回数の多い順）の上位クイズを1クエリで集計する"""
+    query = listing_query(QUIZ_LIST_FIELDS, join_tag=bool(category)).filter(Quiz.is_public == True)
+    if category:
+        query = query.filter(OshiTag.category == category)
+    if difficulty:
+        query = query.filter(Quiz.difficulty == difficulty)
+    rows = query.order_by(Quiz.play_count.desc(), Quiz.id).limit(RANKING_SIZE).all()
+    return listing_json(rows, QUIZ_LIST_FIELDS).encode('utf-8')
+
+
+def get_ranking(category=None, difficulty=None):
+    """
+    人気ランキング（エンコード済みJSON の CompressedBody）を返す
+
+    カテゴリ・難易度の組み合わせごとに結果を保持し、
+    RANKING_REFRESH_SECONDS を過ぎたものだけ作り直す。
+    """
+    key = (category or None, difficulty or None)
+    now = time.monotonic()
+    cached = _cache.get(key)
+    if cached is not None and now - cached[0] < RANKING_REFRESH_SECONDS:
+        return cached[1]
+
+    body = CompressedBody(_build_ranking(*key))
+    _cache.set(key, (now, body))
+    return body
+
+
+def invalidate():
+    """このプロセスのランキングを全て作り直させる"""
+    _cache.clear()
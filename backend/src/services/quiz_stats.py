@@ -0,0 +1,78 @@
+from src.models.user import db
+from src.models.quiz import Quiz, QuizAttempt
+
+quizzes = Quiz.__table__
+
+
+def _average_score(total_score, total_answered):
+    """正解数累計 / 出題数累計 から平均正答率（%）を求めるSQL式"""
+    return db.case(
+        (total_answered > 0, total_score * 100.0 / total_answered),
+        else_=0.0
+    )
+
+
+def record_attempt(quiz_id, score, total_questions, attempts=1):
+    """
+    挑戦結果をクイズの累計値に加算する
+
+    1文のUPDATEで加算するため、同時に送信されても値が失われない。
+    平均正答率も累計値から同じ文の中で求める（過去の挑戦は読み込まない）。
+    統計の更新はクイズ内容の変更ではないので updated_at は変えない。
+    """
+    new_total_score = quizzes.c.total_score + score
+    new_total_answered = quizzes.c.total_answered + total_questions
+    db.session.execute(
+        db.update(quizzes)
+        .where(quizzes.c.id == quiz_id)
+        .values(
+            play_count=db.func.coalesce(quizzes.c.play_count, 0) + attempts,
+            total_score=new_total_score,
+            total_answered=new_total_answered,
+            average_score=_average_score(new_total_score, new_total_answered),
+            updated_at=quizzes.c.updated_at
+        )
+    )
+
+
+def recompute_quiz_stats():
+    """
+    quiz_attempts から全クイズの統計を再構築する（修復用）
+
+    集計は1回のGROUP BYクエリで行い、結果をまとめてUPDATEする。
+    挑戦が1件もないクイズは0に戻す。更新したクイズ数を返す。
+    """
+    totals = db.session.query(
+        QuizAttempt.quiz_id,
+        db.func.count(QuizAttempt.id),
+        db.func.coalesce(db.func.sum(QuizAttempt.score), 0),
+        db.func.coalesce(db.func.sum(QuizAttempt.total_questions), 0)
+    ).group_by(QuizAttempt.quiz_id).all()
+
+    db.session.execute(
+        db.update(quizzes).values(
+            play_count=0, total_score=0, total_answered=0, average_score=0.0,
+            updated_at=quizzes.c.updated_at
+        )
+    )
+    if totals:
+        db.session.execute(
+            db.update(quizzes)
+            .where(quizzes.c.id == db.bindparam('target_id'))
+            .values(
+                play_count=db.bindparam('new_play_count'),
+                total_score=db.bindparam('new_total_score'),
+                total_answered=db.bindparam('new_total_answered'),
+                average_score=db.bindparam('new_average_score'),
+                updated_at=quizzes.c.updated_at
+            ),
+            [{
+                'target_id': quiz_id,
+                'new_play_count': play_count,
+                'new_total_score': total_score,
+                'new_total_answered': total_answered,
+                'new_average_score': (total_score / total_answered * 100) if total_answered > 0 else 0.0
+            } for quiz_id, play_count, total_score, total_answered in totals]
+        )
+    db.session.commit()
+    return len(totals)
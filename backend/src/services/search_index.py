@@ -0,0 +1,365 @@
+"""
+クイズの全文検索（文字 bigram の転置インデックス）
+
+形態素解析を使わずに日本語を検索できるよう、正規化した文字列の2文字ずつ（bigram）を
+索引の単位にする。フィールド（タイトル・説明・問題文・選択肢）ごとに索引を持つ。
+
+- 正規化: NFKC（全角英数・半角カナを統一）→ 小文字 → カタカナをひらがなに
+- 検索語は空白で区切った全ての語を含むクイズを返す（AND）。語の bigram の出現リストの
+  積集合を取り、3文字以上の語は正規化した本文に語が含まれるかで確かめる
+- 1文字の語は、その文字で始まる bigram の出現リストの和を候補にする
+- スコアは一致したフィールドの重みの合計（タイトル > 説明 > 問題文 > 選択肢）。
+  問題文・選択肢は一致した問題の数だけ加える
+
+索引はプロセスごとに最初の検索時に作る（SEARCH_INDEX_PRELOAD=1 なら起動時）。
+このプロセスで作成したクイズは add_quiz でその場で追加し、他のワーカーで作成された
+クイズは INDEX_CHECK_SECONDS ごとの確認で差分だけ追加する。既存のクイズが
+変更・削除されていた場合は作り直す。
+
+検索はロックを取らずに索引を読むので、公開済みの索引は変更しない。差分の追加は
+索引の複製（辞書の浅いコピーと、追加する bigram の出現リストだけのコピー）に対して
+行い、できあがったものに参照を差し替える（answer_index と同じ）。
+"""
+import heapq
+import logging
+import operator
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+from src.models.user import db
+from src.models.quiz import Quiz, Question, Choice
+
+logger = logging.getLogger(__name__)
+
+# 内容の変更を確認する間隔（秒）
+INDEX_CHECK_SECONDS = 30
+# 索引を作るときに一度に読む行数
+BUILD_BATCH_ROWS = 50000
+# 1クイズの結果に含める一致した問題の数
+MATCHED_QUESTIONS = 3
+
+# フィールドの重み（タイトル > 説明 > 問題文 > 選択肢）
+TITLE, DESCRIPTION, QUESTION, CHOICES = range(4)
+WEIGHTS = {
+    TITLE: 10,
+    DESCRIPTION: 3,
+    QUESTION: 2,
+    CHOICES: 1,
+}
+# クイズ単位のフィールド（それ以外は問題単位）
+QUIZ_FIELDS = (TITLE, DESCRIPTION)
+
+# 文末の印（末尾の1文字も「その文字で始まる bigram」に入るようにする）
+_END = '\x00'
+# カタカナ → ひらがな
+_KANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+_lock = threading.Lock()
+_index = None
+_checked_at = float('-inf')
+
+
+def normalize(text):
+    """検索用の正規化（NFKC・小文字・カタカナをひらがなに）"""
+    if not text:
+        return ''
+    return unicodedata.normalize('NFKC', text).lower().translate(_KANA)
+
+
+def bigrams(text):
+    """正規化済みの文字列の bigram の集合（末尾は文末の印と組にする）"""
+    padded = text + _END
+    return {padded[i:i + 2] for i in range(len(text))}
+
+
+class _Field:
+    """1つのフィールドの転置インデックス（bigram → id の配列）と正規化済みの本文"""
+
+    __slots__ = ('postings', 'by_first', 'texts', 'owned')
+
+    def __init__(self):
+        self.postings = {}
+        # 1文字の検索語用: 文字 → その文字で始まる bigram のリスト
+        self.by_first = {}
+        self.texts = {}
+        # 複製した索引で、この索引のためにコピー済みの出現リスト（None なら全て自分のもの）
+        self.owned = None
+
+    def copy(self):
+        """出現リストを元の索引と共有した複製（add で変更する出現リストだけコピーする）"""
+        field = _Field()
+        field.postings = dict(self.postings)
+        field.by_first = dict(self.by_first)
+        field.texts = dict(self.texts)
+        field.owned = set()
+        return field
+
+    def add(self, doc_id, text):
+        text = normalize(text)
+        if not text:
+            return
+        self.texts[doc_id] = text
+        owned = self.owned
+        for gram in bigrams(text):
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array('i')
+                if owned is None:
+                    self.by_first.setdefault(gram[0], []).append(gram)
+                else:
+                    self.by_first[gram[0]] = self.by_first.get(gram[0], []) + [gram]
+                    owned.add(gram)
+            elif owned is not None and gram not in owned:
+                postings = self.postings[gram] = array('i', postings)
+                owned.add(gram)
+            postings.append(doc_id)
+
+    def match(self, term):
+        """語を含む id の集合"""
+        if len(term) == 1:
+            ids = set()
+            for gram in self.by_first.get(term, ()):
+                ids.update(self.postings[gram])
+            return ids
+        lists = []
+        for i in range(len(term) - 1):
+            postings = self.postings.get(term[i:i + 2])
+            if postings is None:
+                return set()
+            lists.append(postings)
+        # 短い方から2つの出現リストで絞り込み、残りは本文で確かめる
+        # （bigram が全て含まれていても語として続いているとは限らないので、どのみち確かめる）
+        lists.sort(key=len)
+        ids = set(lists[0])
+        if len(lists) > 1:
+            ids.intersection_update(lists[1])
+        if ids and len(term) > 2:
+            ids = list(ids)
+            texts = map(self.texts.__getitem__, ids)
+            ids = set(compress(ids, map(operator.contains, texts, repeat(term))))
+        return ids
+
+
+class SearchIndex:
+    """フィールドごとの転置インデックス（クイズ単位: タイトル・説明、問題単位: 問題文・選択肢）"""
+
+    def __init__(self):
+        self.fields = {field: _Field() for field in WEIGHTS}
+        self.question_quiz = {}
+        self.quiz_questions = {}
+        self.quiz_ids = set()
+        # 索引に入っている範囲の確認用（公開クイズ数, 最大id, 最終更新日時）
+        self.snapshot = (0, 0, None)
+
+    def copy(self):
+        """差分を追加するための複製（公開中の索引は検索中に変更しない）"""
+        index = SearchIndex()
+        index.fields = {field: f.copy() for field, f in self.fields.items()}
+        index.question_quiz = dict(self.question_quiz)
+        index.quiz_questions = dict(self.quiz_questions)
+        index.quiz_ids = set(self.quiz_ids)
+        index.snapshot = self.snapshot
+        return index
+
+    def add_quiz(self, quiz_id, title, description):
+        self.quiz_ids.add(quiz_id)
+        self.fields[TITLE].add(quiz_id, title)
+        self.fields[DESCRIPTION].add(quiz_id, description)
+
+    def add_question(self, quiz_id, question_id, question_text, choices_text):
+        self.question_quiz[question_id] = quiz_id
+        self.quiz_questions.setdefault(quiz_id, array('i')).append(question_id)
+        self.fields[QUESTION].add(question_id, question_text)
+        self.fields[CHOICES].add(question_id, choices_text)
+
+    def _match_term(self, term):
+        """語に一致したクイズのスコア {quiz_id: score} と一致した問題idの集合"""
+        scores = Counter()
+        questions = set()
+        for field, weight in WEIGHTS.items():
+            ids = self.fields[field].match(term)
+            if not ids:
+                continue
+            if field in QUIZ_FIELDS:
+                scores.update(dict.fromkeys(ids, weight))
+            else:
+                questions |= ids
+                counts = Counter(map(self.question_quiz.__getitem__, ids))
+                scores.update({quiz_id: count * weight for quiz_id, count in counts.items()})
+        return scores, questions
+
+    def search(self, query, limit):
+        """
+        検索して (一致したクイズ数, [(quiz_id, score, [question_id, ...]), ...]) を返す
+
+        結果はスコアの高い順、同点なら新しいクイズ（idの大きい順）から limit 件。
+        問題idは一致した語の多い順に MATCHED_QUESTIONS 件まで。
+        """
+        terms = [normalize(t) for t in query.split()]
+        terms = list(dict.fromkeys(t for t in terms if t))
+        if not terms:
+            return 0, []
+
+        per_term = []
+        hits = None
+        for term in terms:
+            scores, questions = self._match_term(term)
+            hits = scores.keys() if hits is None else hits & scores.keys()
+            if not hits:
+                return 0, []
+            per_term.append((scores, questions))
+
+        totals = {quiz_id: sum(scores[quiz_id] for scores, _ in per_term) for quiz_id in hits}
+        top = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], item[0]))
+        results = []
+        for quiz_id, score in top:
+            matched = Counter()
+            for _, questions in per_term:
+                matched.update(q for q in self.quiz_questions.get(quiz_id, ()) if q in questions)
+            question_ids = sorted(matched, key=lambda q: (-matched[q], q))[:MATCHED_QUESTIONS]
+            results.append((quiz_id, score, sorted(question_ids)))
+        return len(hits), results
+
+    def documents(self):
+        return len(self.quiz_ids) + len(self.question_quiz)
+
+    def grams(self):
+        return sum(len(f.postings) for f in self.fields.values())
+
+    def nbytes(self):
+        """出現リストの配列のおおよその大きさ（確認用）"""
+        return sum(len(p) for f in self.fields.values() for p in f.postings.values()) * 4
+
+
+def _snapshot_query(max_quiz_id=None):
+    """公開クイズ（max_quiz_id 以下）の (件数, 最大id, 最終更新日時) を取得するSELECT"""
+    query = db.select(db.func.count(Quiz.id), db.func.max(Quiz.id), db.func.max(Quiz.updated_at))\
+        .where(Quiz.is_public == True)
+    if max_quiz_id is not None:
+        query = query.where(Quiz.id <= max_quiz_id)
+    return query
+
+
+def _current_snapshot(max_quiz_id=None):
+    count, max_id, updated_at = db.session.execute(_snapshot_query(max_quiz_id)).one()
+    return (count, max_id or 0, updated_at)
+
+
+def _index_quizzes(index, min_quiz_id=None, quiz_ids=None):
+    """
+    公開クイズとその問題・選択肢を索引に追加する
+
+    min_quiz_id を指定すればそれより後のクイズ、quiz_ids を指定すればそのクイズだけ。
+    索引済みのクイズは飛ばす。追加したクイズidのリストを返す。
+    """
+    def restrict(query, column):
+        if min_quiz_id is not None:
+            query = query.where(column > min_quiz_id)
+        if quiz_ids is not None:
+            query = query.where(column.in_(quiz_ids))
+        return query
+
+    quizzes = restrict(db.select(Quiz.id, Quiz.title, Quiz.description).where(Quiz.is_public == True), Quiz.id)
+    added = set()
+    for quiz_id, title, description in db.session.execute(quizzes.order_by(Quiz.id)).all():
+        if quiz_id in index.quiz_ids:
+            continue
+        index.add_quiz(quiz_id, title, description)
+        added.add(quiz_id)
+    if not added:
+        return []
+
+    # 問題ごとに選択肢の文言をまとめて1文書にする（問題id順なので同じ問題の行は連続する）
+    query = restrict(
+        db.select(Question.id, Question.quiz_id, Question.question_text, Choice.choice_text)
+        .outerjoin(Choice, Choice.question_id == Question.id),
+        Question.quiz_id
+    ).order_by(Question.id, Choice.order_index, Choice.id).execution_options(yield_per=BUILD_BATCH_ROWS)
+    current = None
+    for question_id, quiz_id, question_text, choice_text in db.session.execute(query):
+        if quiz_id not in added:
+            continue
+        if current is None or current[0] != question_id:
+            if current is not None:
+                index.add_question(current[1], current[0], current[2], '\n'.join(current[3]))
+            current = (question_id, quiz_id, question_text, [])
+        if choice_text:
+            current[3].append(choice_text)
+    if current is not None:
+        index.add_question(current[1], current[0], current[2], '\n'.join(current[3]))
+    return sorted(added)
+
+
+def build_index():
+    """全ての公開クイズの索引を作る"""
+    index = SearchIndex()
+    _index_quizzes(index)
+    # 確認用の値は索引に入れた範囲（最大idまで）について取る
+    index.snapshot = _current_snapshot(max(index.quiz_ids, default=0))
+    return index
+
+
+def warm():
+    """索引を作っておく（SEARCH_INDEX_PRELOAD=1 のとき起動時に呼ぶ）"""
+    global _index, _checked_at
+    started = time.perf_counter()
+    with _lock:
+        _index = build_index()
+        _checked_at = time.monotonic()
+    logger.info('検索の索引を作成しました（%d文書, %d bigram, %.1fMB, %.2f秒）',
+                _index.documents(), _index.grams(), _index.nbytes() / 1e6,
+                time.perf_counter() - started)
+    return _index
+
+
+def _refresh(index):
+    """他のワーカーでの変更を反映する。差分の追加で済めば同じ索引を、済まなければ作り直した索引を返す"""
+    indexed = index.snapshot
+    if _current_snapshot(indexed[1]) != indexed:
+        # 索引に入っているクイズが変更・削除された
+        return build_index()
+    latest = _current_snapshot()
+    if latest != indexed:
+        index = index.copy()
+        _index_quizzes(index, min_quiz_id=indexed[1])
+        index.snapshot = _current_snapshot(latest[1])
+    return index
+
+
+def get_index():
+    """現在の索引を返す（INDEX_CHECK_SECONDS を過ぎていれば変更を反映する）"""
+    global _index, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+        return _index
+    with _lock:
+        if _index is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+            return _index
+        _index = build_index() if _index is None else _refresh(_index)
+        _checked_at = now
+        return _index
+
+
+def add_quiz(quiz_id):
+    """このプロセスで作成したクイズをすぐに検索できるようにする（コミット後に呼ぶ）"""
+    global _index
+    if _index is None:
+        return
+    with _lock:
+        index = _index.copy()
+        indexed = index.snapshot
+        if quiz_id > indexed[1] and _current_snapshot(indexed[1]) == indexed:
+            # 索引済みの範囲より後ろに足すだけなので、確認用の値も進める
+            _index_quizzes(index, min_quiz_id=indexed[1])
+            index.snapshot = _current_snapshot(max(index.quiz_ids, default=0))
+        else:
+            _index_quizzes(index, quiz_ids=[quiz_id])
+        _index = index
+
+
+def search(query, limit=20):
+    """検索して (一致したクイズ数, [(quiz_id, score, [question_id, ...]), ...]) を返す"""
+    return get_index().search(query, limit)
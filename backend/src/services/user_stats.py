@@ -0,0 +1,269 @@
+"""
+ユーザーごとの成績の累計（プロフィール用）
+
+user_stats にユーザー × 集計軸（全体・タグ別・難易度別）ごとに1行ずつ累計を持ち、
+回答の送信時に加算する。プロフィールはユーザーの行を1回のインデックス読み込みで返す
+（quiz_attempts / user_answers は読まない）。
+
+- 加算は INSERT ... ON CONFLICT DO UPDATE の1文で行う（同時に送信されても値が失われない）
+- 連続日数は挑戦日（UTC）で数える。最後に遊んだ日より前の日付の挑戦（オフラインの
+  一括送信など）は回数・正答率には加算するが、連続日数は変えない
+- rebuild_user_stats で quiz_attempts から作り直せる（修復用）
+"""
+from datetime import date, datetime, timedelta
+from src.models.user import db
+from src.models.quiz import Quiz, QuizAttempt, UserStat, OshiTag
+from src.utils.cache import LRUCache
+
+stats = UserStat.__table__
+
+ALL, TAG, DIFFICULTY = 'all', 'tag', 'difficulty'
+DIFFICULTIES = ('beginner', 'intermediate', 'advanced', 'mania')
+RANKS = ('S', 'A', 'B', 'C', 'D')
+RANK_COLUMNS = {rank: f'rank_{rank.lower()}' for rank in RANKS}
+
+# 作り直すときに一度に読む挑戦の件数
+REBUILD_BATCH_ROWS = 50000
+# クイズ → (タグid, 難易度) を保持するクイズ数
+DIMENSION_CACHE_SIZE = 4096
+
+_EPOCH = date(1970, 1, 1)
+_dimensions = LRUCache(DIMENSION_CACHE_SIZE)
+
+
+def day_number(completed_at):
+    """挑戦日時（UTC）の 1970-01-01 からの日数"""
+    return (completed_at.date() - _EPOCH).days
+
+
+def _quiz_dimensions(quiz_ids):
+    """{quiz_id: (タグid, 難易度)}（キャッシュにないクイズだけ1クエリで読む）"""
+    result = {}
+    missing = []
+    for quiz_id in quiz_ids:
+        dimensions = _dimensions.get(quiz_id)
+        if dimensions is None:
+            missing.append(quiz_id)
+        else:
+            result[quiz_id] = dimensions
+    if missing:
+        rows = db.session.execute(
+            db.select(Quiz.id, Quiz.oshi_tag_id, Quiz.difficulty).where(Quiz.id.in_(sorted(missing)))
+        ).all()
+        for quiz_id, tag_id, difficulty in rows:
+            result[quiz_id] = (tag_id, difficulty)
+            _dimensions.set(quiz_id, (tag_id, difficulty))
+    return result
+
+
+def _keys(user_id, tag_id, difficulty):
+    """挑戦を加算する行のキー（全体・タグ・難易度）"""
+    return (
+        (user_id, ALL, ''),
+        (user_id, TAG, str(tag_id)),
+        (user_id, DIFFICULTY, difficulty),
+    )
+
+
+def _empty_row(key, day):
+    user_id, dimension, value = key
+    row = {
+        'user_id': user_id, 'dimension': dimension, 'dimension_value': value,
+        'attempts': 0, 'total_score': 0, 'total_answered': 0, 'best_percentage': 0.0,
+        'current_streak': 1, 'longest_streak': 1, 'last_played_day': day
+    }
+    row.update(dict.fromkeys(RANK_COLUMNS.values(), 0))
+    return row
+
+
+def _add(row, score, total_questions, rank):
+    row['attempts'] += 1
+    row['total_score'] += score
+    row['total_answered'] += total_questions
+    percentage = (score / total_questions * 100) if total_questions > 0 else 0.0
+    row['best_percentage'] = max(row['best_percentage'], percentage)
+    if rank in RANK_COLUMNS:
+        row[RANK_COLUMNS[rank]] += 1
+
+
+def _upsert_statement():
+    """行がなければ作り、あれば加算する INSERT ... ON CONFLICT DO UPDATE"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(stats)
+    new = statement.excluded
+    c = stats.c
+    # 同じ日なら据え置き、前日の続きなら +1、過去の日付なら据え置き、間が空いたら 1 から
+    current_streak = db.case(
+        (c.last_played_day == new.last_played_day, c.current_streak),
+        (c.last_played_day == new.last_played_day - 1, c.current_streak + 1),
+        (c.last_played_day > new.last_played_day, c.current_streak),
+        else_=1
+    )
+    values = {
+        'attempts': c.attempts + new.attempts,
+        'total_score': c.total_score + new.total_score,
+        'total_answered': c.total_answered + new.total_answered,
+        'best_percentage': db.case((new.best_percentage > c.best_percentage, new.best_percentage),
+                                   else_=c.best_percentage),
+        'current_streak': current_streak,
+        'longest_streak': db.case((current_streak > c.longest_streak, current_streak), else_=c.longest_streak),
+        'last_played_day': db.case((new.last_played_day > c.last_played_day, new.last_played_day),
+                                   else_=c.last_played_day),
+    }
+    for column in RANK_COLUMNS.values():
+        values[column] = c[column] + new[column]
+    return statement.on_conflict_do_update(
+        index_elements=[c.user_id, c.dimension, c.dimension_value], set_=values
+    )
+
+
+def record_attempts(attempts):
+    """
+    挑戦結果をユーザーの累計に加算する
+
+    attempts は user_id / quiz_id / score / total_questions / rank / completed_at を持つ
+    辞書のリスト。同じ行・同じ日の挑戦はまとめて加算し、連続日数が正しく進むよう
+    日付の古い順に、1回の executemany に同じ行が2度入らないよう分けて実行する。
+    """
+    if not attempts:
+        return
+    dimensions = _quiz_dimensions({a['quiz_id'] for a in attempts})
+
+    # (行のキー, 日) ごとにまとめる
+    grouped = {}
+    for attempt in attempts:
+        if attempt['quiz_id'] not in dimensions:
+            continue
+        day = day_number(attempt['completed_at'])
+        for key in _keys(attempt['user_id'], *dimensions[attempt['quiz_id']]):
+            row = grouped.get((key, day))
+            if row is None:
+                row = grouped[(key, day)] = _empty_row(key, day)
+            _add(row, attempt['score'], attempt['total_questions'], attempt['rank'])
+
+    # 行ごとの日付の n 番目を n 回目の executemany で加算する
+    rounds = []
+    counts = {}
+    for key, day in sorted(grouped, key=lambda k: k[1]):
+        n = counts.get(key, 0)
+        counts[key] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(grouped[(key, day)])
+
+    statement = _upsert_statement()
+    for rows in rounds:
+        db.session.execute(statement, rows)
+
+
+def record_attempt(attempt):
+    """QuizAttempt 1件を加算する（個別の送信用）"""
+    record_attempts([{
+        'user_id': attempt.user_id,
+        'quiz_id': attempt.quiz_id,
+        'score': attempt.score,
+        'total_questions': attempt.total_questions,
+        'rank': attempt.rank,
+        'completed_at': attempt.completed_at or datetime.utcnow()
+    }])
+
+
+def rebuild_user_stats():
+    """
+    quiz_attempts から全ユーザーの累計を作り直す（修復用）
+
+    挑戦をユーザー・日時の順に読み、連続日数も含めて Python で集計してから
+    まとめてINSERTする。作成した行数を返す。
+    """
+    query = db.select(
+        QuizAttempt.user_id, QuizAttempt.score, QuizAttempt.total_questions, QuizAttempt.rank,
+        QuizAttempt.completed_at, Quiz.oshi_tag_id, Quiz.difficulty
+    ).join(Quiz, Quiz.id == QuizAttempt.quiz_id)\
+        .order_by(QuizAttempt.user_id, QuizAttempt.completed_at, QuizAttempt.id)\
+        .execution_options(yield_per=REBUILD_BATCH_ROWS)
+
+    rows = {}
+    for user_id, score, total_questions, rank, completed_at, tag_id, difficulty in db.session.execute(query):
+        day = day_number(completed_at)
+        for key in _keys(user_id, tag_id, difficulty):
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = _empty_row(key, day)
+            elif day == row['last_played_day'] + 1:
+                row['current_streak'] += 1
+            elif day > row['last_played_day']:
+                row['current_streak'] = 1
+            row['longest_streak'] = max(row['longest_streak'], row['current_streak'])
+            row['last_played_day'] = max(row['last_played_day'], day)
+            _add(row, score, total_questions, rank)
+
+    db.session.execute(db.delete(stats))
+    if rows:
+        db.session.execute(db.insert(stats), list(rows.values()))
+    db.session.commit()
+    _dimensions.clear()
+    return len(rows)
+
+
+def stats_query(user_id):
+    """ユーザーの全ての累計行（ix_user_stats_key の範囲読み込み）"""
+    return db.select(stats).where(stats.c.user_id == user_id)
+
+
+def _summary(row, today):
+    """累計行（マッピング）をレスポンス用の辞書にする"""
+    accuracy = (row['total_score'] / row['total_answered'] * 100) if row['total_answered'] > 0 else 0.0
+    return {
+        'attempts': row['attempts'],
+        'total_score': row['total_score'],
+        'total_answered': row['total_answered'],
+        'accuracy': round(accuracy, 1),
+        'best_percentage': round(row['best_percentage'], 1),
+        # 1回でも取ったランクのうち最も良いもの
+        'best_rank': next((rank for rank in RANKS if row[RANK_COLUMNS[rank]]), None),
+        'ranks': {rank: row[RANK_COLUMNS[rank]] for rank in RANKS},
+        # 前日までに遊んでいなければ連続は途切れている
+        'current_streak': row['current_streak'] if today - row['last_played_day'] <= 1 else 0,
+        'longest_streak': row['longest_streak'],
+        'last_played_on': (_EPOCH + timedelta(days=row['last_played_day'])).isoformat()
+    }
+
+
+def get_user_stats(user_id):
+    """
+    ユーザーの成績（全体・タグ別・難易度別）を返す
+
+    累計行がなければ None（ユーザーの存在確認は呼び出し側で行う）。
+    """
+    rows = [row._mapping for row in db.session.execute(stats_query(user_id))]
+    if not rows:
+        return None
+    today = day_number(datetime.utcnow())
+    overall = next((row for row in rows if row['dimension'] == ALL), None)
+    tag_rows = [row for row in rows if row['dimension'] == TAG]
+    difficulty_rows = [row for row in rows if row['dimension'] == DIFFICULTY]
+
+    tags = {}
+    if tag_rows:
+        tag_ids = sorted(int(row['dimension_value']) for row in tag_rows)
+        tags = {tag.id: {'id': tag.id, 'name': tag.name, 'category': tag.category}
+                for tag in OshiTag.query.filter(OshiTag.id.in_(tag_ids))}
+
+    order = {difficulty: i for i, difficulty in enumerate(DIFFICULTIES)}
+    result = {'user_id': user_id}
+    if overall is not None:
+        result.update(_summary(overall, today))
+    result['by_tag'] = [
+        dict(_summary(row, today), tag=tags.get(int(row['dimension_value'])))
+        for row in sorted(tag_rows, key=lambda r: (-r['attempts'], int(r['dimension_value'])))
+    ]
+    result['by_difficulty'] = [
+        dict(_summary(row, today), difficulty=row['dimension_value'])
+        for row in sorted(difficulty_rows, key=lambda r: (order.get(r['dimension_value'], len(order)),
+                                                          r['dimension_value']))
+    ]
+    return result
@@ -0,0 +1,273 @@
+"""
+解答履歴（user_answers）の遅延書き込み
+
+ANSWER_WRITE_BEHIND を有効にすると、submit_quiz は挑戦記録と統計だけを
+コミットしてすぐに採点結果を返し、解答の明細はこのモジュールのキューに積む。
+バックグラウンドのスレッドがキューから取り出し、複数の挑戦分をまとめた
+executemany のINSERTで書き込む。
+
+- キューの長さには上限があり、溢れた分はリクエスト内で同期的に書き込む（捨てない）。
+  挑戦記録はコミット済みなので、このときの「database is locked」はその場で再試行し、
+  retry_locked には伝えない（ルートごとやり直されて挑戦が二重に登録されるため）
+- プロセス終了時（atexit / gunicorn の worker_exit）に残りを書き込んでから終わる
+- スレッドは最初に積まれたときに起動する（preload_app で fork した後のワーカーごと）
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+from src.models.quiz import UserAnswer
+from src.utils import sqlite_tuning
+
+logger = logging.getLogger(__name__)
+
+# キューに積める挑戦数の上限
+QUEUE_SIZE = 10000
+# 1回のINSERTにまとめる解答の最大行数
+BATCH_ROWS = 2000
+# 最初の1件を取り出してから追加を待つ最大時間（秒）
+FLUSH_INTERVAL = 0.2
+# 書き込みに失敗したバッチを再試行する回数
+RETRIES = 2
+# 同期書き込みもできなかったとき、キューが空くのを待つ最大時間（秒）
+FULL_QUEUE_WAIT = 5.0
+
+_STOP = object()
+
+_lock = threading.Lock()
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_worker = None
+_worker_pid = None
+_app = None
+
+_metrics = {
+    'enqueued_attempts': 0,
+    'pending_rows': 0,
+    'flushed_rows': 0,
+    'flush_count': 0,
+    'failed_rows': 0,
+    'sync_fallbacks': 0,
+    'last_flush_ms': 0.0,
+    'max_flush_ms': 0.0,
+    'total_flush_ms': 0.0,
+}
+
+
+def enabled():
+    """遅延書き込みが有効か"""
+    return bool(current_app.config.get('ANSWER_WRITE_BEHIND'))
+
+
+def answer_rows(attempt_id, graded):
+    """採点結果 [(question_id, choice_id, is_correct)] を user_answers の行にする"""
+    answered_at = datetime.utcnow()
+    return [{
+        'attempt_id': attempt_id,
+        'question_id': question_id,
+        'selected_choice_id': selected_choice_id,
+        'is_correct': is_correct,
+        'answered_at': answered_at
+    } for question_id, selected_choice_id, is_correct in graded]
+
+
+def enqueue(rows):
+    """
+    コミット済みの挑戦の解答行をキューに積む
+
+    キューが一杯なら、その場で書き込んでコミットする。それもできなければ
+    FULL_QUEUE_WAIT 秒までキューが空くのを待って積む（例外は呼び出し元に伝えない）。
+    """
+    if not rows:
+        return
+    _ensure_worker()
+    try:
+        _queue.put_nowait(rows)
+    except queue.Full:
+        if _write_now(rows):
+            return
+        try:
+            _queue.put(rows, timeout=FULL_QUEUE_WAIT)
+        except queue.Full:
+            logger.error('user_answers をキューに積めませんでした（%d行を破棄）', len(rows))
+            with _lock:
+                _metrics['failed_rows'] += len(rows)
+            return
+    with _lock:
+        _metrics['enqueued_attempts'] += 1
+        _metrics['pending_rows'] += len(rows)
+
+
+def _write_now(rows):
+    """
+    キューが一杯のときにリクエスト内で書き込む（成功したら True）
+
+    「database is locked」は retry_locked と同じ間隔でその場で再試行する。
+    """
+    if not _insert_now(rows):
+        return False
+    with _lock:
+        _metrics['sync_fallbacks'] += 1
+    return True
+
+
+def _insert_now(rows):
+    """rows をINSERTしてコミットする（「database is locked」はその場で再試行、成功したら True）"""
+    for attempt in range(sqlite_tuning.WRITE_RETRIES + 1):
+        try:
+            db.session.execute(db.insert(UserAnswer), rows)
+            db.session.commit()
+            return True
+        except OperationalError as e:
+            db.session.rollback()
+            if attempt == sqlite_tuning.WRITE_RETRIES or not sqlite_tuning._is_locked(e):
+                logger.exception('user_answers の同期書き込みに失敗しました（%d行）', len(rows))
+                return False
+            time.sleep(sqlite_tuning.RETRY_BACKOFF * (2 ** attempt))
+        except Exception:
+            db.session.rollback()
+            logger.exception('user_answers の同期書き込みに失敗しました（%d行）', len(rows))
+            return False
+    return False
+
+
+def _ensure_worker():
+    global _worker, _worker_pid, _app
+    pid = os.getpid()
+    if _worker is not None and _worker_pid == pid and _worker.is_alive():
+        return
+    with _lock:
+        if _worker is not None and _worker_pid == pid and _worker.is_alive():
+            return
+        _app = current_app._get_current_object()
+        _worker_pid = pid
+        _worker = threading.Thread(target=_run, name='answer-write-behind', daemon=True)
+        _worker.start()
+
+
+def _collect(first):
+    """
+    最初のバッチに続けて、BATCH_ROWS か FLUSH_INTERVAL に達するまで取り出す
+
+    失敗したときに挑戦ごとに書き直せるよう、積まれた単位（1挑戦分の行）のリストで返す。
+    """
+    batches = [first]
+    size = len(first)
+    stop = False
+    deadline = time.monotonic() + FLUSH_INTERVAL
+    while size < BATCH_ROWS:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            item = _queue.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if item is _STOP:
+            stop = True
+            break
+        batches.append(item)
+        size += len(item)
+    return batches, stop
+
+
+def _write(batches):
+    """
+    batches（挑戦ごとの行のリスト）を1回のexecutemanyで書き込む
+
+    失敗したら再試行し、それでも書き込めなければ挑戦ごとに書き直して、
+    失敗した挑戦の行だけを捨てる（1行の不備でまとめた全員の解答を失わないように）。
+    """
+    rows = [row for batch in batches for row in batch]
+    started = time.perf_counter()
+    for attempt in range(RETRIES + 1):
+        try:
+            db.session.execute(db.insert(UserAnswer), rows)
+            db.session.commit()
+            break
+        except Exception:
+            db.session.rollback()
+            if attempt == RETRIES:
+                logger.exception('user_answers の書き込みに失敗しました（挑戦ごとに書き直します）')
+                _write_each(batches)
+                return
+            time.sleep(0.1 * (attempt + 1))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        _metrics['pending_rows'] -= len(rows)
+        _metrics['flushed_rows'] += len(rows)
+        _metrics['flush_count'] += 1
+        _metrics['last_flush_ms'] = elapsed_ms
+        _metrics['total_flush_ms'] += elapsed_ms
+        _metrics['max_flush_ms'] = max(_metrics['max_flush_ms'], elapsed_ms)
+
+
+def _write_each(batches):
+    """まとめた書き込みに失敗したバッチを、挑戦ごとに書き込む（失敗した挑戦の行だけ捨てる）"""
+    flushed = failed = 0
+    for batch in batches:
+        if _insert_now(batch):
+            flushed += len(batch)
+        else:
+            failed += len(batch)
+    if failed:
+        logger.error('user_answers の書き込みに失敗しました（%d行を破棄）', failed)
+    with _lock:
+        _metrics['pending_rows'] -= flushed + failed
+        _metrics['flushed_rows'] += flushed
+        _metrics['failed_rows'] += failed
+
+
+def _run():
+    with _app.app_context():
+        while True:
+            first = _queue.get()
+            if first is _STOP:
+                return
+            batches, stop = _collect(first)
+            _write(batches)
+            db.session.remove()
+            if stop:
+                return
+
+
+def flush(timeout=10.0):
+    """
+    キューに残っている解答を全て書き込み、スレッドを止める
+
+    書き込み終わったら True を返す。次に enqueue されるとスレッドは再び起動する。
+    """
+    global _worker
+    worker = _worker
+    if worker is None or _worker_pid != os.getpid() or not worker.is_alive():
+        return _queue.empty()
+    deadline = time.monotonic() + timeout
+    try:
+        _queue.put(_STOP, timeout=timeout)
+    except queue.Full:
+        pass
+    worker.join(max(deadline - time.monotonic(), 0))
+    if worker.is_alive():
+        logger.warning('user_answers の書き込みが %.0f 秒以内に終わりませんでした', timeout)
+        return False
+    _worker = None
+    return True
+
+
+def stats():
+    """キューの長さと書き込み時間の指標"""
+    with _lock:
+        result = dict(_metrics)
+    result['queue_depth'] = _queue.qsize()
+    result['queue_size'] = QUEUE_SIZE
+    total_flush_ms = result.pop('total_flush_ms')
+    result['avg_flush_ms'] = total_flush_ms / result['flush_count'] if result['flush_count'] else 0.0
+    return result
+
+
+atexit.register(flush)
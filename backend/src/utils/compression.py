@@ -0,0 +1,127 @@
+"""
+レスポンスの圧縮（gzip / brotli）
+
+Accept-Encoding で br（brotli がインストールされていれば）か gzip を選び、
+圧縮したレスポンスを返す。
+
+- キャッシュしているレスポンス（クイズ詳細・ランキング）は CompressedBody に入れておき、
+  エンコーディングごとに内容のバージョンあたり1回だけ圧縮して使い回す
+- それ以外のJSONレスポンスは after_request でリクエストごとに圧縮する（軽めの圧縮レベル）
+- COMPRESS_MIN_SIZE より小さいレスポンスは圧縮しない
+
+COMPRESSION=0 で無効にできる。
+"""
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli は任意
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# これより小さいレスポンスは圧縮しない（バイト）
+COMPRESS_MIN_SIZE = 1024
+
+# キャッシュするレスポンスの圧縮レベル（1回だけなので高め）
+STATIC_LEVELS = {'br': 9, 'gzip': 9}
+# リクエストごとに圧縮するレスポンスの圧縮レベル（CPUを優先して低め）
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+
+# サーバー側の優先順（クライアントの q 値が同じなら先頭を選ぶ）
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    if encoding == 'gzip':
+        # mtime を固定して、同じ内容なら同じバイト列にする
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    raise ValueError(f'不明なエンコーディングです: {encoding}')
+
+
+def negotiate(size):
+    """このリクエストで使うエンコーディング（圧縮しない場合は None）"""
+    if not current_app.config.get('COMPRESSION') or size < COMPRESS_MIN_SIZE:
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+class CompressedBody:
+    """
+    エンコード済みのレスポンス本体と、その圧縮版
+
+    圧縮版は最初に要求されたときに作って保持する（キャッシュのエントリと同じ寿命）。
+    """
+
+    __slots__ = ('body', '_variants')
+
+    def __init__(self, body):
+        self.body = body
+        self._variants = {}
+
+    def variant(self, encoding):
+        """エンコーディングの圧縮版（None なら元の本体）"""
+        if encoding is None:
+            return self.body
+        data = self._variants.get(encoding)
+        if data is None:
+            data = compress(self.body, encoding, STATIC_LEVELS[encoding])
+            self._variants[encoding] = data
+        return data
+
+    def sizes(self):
+        """作成済みの圧縮版の大きさ（確認用）"""
+        return dict({'identity': len(self.body)}, **{e: len(d) for e, d in self._variants.items()})
+
+
+def send(compressed, etag=None, mimetype='application/json'):
+    """
+    CompressedBody をクライアントが受け付けるエンコーディングで返すレスポンスを作る
+
+    ETag はエンコーディングごとに別の値にする（同じ ETag で異なるバイト列を返さない）。
+    """
+    encoding = negotiate(len(compressed.body))
+    response = current_app.response_class(compressed.variant(encoding), mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if current_app.config.get('COMPRESSION'):
+        response.vary.add('Accept-Encoding')
+    if etag:
+        response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    return response
+
+
+def _compress_response(response):
+    """キャッシュしていないJSONレスポンスをその場で圧縮する"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not response.is_json):
+        return response
+    data = response.get_data()
+    encoding = negotiate(len(data))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding, DYNAMIC_LEVELS[encoding]))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+def init_app(app):
+    """リクエストごとの圧縮を登録する"""
+    def after_request(response):
+        if not app.config.get('COMPRESSION'):
+            return response
+        return _compress_response(response)
+
+    app.after_request(after_request)
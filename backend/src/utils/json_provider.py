@@ -0,0 +1,58 @@
+"""
+高速なJSONエンコーダーを使う Flask の JSON プロバイダー
+
+orjson がインストールされていれば orjson で、なければ標準の json で
+エンコードする（JSON_BACKEND=stdlib で標準の json に固定できる）。
+どちらでも出力が同じになるように、キーはソートし、非ASCII文字は
+エスケープせずUTF-8のまま出力する。
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson は任意
+    orjson = None
+
+if orjson is not None:
+    # datetime などは Flask の default() に任せて標準の json と同じ形式にする
+    _ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                       | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson があれば使う JSON プロバイダー"""
+
+    ensure_ascii = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        backend = app.config.get('JSON_BACKEND', 'auto')
+        self.use_orjson = orjson is not None and backend != 'stdlib'
+
+    @property
+    def backend(self):
+        return 'orjson' if self.use_orjson else 'stdlib'
+
+    def dumps(self, obj, **kwargs):
+        # インデント指定（デバッグ表示）などは標準の json で処理する
+        if self.use_orjson and not kwargs.get('indent') and set(kwargs) <= {'separators'}:
+            return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def dumpb(self, obj):
+        """コンパクトなJSONをUTF-8のバイト列で返す"""
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS)
+        return self.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj) + b'\n', mimetype=self.mimetype)
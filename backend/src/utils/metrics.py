@@ -0,0 +1,196 @@
+"""
+リクエスト単位の計測（Prometheusのテキスト形式で出力）
+
+- Flask の before_request / after_request でルートごとの処理時間を記録する
+- SQLAlchemy のエンジンイベントで、リクエスト中に実行したSQLの件数と時間を数える
+- SQL_QUERY_COUNT_HEADER を有効にすると、レスポンスに X-Query-Count / X-SQL-Time-Ms を付ける
+
+値はプロセスごとに持つ（gunicorn のワーカーごとに別々の値になる）。
+"""
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 処理時間（秒）のバケット
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# 1リクエストあたりのSQL件数のバケット
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+SQL_TIME_HEADER = 'X-SQL-Time-Ms'
+
+
+class Histogram:
+    """累積バケット付きのヒストグラム（スレッドセーフ）"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """(累積バケット [(上限, 件数)], 件数, 合計) を返す"""
+        with self._lock:
+            cumulative = []
+            running = 0
+            for upper, count in zip(self.buckets, self.counts):
+                running += count
+                cumulative.append((upper, running))
+            return cumulative, self.count, self.sum
+
+
+class Registry:
+    """メトリクス名とラベルごとのヒストグラム・カウンター"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets, labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+                self._help[name] = ('histogram', help_text)
+        return histogram
+
+    def inc(self, name, help_text, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._help[name] = ('counter', help_text)
+
+    def set_gauge(self, name, help_text, value, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._gauges[key] = value
+            self._help[name] = ('gauge', help_text)
+
+    def render(self):
+        """Prometheusのテキスト形式（0.0.4）で出力する"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            help_texts = dict(self._help)
+
+        lines = []
+        seen = set()
+
+        def header(name):
+            if name not in seen:
+                seen.add(name)
+                kind, help_text = help_texts[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters + gauges:
+            header(name)
+            lines.append(f'{name}{_labels(labels)} {_number(value)}')
+        for (name, labels), histogram in histograms:
+            header(name)
+            buckets, count, total = histogram.snapshot()
+            for upper, cumulative in buckets:
+                lines.append(f'{name}_bucket{_labels(labels, le=_number(upper))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = ('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+registry = Registry()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # リクエスト外（バックグラウンドのスレッド・CLI）のSQLは数えない
+    if has_request_context() and 'sql_count' in g:
+        g.sql_count += 1
+        g.sql_time += time.perf_counter() - context._metrics_started
+
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+
+
+def _after_request(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    labels = {'method': request.method, 'route': _route_label()}
+
+    registry.inc('quiz_http_requests_total', 'HTTPリクエスト数',
+                 dict(labels, status=str(response.status_code)))
+    registry.histogram('quiz_http_request_duration_seconds', 'リクエストの処理時間（秒）',
+                       LATENCY_BUCKETS, labels).observe(elapsed)
+    registry.histogram('quiz_sql_queries_per_request', '1リクエストで実行したSQLの件数',
+                       QUERY_COUNT_BUCKETS, labels).observe(g.sql_count)
+    registry.histogram('quiz_sql_duration_seconds', '1リクエストのSQL実行時間の合計（秒）',
+                       LATENCY_BUCKETS, labels).observe(g.sql_time)
+
+    if g.get('sql_header'):
+        response.headers[QUERY_COUNT_HEADER] = str(g.sql_count)
+        response.headers[SQL_TIME_HEADER] = f'{g.sql_time * 1000:.2f}'
+    return response
+
+
+def init_app(app):
+    """計測用のリクエストフックを登録する"""
+    def before_request():
+        _before_request()
+        g.sql_header = app.config.get('SQL_QUERY_COUNT_HEADER', False)
+
+    app.before_request(before_request)
+    app.after_request(_after_request)
+
+
+def render():
+    """全メトリクスをPrometheusのテキスト形式で返す"""
+    return registry.render()
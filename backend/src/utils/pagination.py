@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+
+# 1リクエストで返す最大件数（これ以上は指定されても切り詰める）
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, max_limit=MAX_LIMIT, name='limit'):
+    """limitパラメータ（name で別名のパラメータにも使える）を解釈し、1〜max_limitの範囲に収める"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if limit < 1:
+        raise ValueError(f'{name} must be positive')
+    return min(limit, max_limit)
+
+
+def parse_fields(value, allowed, default=None):
+    """
+    fieldsパラメータ（カンマ区切り）を解釈する
+
+    未指定の場合は default（省略時は allowed 全て）を返す。
+    """
+    if not value:
+        return tuple(default or allowed)
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in allowed:
+            raise ValueError(f'unknown field: {name}')
+        if name not in fields:
+            fields.append(name)
+    if not fields:
+        raise ValueError('fields must not be empty')
+    return tuple(fields)
+
+
+def encode_cursor(*values):
+    """キーセットの値を不透明なカーソル文字列に変換する"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """
+    encode_cursor で作ったカーソルを復元する
+
+    types には各値の型（int / datetime など）を順番に指定する。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(payload, types)
+        )
+    except (ValueError, TypeError):
+        raise ValueError('invalid cursor')
@@ -0,0 +1,94 @@
+"""
+事前コンパイル済みのJSONシリアライザー
+
+フィールドの定義からエンコード関数のソースを生成して compile しておき、
+モデルや行オブジェクトの属性から辞書を作らずに直接JSON文字列を組み立てる。
+出力は FastJSONProvider のコンパクト表記（キーはソート済み・非ASCIIはそのまま）と同じ。
+
+    CHOICE_JSON = JSONSerializer([
+        ('id', 'int'),
+        ('choice_text', 'str'),
+    ])
+    CHOICE_JSON.encode_list(choices)  # '[{"choice_text":"...","id":1},...]'
+
+フィールドは (キー, 型) または (キー, 型, 取得元)。型は 'int' / 'float' / 'bool' /
+'str' / 'datetime'（isoformat）/ 入れ子の JSONSerializer / [JSONSerializer]（リスト）/
+['int'] / ['float']（数値のリスト）。
+取得元は属性名（省略時はキーと同じ）、添字（Row などのタプル）、オブジェクトを受け取る関数のいずれか。
+"""
+from json.encoder import encode_basestring
+
+# 型ごとの値 → テンプレートに埋め込む値の式（v は値が入った変数名、値が None なら null）
+# int / float は % の %s で str() される（JSON と同じ表記）
+_EXPRESSIONS = {
+    'int': '{v}',
+    'float': '{v}',
+    'bool': "('true' if {v} else 'false')",
+    'str': '_str({v})',
+    'datetime': "'\"' + {v}.isoformat() + '\"'",
+}
+
+
+class JSONSerializer:
+    """フィールド定義から生成したエンコード関数を持つシリアライザー"""
+
+    def __init__(self, fields, name='serializer'):
+        self.fields = [self._normalize(f) for f in fields]
+        self.name = name
+        self.encode = self._compile()
+
+    @staticmethod
+    def _normalize(field):
+        key, kind = field[0], field[1]
+        source = field[2] if len(field) > 2 else key
+        return key, kind, source
+
+    def _compile(self):
+        namespace = {'_str': encode_basestring}
+        lines = [f'def encode_{self.name}(obj):']
+        template = []
+        values = []
+        # jsonify（sort_keys=True）と同じ順番にする
+        for i, (key, kind, source) in enumerate(sorted(self.fields, key=lambda f: f[0])):
+            var = f'v{i}'
+            if callable(source):
+                namespace[f'_get{i}'] = source
+                lines.append(f'    {var} = _get{i}(obj)')
+            elif isinstance(source, int):
+                # Row は属性より添字の方がずっと速い
+                lines.append(f'    {var} = obj[{source}]')
+            else:
+                if not source.isidentifier():
+                    raise ValueError(f'不正な属性名です: {source!r}')
+                lines.append(f'    {var} = obj.{source}')
+
+            if isinstance(kind, JSONSerializer):
+                namespace[f'_enc{i}'] = kind.encode
+                expr = f'_enc{i}({var})'
+            elif isinstance(kind, list) and len(kind) == 1 and isinstance(kind[0], JSONSerializer):
+                namespace[f'_enc{i}'] = kind[0].encode
+                expr = f"'[' + ','.join(map(_enc{i}, {var})) + ']'"
+            elif kind in (['int'], ['float']):
+                expr = f"'[' + ','.join(map(str, {var})) + ']'"
+            elif kind in _EXPRESSIONS:
+                expr = _EXPRESSIONS[kind].format(v=var)
+            else:
+                raise ValueError(f'不明な型です: {kind!r}')
+
+            template.append(encode_basestring(key).replace('%', '%%') + ':%s')
+            values.append(f"('null' if {var} is None else {expr})")
+
+        # 1回の % 書式化で組み立てる（文字列の連結を繰り返さない）
+        namespace['_template'] = '{' + ','.join(template) + '}'
+        if values:
+            lines.append('    return _template % (' + ', '.join(values) + ',)')
+        else:
+            lines.append('    return _template')
+
+        code = compile('\n'.join(lines), f'<JSONSerializer {self.name}>', 'exec')
+        exec(code, namespace)
+        return namespace[f'encode_{self.name}']
+
+    def encode_list(self, objs):
+        """オブジェクトのリストをJSON配列の文字列にする"""
+        return '[' + ','.join(map(self.encode, objs)) + ']'
@@ -0,0 +1,97 @@
+"""
+SQLite を本番（小規模なデプロイ）で使うための設定
+
+DATABASE_URL が未指定（またはファイルの SQLite）のとき、接続ごとに次の PRAGMA を設定する。
+
+- journal_mode=WAL: 読み込みが書き込みを待たない（複数の gunicorn ワーカーで同時に読める）
+- synchronous=NORMAL: WAL ではコミットごとの fsync を省いても壊れない（電源断で直近のコミットが失われうる）
+- cache_size / mmap_size / temp_store: ページキャッシュとメモリマップを増やす
+- busy_timeout: 他のワーカーの書き込み中はエラーにせず待つ
+
+それでも「database is locked」になった書き込みは retry_locked でトランザクションごとやり直す。
+SQLITE_TUNING=0 で無効にできる（従来の設定）。
+"""
+import functools
+import logging
+import random
+import time
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# 接続ごとに設定する PRAGMA（journal_mode はファイルに保存される）
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -32000),        # 約32MB（負の値はKB単位）
+    ('mmap_size', 268435456),      # 256MB
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),        # ミリ秒
+)
+
+# 「database is locked」で書き込みをやり直す回数と待ち時間（秒、指数的に伸ばす）
+WRITE_RETRIES = 5
+RETRY_BACKOFF = 0.02
+
+
+def is_file_database(engine):
+    """ファイルの SQLite か（メモリ上の SQLite や他のデータベースは対象外）"""
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in PRAGMAS:
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def init_app(app):
+    """ファイルの SQLite なら接続ごとの PRAGMA を登録する（アプリケーションコンテキスト内で呼ぶ）"""
+    if not app.config.get('SQLITE_TUNING'):
+        return False
+    engine = db.engine
+    if not is_file_database(engine) or event.contains(engine, 'connect', _set_pragmas):
+        return False
+    event.listen(engine, 'connect', _set_pragmas)
+    # 既に開いている接続は設定前のものなので閉じる
+    engine.dispose()
+    return True
+
+
+def pragma_status():
+    """現在の接続の PRAGMA の値（確認用）"""
+    return {name: db.session.execute(db.text(f'PRAGMA {name}')).scalar() for name, _ in PRAGMAS}
+
+
+def _is_locked(error):
+    message = str(error.orig).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_locked(view):
+    """
+    書き込みのルートを「database is locked」のときにやり直すデコレーター
+
+    ロールバックしてから少し待ってルートの処理を最初から実行し直す。
+    キャッシュの無効化や遅延書き込みのキューへの追加はコミットの後なので、
+    失敗した回の副作用は残らない。
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = WRITE_RETRIES if current_app.config.get('SQLITE_TUNING') else 0
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                db.session.rollback()
+                if attempt == retries or not _is_locked(e):
+                    raise
+                logger.warning('database is locked のため書き込みをやり直します（%d回目）', attempt + 1)
+                time.sleep(RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+    return wrapper
@@ -70,11 +70,24 @@ function HomePage() {
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
-    fetch(`${API_BASE}/quizzes`).then(r => r.json()).then(quizzesData => {
-      // 【推しの子】タグのクイズだけをフィルタリング（タグ名は「推しの子」）
-      const oshiNokoQuizzes = quizzesData.filter(quiz =>
-        quiz.oshi_tag && quiz.oshi_tag.name === '推しの子'
-      )
+    // 【推しの子】タグ（タグ名は「推しの子」）のクイズをサーバー側で絞り込み、
+    // 一覧は1ページ最大100件なので X-Next-Cursor をたどって全ページを読み込む
+    const loadQuizzes = async () => {
+      const tags = await fetch(`${API_BASE}/tags`).then(r => r.json())
+      const tag = tags.find(t => t.name === '推しの子')
+      if (!tag) return []
+      const allQuizzes = []
+      let cursor = null
+      do {
+        const params = new URLSearchParams({ tag_id: tag.id, limit: 100 })
+        if (cursor) params.set('cursor', cursor)
+        const response = await fetch(`${API_BASE}/quizzes?${params}`)
+        allQuizzes.push(...await response.json())
+        cursor = response.headers.get('X-Next-Cursor')
+      } while (cursor)
+      return allQuizzes
+    }
+    loadQuizzes().then(oshiNokoQuizzes => {
       setQuizzes(oshiNokoQuizzes)
       setLoading(false)
     })